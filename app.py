@@ -1,39 +1,265 @@
-from flask import Flask
-from models.models import db, initialize_admin
+import click
+import json
+from datetime import datetime, timedelta
 from flask import Flask, redirect, url_for
+from flask.cli import with_appcontext
+from config import configure_app
+from models.models import db, initialize_admin
+from utils.allocation import allocator
+from utils.scheduling import schedule
+from utils.counters import recompute_lot_counters
+from utils.migrations import upgrade
+from utils.revenue import backfill_revenue
+from utils.provisioning import import_lots_csv
+from utils.query_plans import full_scans
+from utils.filters import register_filters
+from utils.instrumentation import init_instrumentation
+from utils.pricing import reprice_reservations
+from utils.jobs import jobs
+from utils.export import export_chunks, parquet_available
+from utils.cache import page_cache
+from utils.admission import admission
+from utils.archive import ARCHIVE_AFTER_DAYS, archive_reservations
+from utils.gate import gate_user_id, ingest_events
+from utils.vehicles import active_sessions
+
+
+# --- APPLICATION FACTORY ---
+def create_app(warm=False):
+    """Build the app without touching the database.
+
+    Creating the schema and the admin account is a one-time step
+    (flask --app app init-db). In-memory state (free-spot pools, hold index, active sessions)
+    loads lazily; warm=True loads it up front, e.g. in a Gunicorn master with
+    --preload so every forked worker starts with it.
+    """
+    app = Flask(__name__)
+
+    # Configuration (database backend and tuning come from the environment, see config.py)
+    configure_app(app)
+
+    db.init_app(app)
+    register_filters(app)
+    page_cache.configure(app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_TTL'])
+    admission.enabled = app.config['ADMISSION_CONTROL']
+
+    if app.config['INSTRUMENTATION']:
+        init_instrumentation(app, db)
+
+    # Background worker for long-running admin jobs (threads start per process, on first request)
+    jobs.init_app(app)
 
-from controllers.auth_controller import auth_bp
-from controllers.admin_controller import admin_bp
-from controllers.user_controller import user_bp
+    register_blueprints(app)
+    for command in COMMANDS:
+        app.cli.add_command(command)
 
-app = Flask(__name__)
+    if warm:
+        warm_up(app)
+    return app
 
-# Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///parking_app.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.secret_key = 'sujith_rohan_reddy'  # For session
 
-# Initialize DB
-db.init_app(app)
+def register_blueprints(app):
+    # Controllers pull in most of utils/; imported here so tools that only need
+    # the models (migrations, benchmarks' data generator) stay light
+    from controllers.auth_controller import auth_bp
+    from controllers.admin_controller import admin_bp
+    from controllers.user_controller import user_bp
+    from controllers.events_controller import events_bp
+    from controllers.api_controller import api_bp
 
-# Create DB and admin
-with app.app_context():
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(user_bp, url_prefix='/user')
+    app.register_blueprint(events_bp, url_prefix='/events')
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
+
+    @app.route('/')
+    def home():
+        return redirect(url_for('auth.login'))
+
+
+def init_database():
+    """Create tables, apply migrations and make sure the admin and gate accounts exist."""
     db.create_all()
+    upgrade()
     initialize_admin()
+    gate_user_id()
+
+
+def warm_up(app):
+    with app.app_context():
+        allocator.rebuild()        # In-memory free-spot pools for booking
+        schedule.rebuild()         # In-memory index of upcoming advance holds
+        active_sessions.rebuild()  # Open reservations by plate and by user
+        # No pooled connection may be shared with forked workers
+        db.engine.dispose()
+
+
+# CLI: flask --app app init-db
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the schema, apply pending migrations and seed the admin account."""
+    init_database()
+    print("Database ready.")
+
+
+# CLI: flask --app app repair-counters
+@click.command('repair-counters')
+@with_appcontext
+def repair_counters():
+    """Recompute per-lot occupied/available counters from parking_spots."""
+    fixed = recompute_lot_counters()
+    print(f"Lot counters repaired: {fixed} lot(s) updated.")
+
+
+# CLI: flask --app app backfill-revenue
+@click.command('backfill-revenue')
+@with_appcontext
+def backfill_revenue_command():
+    """Rebuild the per-lot daily revenue rollup from existing reservations."""
+    rows = backfill_revenue()
+    print(f"Revenue rollup rebuilt: {rows} lot-day row(s).")
+
+
+# CLI: flask --app app import-lots layouts.csv
+@click.command('import-lots')
+@with_appcontext
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+def import_lots_command(csv_path):
+    """Create lots and their spots from a CSV (name, address, pin_code, price, spots)."""
+    try:
+        created = import_lots_csv(csv_path)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    print(f"Imported {created} parking lot(s).")
+
+
+# CLI: flask --app app check-query-plans
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans():
+    """Fail if any hot lookup falls back to a full table scan."""
+    problems = full_scans()
+    for name, plan in problems.items():
+        print(f"FULL SCAN in '{name}': {' | '.join(plan)}")
+    if problems:
+        raise SystemExit(1)
+    print("All hot queries use an index.")
+
+
+# CLI: flask --app app reprice --start 2025-01-01 --end 2025-02-01 [--lot 3] [--apply]
+@click.command('reprice')
+@with_appcontext
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='Parked on or after this day')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Parked before this day')
+@click.option('--lot', 'lot_id', type=int, help='Only this parking lot')
+@click.option('--apply', is_flag=True, help='Write the new costs (default: report only)')
+def reprice_command(start, end, lot_id, apply):
+    """Recompute released reservations' costs with the current tariffs (audit)."""
+    report = reprice_reservations(start, end, lot_id, apply)
+    print(f"Checked {report['checked']} reservation(s), {report['changed']} would change: "
+          f"total {report['old_total']} -> {report['new_total']}")
+    if apply and report['changed']:
+        backfill_revenue()
+        print("New costs written and revenue rollup rebuilt.")
+
+
+# CLI: flask --app app export-reservations out.csv --start 2025-01-01 --end 2025-02-01 [--lot 3] [--user 7]
+@click.command('export-reservations')
+@with_appcontext
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='Parked on or after this day')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Parked before this day')
+@click.option('--lot', 'lot_id', type=int, help='Only this parking lot')
+@click.option('--user', 'user_id', type=int, help='Only this user')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'parquet']), default=None,
+              help='Defaults to the output file extension')
+def export_reservations_command(output, start, end, lot_id, user_id, fmt):
+    """Stream reservations joined with user, spot and lot to a CSV or Parquet file."""
+    fmt = fmt or ('parquet' if output.endswith('.parquet') else 'csv')
+    if fmt == 'parquet' and not parquet_available():
+        raise click.ClickException("Parquet export needs pyarrow installed.")
+    size = 0
+    with open(output, 'wb') as f:
+        for chunk in export_chunks(fmt, start, end, lot_id, user_id):
+            f.write(chunk)
+            size += len(chunk)
+    print(f"Exported reservations to {output} ({size} bytes).")
+
+
+# CLI: flask --app app archive-reservations [--days 90]   (e.g. nightly from cron)
+@click.command('archive-reservations')
+@with_appcontext
+@click.option('--days', type=int, default=ARCHIVE_AFTER_DAYS, show_default=True,
+              help='Archive reservations released more than this many days ago')
+def archive_reservations_command(days):
+    """Move old released reservations out of the hot table into monthly archive tables."""
+    cutoff = datetime.now() - timedelta(days=days)
+    moved = archive_reservations(cutoff)
+    print(f"Archived {moved} reservation(s) released before {cutoff:%Y-%m-%d %H:%M}.")
+
+
+# CLI: flask --app app ingest-gate-events events.ndjson   (or - for stdin)
+@click.command('ingest-gate-events')
+@with_appcontext
+@click.argument('source', type=click.File('r'))
+@click.option('--batch', 'batch_size', type=int, default=5000, show_default=True,
+              help='Events read and applied per batch')
+def ingest_gate_events_command(source, batch_size):
+    """Apply gate entry/exit events from NDJSON, one {event_id, vehicle_no, lot, timestamp, direction} per line."""
+    totals = {'received': 0, 'applied': 0, 'duplicates': 0}
+    ignored, rejected = {}, {}
+
+    def flush(batch):
+        summary = ingest_events(batch)
+        for key in totals:
+            totals[key] += summary[key]
+        for target, counts in ((ignored, summary['ignored']), (rejected, summary['rejected'])):
+            for reason, count in counts.items():
+                target[reason] = target.get(reason, 0) + count
+
+    batch = []
+    for number, line in enumerate(source, 1):
+        if not line.strip():
+            continue
+        try:
+            batch.append(json.loads(line))
+        except ValueError:
+            raise click.ClickException(f"Line {number} is not valid JSON.")
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    print(f"Received {totals['received']} event(s): {totals['applied']} applied, "
+          f"{totals['duplicates']} duplicate(s).")
+    for label, counts in (('Ignored', ignored), ('Rejected', rejected)):
+        for reason, count in sorted(counts.items()):
+            print(f"  {label} {count}: {reason}")
 
-# Register Blueprints
-app.register_blueprint(auth_bp, url_prefix='/auth')
-app.register_blueprint(admin_bp)
-app.register_blueprint(user_bp, url_prefix='/user')
 
+COMMANDS = [
+    init_db_command,
+    repair_counters,
+    backfill_revenue_command,
+    import_lots_command,
+    check_query_plans,
+    reprice_command,
+    export_reservations_command,
+    archive_reservations_command,
+    ingest_gate_events_command,
+]
 
-# app.py
 
-@app.route('/')
-def home():
-    return redirect(url_for('auth.login'))
+# Module-level app for `flask --app app ...` and `gunicorn app:app`
+app = create_app()
 
 
-# Run the app
+# Run the app (development server; initialises the database first)
 if __name__ == '__main__':
+    with app.app_context():
+        init_database()
+    warm_up(app)
     app.run(debug=True)
@@ -0,0 +1,90 @@
+# /benchmarks/datagen.py
+"""Synthetic parking data written straight through models.models.
+
+    generate(app, lots=20, spots_per_lot=200, reservations=20000, users=500, seed=42)
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from models.models import db, User, ParkingLot, ParkingSpot, ReserveSpot
+from utils.allocation import allocator
+from utils.counters import recompute_lot_counters
+from utils.revenue import backfill_revenue
+
+# Relative arrival weight per hour of day: morning and evening commute peaks
+HOURLY_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 10, 9, 6, 5, 5, 5, 5, 6, 8, 10, 9, 6, 4, 3, 2, 1]
+HISTORY_DAYS = 90
+OPEN_FRACTION = 0.6  # share of spots currently occupied
+BATCH = 5000
+
+
+def _insert(model, rows):
+    for i in range(0, len(rows), BATCH):
+        db.session.execute(db.insert(model), rows[i:i + BATCH])
+
+
+def _arrival(rng, now):
+    day = rng.randrange(HISTORY_DAYS)
+    hour = rng.choices(range(24), weights=HOURLY_WEIGHTS)[0]
+    arrival = now - timedelta(days=day, hours=now.hour - hour, minutes=rng.randrange(60))
+    # Today's hours after the current one have not happened yet: take yesterday's
+    return arrival - timedelta(days=1) if arrival > now else arrival
+
+
+def generate(app, lots=20, spots_per_lot=200, reservations=20000, users=500, seed=42):
+    """Fill the app's (empty) database. Returns a dict describing what was created."""
+    rng = random.Random(seed)
+    now = datetime.now().replace(second=0, microsecond=0)
+
+    with app.app_context():
+        _insert(User, [
+            {'email': f'bench{i}@example.com', 'password': 'bench', 'name': f'Bench User {i}',
+             'address': 'Bench Street', 'pin_code': f'{500000 + i % 100}', 'role': 'user'}
+            for i in range(users)
+        ])
+        _insert(ParkingLot, [
+            {'prime_location_name': f'Bench Lot {i}', 'price': rng.choice([10.0, 15.0, 20.0, 50.0]),
+             'address': f'Bench Road {i}', 'pin_code': f'{500000 + i % 100}', 'max_spots': spots_per_lot}
+            for i in range(lots)
+        ])
+        lot_ids = [row[0] for row in db.session.query(ParkingLot.id).order_by(ParkingLot.id)]
+        _insert(ParkingSpot, [{'lot_id': lot_id, 'status': 'A'} for lot_id in lot_ids for _ in range(spots_per_lot)])
+        spot_ids = [row[0] for row in db.session.query(ParkingSpot.id).order_by(ParkingSpot.id)]
+        user_ids = [row[0] for row in db.session.query(User.id).filter(User.role == 'user')]
+
+        # Closed history: commute-weighted arrivals, log-normal stays (median ~2h)
+        rows = []
+        for _ in range(reservations):
+            parked = _arrival(rng, now)
+            left = min(parked + timedelta(hours=rng.lognormvariate(0.7, 0.8)), now)
+            assert left >= parked, (parked, left)
+            hours = (left - parked).total_seconds() / 3600
+            rows.append({
+                'spot_id': rng.choice(spot_ids), 'user_id': rng.choice(user_ids),
+                'vehicle_no': f'TS{rng.randrange(10, 99)}AB{rng.randrange(1000, 9999)}',
+                'parking_timestamp': parked, 'leaving_timestamp': left,
+                'parking_cost': round(hours * 10, 2)
+            })
+
+        # Open sessions on a share of spots
+        occupied = rng.sample(spot_ids, int(len(spot_ids) * OPEN_FRACTION))
+        for number, spot_id in enumerate(occupied):
+            rows.append({
+                'spot_id': spot_id, 'user_id': rng.choice(user_ids),
+                'vehicle_no': f'TS{rng.randrange(10, 99)}OP{number:05d}',  # one open reservation per vehicle
+                'parking_timestamp': now - timedelta(minutes=rng.randrange(5, 600)),
+                'leaving_timestamp': None, 'parking_cost': 0
+            })
+        _insert(ReserveSpot, rows)
+        for i in range(0, len(occupied), BATCH):
+            db.session.execute(
+                db.update(ParkingSpot).where(ParkingSpot.id.in_(occupied[i:i + BATCH])).values(status='O')
+            )
+        db.session.commit()
+
+        recompute_lot_counters()
+        backfill_revenue()
+        allocator.rebuild()
+
+    return {'lots': lots, 'spots': len(spot_ids), 'reservations': len(rows), 'users': users}
@@ -0,0 +1,128 @@
+# /benchmarks/provisioning.py
+"""Benchmark growing and shrinking a lot: bulk SQL against the old per-row ORM loop.
+
+    python -m benchmarks.provisioning                    # 1k, 10k and 100k spots
+    python -m benchmarks.provisioning --sizes 1000,10000
+
+For each size, a fresh lot grows by that many spots and then shrinks back,
+once with utils/provisioning.py (one executemany INSERT, one set-based
+DELETE) and once the way the admin views used to do it (one ORM object per
+spot). Runs in a subprocess with its own temporary SQLite database.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+SIZES = [1000, 10000, 100000]
+
+
+# --- PER-ROW LOOPS (as the admin views did before utils/provisioning.py) ---
+def add_spots_per_row(lot_id, count):
+    from models.models import db, ParkingSpot
+    from utils.counters import adjust_lot_counters
+
+    for _ in range(count):
+        db.session.add(ParkingSpot(lot_id=lot_id, status='A'))
+    adjust_lot_counters(lot_id, available=count)
+
+
+def remove_free_spots_per_row(lot_id, count):
+    from models.models import db, ParkingSpot
+    from utils.counters import adjust_lot_counters
+
+    spots = ParkingSpot.query.filter_by(lot_id=lot_id, status='A').limit(count).all()
+    if len(spots) < count:
+        return False
+    for spot in spots:
+        db.session.delete(spot)
+    adjust_lot_counters(lot_id, available=-len(spots))
+    return True
+
+
+# --- WORKER (runs inside the subprocess) ---
+def _timed(action):
+    from models.models import db
+
+    started = time.perf_counter()
+    action()
+    db.session.commit()
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def run_worker(sizes, out_path):
+    from app import app, init_database
+    from models.models import db, ParkingLot
+    from utils.provisioning import add_spots, remove_free_spots
+
+    methods = {
+        'bulk': (add_spots, remove_free_spots),
+        'per_row': (add_spots_per_row, remove_free_spots_per_row),
+    }
+    results = []
+    with app.app_context():
+        init_database()
+        for size in sizes:
+            row = {'spots': size}
+            for name, (grow, shrink) in methods.items():
+                lot = ParkingLot(prime_location_name=f'Bench {name} {size}', price=10.0, max_spots=0)
+                db.session.add(lot)
+                db.session.commit()
+                row[f'{name}_add_ms'] = _timed(lambda: grow(lot.id, size))
+                row[f'{name}_remove_ms'] = _timed(lambda: shrink(lot.id, size))
+                db.session.expunge_all()  # per-row objects must not linger into the next run
+            results.append(row)
+
+    with open(out_path, 'w') as f:
+        json.dump(results, f)
+
+
+# --- ORCHESTRATION ---
+def measure(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = os.path.join(tmp, 'result.json')
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'provisioning.db')}")
+        env.pop('INSTRUMENTATION', None)
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.provisioning', '--worker',
+             '--sizes', ','.join(map(str, sizes)), '--out', out_path],
+            cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL
+        )
+        with open(out_path) as f:
+            return json.load(f)
+
+
+def print_report(results):
+    print(f"{'spots':>8}{'add bulk':>12}{'add per-row':>14}{'speedup':>9}"
+          f"{'remove bulk':>14}{'remove per-row':>16}{'speedup':>9}   (ms)")
+    for row in results:
+        add_speedup = row['per_row_add_ms'] / max(row['bulk_add_ms'], 0.1)
+        remove_speedup = row['per_row_remove_ms'] / max(row['bulk_remove_ms'], 0.1)
+        print(f"{row['spots']:>8}{row['bulk_add_ms']:>12}{row['per_row_add_ms']:>14}{add_speedup:>8.1f}x"
+              f"{row['bulk_remove_ms']:>14}{row['per_row_remove_ms']:>16}{remove_speedup:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='comma-separated spot counts')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    if args.worker:
+        run_worker(sizes, args.out)
+        return 0
+    print_report(measure(sizes))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# /benchmarks/run.py
+"""Benchmark the hot routes against synthetic data of several sizes.
+
+    python -m benchmarks.run                         # all sizes, compare with baselines
+    python -m benchmarks.run --sizes small,medium    # subset
+    python -m benchmarks.run --save                  # overwrite baselines/<size>.json
+
+Each size runs in a fresh subprocess with its own temporary SQLite database
+(DATABASE_URL), so the real instance/parking_app.db is never touched.
+A run fails (exit 1) when a route's query count grows, or its median latency
+exceeds the baseline by more than --tolerance.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+BASELINE_DIR = os.path.join(HERE, 'baselines')
+
+# name -> (lots, spots_per_lot, reservations, users)
+SIZES = {
+    'small': (5, 50, 2000, 100),
+    'medium': (20, 200, 20000, 500),
+    'large': (40, 500, 100000, 2000),
+}
+
+
+# --- WORKER (runs inside the subprocess) ---
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _measure(client, counter, iterations, request):
+    latencies, queries = [], []
+    started = time.perf_counter()
+    for i in range(iterations):
+        counter[0] = 0
+        t = time.perf_counter()
+        response = request(client, i)
+        latencies.append(time.perf_counter() - t)
+        queries.append(counter[0])
+        if response.status_code >= 400:
+            raise RuntimeError(f'{response.status_code} from {response.request.path}')
+    elapsed = time.perf_counter() - started
+    return {
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+        'p90_ms': round(_percentile(latencies, 90) * 1000, 3),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'throughput_rps': round(iterations / elapsed, 1),
+        'queries': int(statistics.median(queries)),
+    }
+
+
+def run_worker(size, iterations, out_path):
+    from sqlalchemy import event
+    from app import app, init_database
+    from benchmarks.datagen import generate
+    from models.models import db, ParkingLot, ReserveSpot, User
+
+    with app.app_context():
+        init_database()
+    created = generate(app, *SIZES[size])
+
+    counter = [0]
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: counter.__setitem__(0, counter[0] + 1))
+        user = User.query.filter_by(role='user').order_by(User.id).first()
+        lot_ids = [row[0] for row in db.session.query(ParkingLot.id).order_by(ParkingLot.available_count.desc())]
+
+    admin = app.test_client()
+    admin.post('/auth/login', data={'email': 'admin@gmail.com', 'password': 'admin'})
+    driver = app.test_client()
+    driver.post('/auth/login', data={'email': user.email, 'password': 'bench'})
+
+    results = {
+        'admin.dashboard': _measure(admin, counter, iterations, lambda c, i: c.get('/dashboard')),
+        'admin.spot_status': _measure(admin, counter, iterations, lambda c, i: c.get('/spots/status')),
+        'admin.summary': _measure(admin, counter, iterations, lambda c, i: c.get('/summary')),
+        'user.dashboard': _measure(driver, counter, iterations, lambda c, i: c.get('/user/dashboard')),
+        'user.book_spot': _measure(driver, counter, iterations, lambda c, i: c.post(
+            f'/user/book_spot/{lot_ids[i % len(lot_ids)]}', data={'vehicle_no': f'BENCH{i}'})),
+    }
+
+    with app.app_context():
+        open_ids = [row[0] for row in db.session.query(ReserveSpot.id).filter(
+            ReserveSpot.user_id == user.id, ReserveSpot.leaving_timestamp.is_(None),
+            ReserveSpot.vehicle_no.like('BENCH%'))]
+    results['user.release_spot'] = _measure(driver, counter, len(open_ids), lambda c, i: c.post(
+        f'/user/release_spot/{open_ids[i]}'))
+
+    with open(out_path, 'w') as f:
+        json.dump({'size': size, 'data': created, 'iterations': iterations, 'routes': results}, f, indent=2)
+
+
+# --- ORCHESTRATION ---
+def run_size(size, iterations):
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = os.path.join(tmp, 'result.json')
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        env.pop('INSTRUMENTATION', None)
+        env['RESPONSE_CACHE_SIZE'] = '0'  # measure the views' own work, not cache hits
+        env['ADMISSION_CONTROL'] = '0'    # one driver books back to back
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.run', '--worker', size,
+             '--iterations', str(iterations), '--out', out_path],
+            cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL
+        )
+        with open(out_path) as f:
+            return json.load(f)
+
+
+def compare(result, baseline, tolerance):
+    """List of human-readable regressions of `result` against `baseline`."""
+    problems = []
+    for route, current in result['routes'].items():
+        before = baseline['routes'].get(route)
+        if not before:
+            continue
+        if current['queries'] > before['queries']:
+            problems.append(f"{route}: queries {before['queries']} -> {current['queries']}")
+        if current['p50_ms'] > before['p50_ms'] * (1 + tolerance):
+            problems.append(f"{route}: p50 {before['p50_ms']}ms -> {current['p50_ms']}ms")
+    return problems
+
+
+def print_report(result):
+    data = result['data']
+    print(f"\n== {result['size']}: {data['lots']} lots, {data['spots']} spots, "
+          f"{data['reservations']} reservations, {data['users']} users")
+    print(f"{'route':<20}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'req/s':>10}{'queries':>9}")
+    for route, m in result['routes'].items():
+        print(f"{route:<20}{m['p50_ms']:>10}{m['p90_ms']:>10}{m['p99_ms']:>10}"
+              f"{m['throughput_rps']:>10}{m['queries']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(SIZES), help='comma-separated: ' + ', '.join(SIZES))
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--save', action='store_true', help='write results as the new baselines')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed p50 slowdown (0.5 = +50%%)')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.iterations, args.out)
+        return 0
+
+    regressions = []
+    for size in args.sizes.split(','):
+        result = run_size(size, args.iterations)
+        print_report(result)
+        baseline_path = os.path.join(BASELINE_DIR, f'{size}.json')
+        if args.save:
+            os.makedirs(BASELINE_DIR, exist_ok=True)
+            with open(baseline_path, 'w') as f:
+                json.dump(result, f, indent=2)
+                f.write('\n')
+            print(f"Baseline saved: {os.path.relpath(baseline_path, ROOT)}")
+        elif os.path.exists(baseline_path):
+            with open(baseline_path) as f:
+                problems = compare(result, json.load(f), args.tolerance)
+            regressions += [f'[{size}] {p}' for p in problems]
+
+    if regressions:
+        print('\nREGRESSIONS:\n  ' + '\n  '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# /benchmarks/startup.py
+"""Benchmark cold start: importing the app, warming in-memory state and the first request.
+
+    python -m benchmarks.startup              # compare with baselines/startup.json
+    python -m benchmarks.startup --save       # overwrite the baseline
+
+The database is created once (init-db) in a temporary directory; each sample
+then starts a fresh interpreter, as a new worker process would.
+A run fails (exit 1) when the median cold start exceeds the baseline by more
+than --tolerance.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+BASELINE_PATH = os.path.join(HERE, 'baselines', 'startup.json')
+
+PHASES = ['import_ms', 'warm_ms', 'first_request_ms', 'cold_start_ms']
+
+
+# --- WORKER (runs inside the subprocess) ---
+def run_worker(out_path):
+    started = time.perf_counter()
+    from app import app, warm_up
+    imported = time.perf_counter()
+    warm_up(app)
+    warmed = time.perf_counter()
+    response = app.test_client().get('/auth/login')
+    finished = time.perf_counter()
+    if response.status_code != 200:
+        raise RuntimeError(f'{response.status_code} from /auth/login')
+
+    with open(out_path, 'w') as f:
+        json.dump({
+            'import_ms': (imported - started) * 1000,
+            'warm_ms': (warmed - imported) * 1000,
+            'first_request_ms': (finished - warmed) * 1000,
+            'cold_start_ms': (finished - started) * 1000,
+        }, f)
+
+
+# --- ORCHESTRATION ---
+def measure(runs):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}")
+        env.pop('INSTRUMENTATION', None)
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'],
+                       cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+        samples = {phase: [] for phase in PHASES}
+        out_path = os.path.join(tmp, 'sample.json')
+        for _ in range(runs):
+            subprocess.run([sys.executable, '-m', 'benchmarks.startup', '--worker', '--out', out_path],
+                           cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+            with open(out_path) as f:
+                for phase, value in json.load(f).items():
+                    samples[phase].append(value)
+
+    return {'runs': runs, 'phases': {phase: round(statistics.median(values), 1)
+                                     for phase, values in samples.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--save', action='store_true', help='write results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed slowdown (0.5 = +50%%)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.out)
+        return 0
+
+    result = measure(args.runs)
+    print(f"\n== startup (median of {result['runs']} fresh processes)")
+    for phase, value in result['phases'].items():
+        print(f"{phase:<20}{value:>10} ms")
+
+    if args.save:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(result, f, indent=2)
+            f.write('\n')
+        print(f"Baseline saved: {os.path.relpath(BASELINE_PATH, ROOT)}")
+    elif os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            before = json.load(f)['phases']['cold_start_ms']
+        current = result['phases']['cold_start_ms']
+        if current > before * (1 + args.tolerance):
+            print(f"\nREGRESSION: cold start {before}ms -> {current}ms")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
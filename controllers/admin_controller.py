@@ -1,57 +1,38 @@
-from flask import Blueprint, render_template, request, redirect, session, url_for, flash
-from models.models import db, User, ParkingLot, ParkingSpot ,ReserveSpot
+import json
+from flask import Blueprint, render_template, request, redirect, session, url_for, flash, Response, stream_with_context
+from datetime import datetime, timedelta
+from models.models import db, User, ParkingLot, ParkingSpot ,ReserveSpot, ScheduledReservation, Job
+from utils.occupancy import lot_occupancy_snapshot, latest_reservation
+from utils.allocation import allocator
+from utils.counters import adjust_lot_counters, bump_lot_version
+from utils.revenue import revenue_by_lot
+from utils.provisioning import create_lot, resize_lot, upcoming_hold, SHRINK_INLINE_LIMIT
+from utils.jobs import jobs
+from utils.export import export_chunks, parquet_available, FORMATS
+from utils.analytics import analytics, analytics_available
+from utils.cache import page_cache
+from utils.sessions import login_required
+from utils.events import publish_lot
+from utils.pagination import user_page
+from utils.pricing import compile_tariff, tariffs
+from utils.scheduling import schedule
+from utils.geo import lot_grid
+from utils.vehicles import active_sessions
 
 admin_bp = Blueprint('admin', __name__, template_folder='../templates')
 
-# Middleware: allow only admins
-def admin_only(f):
-    from functools import wraps
-    @wraps(f)
-    def wrapper(*args, **kwargs):
-        if session.get('user_role') != 'admin':
-            flash("Access denied. Admins only!", "danger")
-            return redirect(url_for('auth.login'))
-        return f(*args, **kwargs)
-    return wrapper
-
-
-
-
-
-
 # Route: Admin Dashboard
 
 @admin_bp.route('/dashboard')
-@admin_only
+@login_required(role='admin')
+@page_cache.cached('admin.dashboard')
 def dashboard():
-    lots = ParkingLot.query.all()
-    total_lots = len(lots)
-    total_spots = ParkingSpot.query.count()
-    occupied_spots = ParkingSpot.query.filter_by(status='O').count()
-    available_spots = ParkingSpot.query.filter_by(status='A').count()
-
-    # Prepare lot data with spot and reservation info
-    lot_data = []
-    for lot in lots:
-        spot_details = []
-        occupied_count = 0
-
-        for spot in lot.spots:
-            latest_reservation = ReserveSpot.query.filter_by(spot_id=spot.id).order_by(ReserveSpot.parking_timestamp.desc()).first()
-            if spot.status == 'O':
-                occupied_count += 1
-            spot_details.append({
-                'spot': spot,
-                'reservation': latest_reservation
-            })
-
-        # Append lot and spots with extra 'occupied_count'
-        lot_data.append({
-            'lot': lot,
-            'spots': spot_details,
-            'occupied_count': occupied_count,
-            'max_spots': lot.max_spots
-        })
+    # Lots, spots and latest reservations in a constant number of queries
+    lot_data = lot_occupancy_snapshot()
+    total_lots = len(lot_data)
+    total_spots = sum(len(entry['spots']) for entry in lot_data)
+    occupied_spots = sum(entry['occupied_count'] for entry in lot_data)
+    available_spots = total_spots - occupied_spots
 
     pie_data = {
         'labels': ['Occupied', 'Available'],
@@ -73,7 +54,7 @@ def dashboard():
 
 # Route: Add Parking Lot
 @admin_bp.route('/add_lot', methods=['GET', 'POST'])
-@admin_only
+@login_required(role='admin')
 
 def add_lot():
     if request.method == 'POST':
@@ -82,23 +63,15 @@ def add_lot():
         pin = request.form['pin_code']
         price = float(request.form['price'])
         total_spots = int(request.form['spots'])
-
-        lot = ParkingLot(
-            prime_location_name=name,
-            address=address,
-            pin_code=pin,
-            price=price,
-            max_spots=total_spots
-        )
-        db.session.add(lot)
-        db.session.commit()
-
-        # Auto-create parking spots
-        for i in range(total_spots):
-            spot = ParkingSpot(lot_id=lot.id, status='A')
-            db.session.add(spot)
-
-        db.session.commit()
+        try:
+            latitude, longitude = _coordinates(request.form)
+        except ValueError:
+            flash("Latitude and longitude must be numbers.", "danger")
+            return redirect(url_for('admin.add_lot'))
+
+        # Lot and all spots in one bulk insert
+        lot = create_lot(name, address, pin, price, total_spots, latitude, longitude)
+        publish_lot(lot.id)
         flash("New parking lot added with spots!", "success")
         return redirect(url_for('admin.dashboard'))
 
@@ -108,7 +81,7 @@ def add_lot():
 
 
 @admin_bp.route('/lot/edit/<int:lot_id>', methods=['GET', 'POST'])
-@admin_only
+@login_required(role='admin')
 
 
 def edit_lot(lot_id):
@@ -119,27 +92,49 @@ def edit_lot(lot_id):
         lot.address = request.form['address']
         lot.pin_code = request.form['pin_code']
         lot.price = float(request.form['price'])
+        lot.tariff = request.form.get('tariff', '').strip() or None
+        try:
+            lot.latitude, lot.longitude = _coordinates(request.form)
+        except ValueError:
+            db.session.rollback()
+            flash("Latitude and longitude must be numbers.", "danger")
+            return redirect(url_for('admin.edit_lot', lot_id=lot_id))
+
+        # Reject a malformed tariff before anything is saved
+        try:
+            compile_tariff(lot.price, lot.tariff)
+        except ValueError as e:
+            db.session.rollback()
+            flash(f"Invalid tariff: {e}", "danger")
+            return redirect(url_for('admin.edit_lot', lot_id=lot_id))
 
         new_total_spots = int(request.form['max_spots'])
-        current_total_spots = len(lot.spots)
-
-        if new_total_spots > current_total_spots:
-            # Add new spots
-            for _ in range(new_total_spots - current_total_spots):
-                new_spot = ParkingSpot(lot_id=lot.id, status='A')
-                db.session.add(new_spot)
-        elif new_total_spots < current_total_spots:
-            # Delete only unoccupied spots
-            extra_spots = ParkingSpot.query.filter_by(lot_id=lot.id, status='A').limit(current_total_spots - new_total_spots).all()
-            if len(extra_spots) < (current_total_spots - new_total_spots):
-                flash("Cannot reduce to that many spots. Some spots are still occupied.", "danger")
-                return redirect(url_for('admin.edit_lot', lot_id=lot_id))
-
-            for spot in extra_spots:
-                db.session.delete(spot)
-
-        lot.max_spots = new_total_spots
+
+        # Large shrinks delete in chunks on the background worker
+        current_total = ParkingSpot.query.filter_by(lot_id=lot.id).count()
+        if current_total - new_total_spots > SHRINK_INLINE_LIMIT:
+            bump_lot_version(lot.id)
+            db.session.commit()
+            tariffs.invalidate(lot.id)
+            lot_grid.invalidate()
+            job = jobs.enqueue('shrink_lot', created_by=session.get('user_id'),
+                               lot_id=lot.id, new_total=new_total_spots)
+            flash("Lot details saved. Removing spots in the background.", "info")
+            return redirect(url_for('admin.job_status', job_id=job.id))
+
+        # Grow with a bulk insert, shrink with one DELETE of free spots only
+        if not resize_lot(lot, new_total_spots):
+            flash("Cannot reduce to that many spots. Some spots are still occupied.", "danger")
+            return redirect(url_for('admin.edit_lot', lot_id=lot_id))
+
+        bump_lot_version(lot.id)
         db.session.commit()
+        allocator.forget_lot(lot.id)
+        schedule.forget_lot(lot.id)
+        tariffs.invalidate(lot.id)
+        analytics.invalidate(lot.id)
+        lot_grid.invalidate()
+        publish_lot(lot.id)
         flash("Parking lot updated successfully!", "success")
         return redirect(url_for('admin.dashboard'))
 
@@ -150,28 +145,37 @@ def edit_lot(lot_id):
 
 
 
+def _coordinates(form):
+    """Optional (latitude, longitude) from a lot form; ValueError if not numbers."""
+    lat = form.get('latitude', '').strip()
+    lng = form.get('longitude', '').strip()
+    return (float(lat) if lat else None), (float(lng) if lng else None)
+
+
 # Route: Delete Parking Lot
 @admin_bp.route('/delete_lot/<int:lot_id>')
-@admin_only
+@login_required(role='admin')
 
 def delete_lot(lot_id):
-    lot = ParkingLot.query.get_or_404(lot_id)
+    ParkingLot.query.get_or_404(lot_id)
     occupied = ParkingSpot.query.filter_by(lot_id=lot_id, status='O').first()
     if occupied:
         flash("Cannot delete! Some spots are still occupied.", "warning")
         return redirect(url_for('admin.dashboard'))
 
-    ParkingSpot.query.filter_by(lot_id=lot_id).delete()
-    db.session.delete(lot)
-    db.session.commit()
+    if upcoming_hold(lot_id):
+        flash("Cannot delete! Some spots have upcoming reservations.", "warning")
+        return redirect(url_for('admin.dashboard'))
 
-    flash("Parking lot and its spots removed.", "info")
-    return redirect(url_for('admin.dashboard'))
+    # Spots are closed and deleted in chunks by the background worker
+    job = jobs.enqueue('delete_lot', created_by=session.get('user_id'), lot_id=lot_id)
+    flash("Deleting the parking lot in the background.", "info")
+    return redirect(url_for('admin.job_status', job_id=job.id))
 
 
 # Route: Delete Parking Spot
 @admin_bp.route('/delete_spot/<int:spot_id>', methods=['POST'])
-@admin_only
+@login_required(role='admin')
 def delete_spot(spot_id):
     spot = ParkingSpot.query.get_or_404(spot_id)
 
@@ -179,8 +183,21 @@ def delete_spot(spot_id):
         flash("Cannot delete an occupied spot.", "warning")
         return redirect(url_for('admin.dashboard'))
 
+    upcoming = ScheduledReservation.query.filter(
+        ScheduledReservation.spot_id == spot_id, ScheduledReservation.status == 'H',
+        ScheduledReservation.end_time > datetime.now()
+    ).first()
+    if upcoming:
+        flash("Cannot delete a spot with an upcoming reservation.", "warning")
+        return redirect(url_for('admin.dashboard'))
+
+    lot_id = spot.lot_id
     db.session.delete(spot)
+    adjust_lot_counters(lot_id, available=-1)
     db.session.commit()
+    allocator.forget_lot(lot_id)
+    schedule.forget_lot(lot_id)
+    publish_lot(lot_id, spot_id, 'deleted')
 
     flash("Parking spot deleted successfully.", "info")
     return redirect(url_for('admin.dashboard'))
@@ -190,36 +207,33 @@ def delete_spot(spot_id):
 
 # Route: View Users
 @admin_bp.route('/users')
-@admin_only
+@login_required(role='admin')
 def registered_users():
-    users = User.query.filter_by(role='user').all()
-    return render_template('admin/users.html', users=users)
+    # Keyset pages on id; "Load more" asks for the rows after the last id shown
+    users, next_after = user_page(request.args.get('after', type=int))
+    if request.args.get('partial'):
+        html = render_template('partials/user_rows.html', users=users)
+        return html, 200, {'X-Next-After': str(next_after or '')}
+    return render_template('admin/users.html', users=users, next_after=next_after)
 
 
 
 
 
 @admin_bp.route('/spots/status')
-
-
+@page_cache.cached('admin.spot_status')
 def spot_status():
-    lots = ParkingLot.query.all()
-
-    # Preload parking spots and their latest reservation (if any)
+    # Parking spots and their latest reservation (if any), loaded in bulk
     all_lot_data = []
-    for lot in lots:
-        spot_data = []
-        for spot in lot.spots:
-            # Get latest reservation
-            reservation = ReserveSpot.query.filter_by(spot_id=spot.id).order_by(ReserveSpot.parking_timestamp.desc()).first()
-            spot_data.append({
-                'id': spot.id,
-                'status': spot.status,
-                'reservation': reservation  # can be None
-            })
+    for entry in lot_occupancy_snapshot():
+        spot_data = [{
+            'id': s['spot'].id,
+            'status': s['spot'].status,
+            'reservation': s['reservation']  # can be None
+        } for s in entry['spots']]
 
         all_lot_data.append({
-            'lot': lot,
+            'lot': entry['lot'],
             'spots': spot_data
         })
 
@@ -235,32 +249,134 @@ def view_vehicle_details(reservation_id):
 
 
 @admin_bp.route('/spot/<int:spot_id>')
-@admin_only
+@login_required(role='admin')
 
 def view_spot(spot_id):
     spot = ParkingSpot.query.get_or_404(spot_id)
-    reservation = ReserveSpot.query.filter_by(spot_id=spot_id).order_by(ReserveSpot.parking_timestamp.desc()).first()
+    reservation = latest_reservation(spot_id)
     return render_template('admin/view_spot.html', spot=spot, reservation=reservation)
 
 
+# Route: Parked vehicles by plate (exact or partial), or one user's active sessions
+@admin_bp.route('/vehicles/search')
+@login_required(role='admin')
+def search_vehicles():
+    plate = request.args.get('q', '').strip()
+    user_id = request.args.get('user', type=int)
+    if user_id:
+        sessions = active_sessions.for_user(user_id)
+    elif plate:
+        sessions = active_sessions.search(plate)
+    else:
+        sessions = []
+
+    lots, users = {}, {}
+    if sessions:
+        lots = dict(db.session.query(ParkingLot.id, ParkingLot.prime_location_name)
+                    .filter(ParkingLot.id.in_({s.lot_id for s in sessions})))
+        users = {user.id: user for user in User.query.filter(User.id.in_({s.user_id for s in sessions}))}
+    return render_template('admin/vehicle_search.html', q=plate, user_id=user_id,
+                           sessions=sessions, lots=lots, users=users)
+
+
 @admin_bp.route('/summary')
-@admin_only
+@login_required(role='admin')
+@page_cache.cached('admin.summary')
 def summary():
+    # Optional date range (YYYY-MM-DD) on the day reservations were released
+    start = _parse_day(request.args.get('start'))
+    end = _parse_day(request.args.get('end'))
+
     # Fetch required data from DB
     lots = ParkingLot.query.all()
+    revenue = revenue_by_lot(start, end)
     summary_data = []
 
     for lot in lots:
-        total_spots = lot.max_spots
-        occupied = sum(1 for s in lot.spots if s.status == 'O')
-        available = total_spots - occupied
-        revenue = sum(r.parking_cost for s in lot.spots for r in s.reservations)
-
+        # Occupancy comes from the per-lot counters, revenue from the daily rollup
         summary_data.append({
+            'lot_id': lot.id,
             'location': lot.prime_location_name,
-            'occupied': occupied,
-            'available': available,
-            'revenue': revenue
+            'occupied': lot.occupied_count,
+            'available': lot.available_count,
+            'revenue': revenue.get(lot.id, 0)
         })
 
-    return render_template('admin/summary.html', data=summary_data )
+    return render_template('admin/summary.html', data=summary_data,
+                           start=request.args.get('start', ''), end=request.args.get('end', ''),
+                           parquet=parquet_available())
+
+
+@admin_bp.route('/summary/rebuild', methods=['POST'])
+@login_required(role='admin')
+def rebuild_revenue():
+    job = jobs.enqueue('backfill_revenue', created_by=session.get('user_id'))
+    flash("Rebuilding revenue totals in the background.", "info")
+    return redirect(url_for('admin.job_status', job_id=job.id))
+
+
+@admin_bp.route('/summary/archive', methods=['POST'])
+@login_required(role='admin')
+def archive_history():
+    job = jobs.enqueue('archive_reservations', created_by=session.get('user_id'))
+    flash("Archiving old reservations in the background.", "info")
+    return redirect(url_for('admin.job_status', job_id=job.id))
+
+
+# Route: Utilization heatmap, peak occupancy, dwell time and turnover
+@admin_bp.route('/analytics')
+@login_required(role='admin')
+def occupancy_analytics():
+    lot_id = request.args.get('lot', type=int)
+    end = _parse_day(request.args.get('end')) or datetime.now().date()
+    start = _parse_day(request.args.get('start')) or end - timedelta(days=29)
+    if start > end:
+        start, end = end, start
+
+    stats = None
+    if analytics_available():
+        stats = analytics.get(lot_id, start, end + timedelta(days=1))  # "To" day is inclusive
+    else:
+        flash("Analytics needs NumPy installed.", "warning")
+
+    return render_template('admin/analytics.html', stats=stats,
+                           lots=ParkingLot.query.order_by(ParkingLot.id).all(), lot_id=lot_id,
+                           start=start.isoformat(), end=end.isoformat(),
+                           weekdays=['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'])
+
+
+# Route: Streaming reservation export (?start=&end=&lot=&user=&format=csv|parquet)
+@admin_bp.route('/export/reservations')
+@login_required(role='admin')
+def export_reservations():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS or (fmt == 'parquet' and not parquet_available()):
+        flash(f"Export format '{fmt}' is not available.", "danger")
+        return redirect(url_for('admin.summary'))
+
+    start = _parse_day(request.args.get('start'))
+    end = _parse_day(request.args.get('end'))
+    end = end + timedelta(days=1) if end else None  # "To" day is inclusive
+    chunks = export_chunks(fmt, start, end, request.args.get('lot', type=int), request.args.get('user', type=int))
+
+    # Chunks are generated while the response is sent, one cursor batch at a time
+    return Response(stream_with_context(chunks), mimetype=FORMATS[fmt], headers={
+        'Content-Disposition': f'attachment; filename=reservations.{fmt}'
+    })
+
+
+# Route: Background job progress
+@admin_bp.route('/jobs/<int:job_id>')
+@login_required(role='admin')
+def job_status(job_id):
+    job = Job.query.get_or_404(job_id)
+    result = json.loads(job.result) if job.result else None
+    return render_template('admin/job_status.html', job=job, result=result)
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        flash(f"Ignoring invalid date '{value}'.", "warning")
+        return None
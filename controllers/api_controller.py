@@ -0,0 +1,218 @@
+# /controllers/api_controller.py
+
+import hmac
+import json
+from functools import wraps
+from flask import Blueprint, Response, current_app, jsonify, request, session
+from models.models import db, ParkingLot, ParkingSpot
+from utils.counters import lot_versions
+from utils.sessions import login_required, current_user
+from utils.gate import MAX_EVENTS_PER_REQUEST, ingest_events
+from utils.occupancy import latest_reservation
+from utils.pagination import reservation_page
+from utils.geo import DEFAULT_RADIUS_KM, DEFAULT_RESULTS, search_lots, valid_point
+
+api_bp = Blueprint('api', __name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+# --- HELPERS ---
+def _page_args():
+    """(cursor, limit) from the query string; cursor is the last id already seen."""
+    cursor = request.args.get('cursor', type=int)
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    return cursor, max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _page(items, limit, key):
+    """Trim the limit+1 probe row and build the next cursor."""
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = key(items[-1]) if has_more else None
+    return items, next_cursor
+
+
+def _conditional(etag, build):
+    """Return 304 if the client already holds `etag`, else build the JSON body."""
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _lot_json(lot):
+    return {
+        'id': lot.id,
+        'name': lot.prime_location_name,
+        'address': lot.address,
+        'pin_code': lot.pin_code,
+        'price': lot.price,
+        'max_spots': lot.max_spots,
+        'occupied': lot.occupied_count,
+        'available': lot.available_count,
+        'version': lot.version
+    }
+
+
+def _reservation_json(reservation):
+    return {
+        'id': reservation.id,
+        'spot_id': reservation.spot_id,
+        'user_id': reservation.user_id,
+        'vehicle_no': reservation.vehicle_no,
+        'parking_timestamp': reservation.parking_timestamp.isoformat() if reservation.parking_timestamp else None,
+        'leaving_timestamp': reservation.leaving_timestamp.isoformat() if reservation.leaving_timestamp else None,
+        'parking_cost': reservation.parking_cost
+    }
+
+
+def gate_access(view):
+    """Gate devices send X-Gate-Token (config GATE_API_TOKEN); logged-in admins may post too."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get('GATE_API_TOKEN')
+        sent = request.headers.get('X-Gate-Token', '')
+        if token and hmac.compare_digest(sent.encode(), token.encode()):
+            return view(*args, **kwargs)
+        user = current_user()
+        if user is not None and user.role == 'admin':
+            return view(*args, **kwargs)
+        return jsonify({'error': 'gate token or admin login required'}), 401
+    return wrapper
+
+
+def _gate_events_body():
+    """Events from a JSON array, {"events": [...]}, or NDJSON (one event per line)."""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+    body = request.get_json(force=True, silent=True)
+    if body is None:
+        raise ValueError('invalid JSON')
+    return body.get('events') if isinstance(body, dict) else body
+
+
+def _lot_version(lot_id):
+    return db.session.query(ParkingLot.version).filter(ParkingLot.id == lot_id).scalar()
+
+
+# Route: All lots with availability
+@api_bp.route('/lots')
+@login_required(api=True)
+def lots():
+    cursor, limit = _page_args()
+
+    # One aggregate over parking_lots changes whenever any lot is added, edited or booked
+    count, max_id, versions = lot_versions()
+    etag = f'lots-{count}-{max_id}-{versions}-{cursor}-{limit}'
+
+    def build():
+        query = ParkingLot.query.order_by(ParkingLot.id)
+        if cursor is not None:
+            query = query.filter(ParkingLot.id > cursor)
+        page, next_cursor = _page(query.limit(limit + 1).all(), limit, key=lambda lot: lot.id)
+        return {'lots': [_lot_json(lot) for lot in page], 'next_cursor': next_cursor}
+
+    return _conditional(etag, build)
+
+
+# Route: Nearest lots with free spots (?pin_code= or ?lat=&lng=, optional radius_km (capped at 50), limit)
+@api_bp.route('/lots/search')
+@login_required(api=True)
+def lot_search():
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if (lat is not None or lng is not None) and not valid_point(lat, lng):
+        return jsonify({'error': 'lat and lng must be valid coordinates'}), 400
+    results = search_lots(
+        pin_code=request.args.get('pin_code'),
+        lat=lat,
+        lng=lng,
+        radius_km=request.args.get('radius_km', DEFAULT_RADIUS_KM, type=float),
+        limit=max(1, min(request.args.get('limit', DEFAULT_RESULTS, type=int), MAX_PAGE_SIZE))
+    )
+    return jsonify({'lots': [
+        dict(_lot_json(lot), distance_km=round(distance, 3) if distance is not None else None)
+        for lot, distance in results
+    ]})
+
+
+# Route: One lot's availability
+@api_bp.route('/lots/<int:lot_id>')
+@login_required(api=True)
+def lot_detail(lot_id):
+    lot = ParkingLot.query.get_or_404(lot_id)
+    return _conditional(f'lot-{lot.id}-v{lot.version}', lambda: _lot_json(lot))
+
+
+# Route: Spots of a lot
+@api_bp.route('/lots/<int:lot_id>/spots')
+@login_required(api=True)
+def lot_spots(lot_id):
+    version = _lot_version(lot_id)
+    if version is None:
+        return jsonify({'error': 'lot not found'}), 404
+    cursor, limit = _page_args()
+    status = request.args.get('status')
+
+    def build():
+        query = ParkingSpot.query.filter_by(lot_id=lot_id).order_by(ParkingSpot.id)
+        if status in ('A', 'O'):
+            query = query.filter_by(status=status)
+        if cursor is not None:
+            query = query.filter(ParkingSpot.id > cursor)
+        page, next_cursor = _page(query.limit(limit + 1).all(), limit, key=lambda spot: spot.id)
+        return {
+            'lot_id': lot_id,
+            'spots': [{'id': spot.id, 'status': spot.status} for spot in page],
+            'next_cursor': next_cursor
+        }
+
+    return _conditional(f'lot-{lot_id}-v{version}-spots-{status}-{cursor}-{limit}', build)
+
+
+# Route: Spot details (latest reservation visible to admins only)
+@api_bp.route('/spots/<int:spot_id>')
+@login_required(api=True)
+def spot_detail(spot_id):
+    spot = ParkingSpot.query.get_or_404(spot_id)
+    is_admin = session.get('user_role') == 'admin'
+    version = _lot_version(spot.lot_id)
+
+    def build():
+        data = {'id': spot.id, 'lot_id': spot.lot_id, 'status': spot.status}
+        if is_admin:
+            reservation = latest_reservation(spot.id)
+            data['reservation'] = _reservation_json(reservation) if reservation else None
+        return data
+
+    return _conditional(f'spot-{spot.id}-v{version}-{int(is_admin)}', build)
+
+
+# Route: Current user's reservations (archived ones included), newest first
+@api_bp.route('/me/reservations')
+@login_required(api=True)
+def my_reservations():
+    _, limit = _page_args()
+    # Cursor is the opaque next_cursor of the previous page, as in reservation_page
+    page, next_cursor = reservation_page(session['user_id'], request.args.get('cursor'), limit)
+    return jsonify({'reservations': [_reservation_json(r) for r in page], 'next_cursor': next_cursor})
+
+
+# Route: Batch of gate sensor / plate reader events (entries and exits)
+@api_bp.route('/gate/events', methods=['POST'])
+@gate_access
+def gate_events():
+    try:
+        events = _gate_events_body()
+    except ValueError:
+        return jsonify({'error': 'body must be JSON or NDJSON'}), 400
+    if not isinstance(events, list):
+        return jsonify({'error': 'expected a list of events'}), 400
+    if len(events) > MAX_EVENTS_PER_REQUEST:
+        return jsonify({'error': f'at most {MAX_EVENTS_PER_REQUEST} events per request'}), 413
+    return jsonify(ingest_events(events))
@@ -1,6 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from models.models import db, User, ParkingLot, ParkingSpot, ReserveSpot
-from datetime import datetime
+from models.models import db, User, ReserveSpot
+from utils.allocation import book_spot as allocate_spot, release_spot as free_spot
+from utils.admission import admission, AdmissionRejected
+from utils.sessions import login_required, login_user
+from utils.vehicles import VehicleAlreadyParked
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -48,8 +51,7 @@ def login():
         user = User.query.filter_by(email=email).first()
 
         if user and user.password == password:  # no password check
-            session['user_id'] = user.id
-            session['user_role'] = user.role
+            login_user(user)
             flash('Login successful!', 'success')
             if user.role == 'admin':
                 return redirect(url_for('admin.dashboard'))
@@ -73,26 +75,20 @@ def logout():
 # BOOK PARKING SPOT
 # -----------------------
 @auth_bp.route('/book_spot/<int:lot_id>')
+@login_required()
 def book_spot(lot_id):
-    user_id = session.get('user_id')
-    if not user_id:
-        flash('Please login first.', 'warning')
-        return redirect(url_for('auth.login'))
+    user_id = session['user_id']
 
-    spot = ParkingSpot.query.filter_by(lot_id=lot_id, status='A').first()
-    if not spot:
+    try:
+        with admission.admit('book', lot_id, user_id):
+            reservation = allocate_spot(lot_id, user_id, request.args.get('vehicle_no', ''))
+    except (AdmissionRejected, VehicleAlreadyParked) as e:
+        flash(e.message, 'warning')
+        return redirect(url_for('user.dashboard'))
+    if not reservation:
         flash('No available spots in this lot.', 'warning')
         return redirect(url_for('user.dashboard'))
 
-    spot.status = 'O'
-    reservation = ReserveSpot(
-        spot_id=spot.id,
-        user_id=user_id,
-        parking_timestamp=datetime.now()
-    )
-    db.session.add(reservation)
-    db.session.commit()
-
     flash('Spot booked successfully.', 'success')
     return redirect(url_for('user.dashboard'))
 
@@ -100,11 +96,9 @@ def book_spot(lot_id):
 # RELEASE PARKING SPOT
 # -----------------------
 @auth_bp.route('/release_spot/<int:reservation_id>')
+@login_required()
 def release_spot(reservation_id):
-    user_id = session.get('user_id')
-    if not user_id:
-        flash('Please login first.', 'warning')
-        return redirect(url_for('auth.login'))
+    user_id = session['user_id']
 
     reservation = ReserveSpot.query.get(reservation_id)
     if not reservation or reservation.user_id != user_id:
@@ -115,12 +109,16 @@ def release_spot(reservation_id):
         flash('Spot already released.', 'info')
         return redirect(url_for('user.dashboard'))
 
-    reservation.leaving_timestamp = datetime.now()
-    duration = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
-    reservation.cost = round(duration * 20, 2)  # ₹20/hour
-    reservation.spot.status = 'A'
+    try:
+        with admission.admit('release', reservation.spot.lot_id, user_id, check_full=False):
+            released = free_spot(reservation)  # Charged at the lot's tariff
+    except AdmissionRejected as e:
+        flash(e.message, 'warning')
+        return redirect(url_for('user.dashboard'))
 
-    db.session.commit()
+    if released is None:  # closed meanwhile by another request or a gate exit
+        flash('Spot already released.', 'info')
+        return redirect(url_for('user.dashboard'))
 
     flash('Spot released successfully.', 'success')
     return redirect(url_for('user.dashboard'))
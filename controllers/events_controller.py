@@ -0,0 +1,33 @@
+# /controllers/events_controller.py
+
+from flask import Blueprint, Response, current_app, request
+from utils.events import broker, can_stream, sse_stream
+from utils.sessions import current_user
+
+events_bp = Blueprint('events', __name__)
+
+
+# Route: Live occupancy stream (Server-Sent Events)
+@events_bp.route('/occupancy')
+def occupancy():
+    if current_user() is None:
+        return Response('Please login first.', status=401)
+    if not can_stream(request.environ):
+        return Response('Live updates need a threaded or gevent worker.', status=503)
+
+    q = broker.subscribe(current_app.config['SSE_MAX_SUBSCRIBERS'])
+    if q is None:
+        return Response('Too many live connections, retry shortly.', status=503, headers={'Retry-After': '30'})
+    response = Response(
+        sse_stream(q),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # The generator's finally only runs once it has started; this runs either way
+    response.call_on_close(lambda: broker.unsubscribe(q))
+    try:
+        broker.watch(current_app._get_current_object())
+    except Exception:
+        broker.unsubscribe(q)
+        raise
+    return response
@@ -1,49 +1,83 @@
 # /controllers/user_controller.py
 
 from flask import Blueprint, render_template, session, redirect, url_for, flash, request
-from models.models import db, ParkingLot, ParkingSpot, ReserveSpot, User
+from models.models import db, ParkingLot, ParkingSpot, ReserveSpot, ScheduledReservation
 from datetime import datetime
-from sqlalchemy.orm import joinedload
-from sqlalchemy import and_
+from utils.allocation import allocator, book_spot as allocate_spot, release_spot as free_spot
+from utils.pagination import reservation_page
+from utils.archive import history
+from utils.scheduling import WALKIN_HORIZON, create_hold, close_hold
+from utils.geo import DEFAULT_RADIUS_KM, search_lots, valid_point
+from utils.cache import page_cache
+from utils.admission import admission, AdmissionRejected
+from utils.sessions import login_required, current_user
+from utils.vehicles import VehicleAlreadyParked
 
 user_bp = Blueprint('user', __name__, template_folder='../templates')
 
 
 @user_bp.route('/dashboard')
+@login_required(role='user')
 def dashboard():
-    if session.get('user_role') != 'user':
-        flash("Please login as a user to access the dashboard.", "warning")
-        return redirect(url_for('auth.login'))
-
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-
-    lots = ParkingLot.query.options(joinedload(ParkingLot.spots)).all()
-    reservations = ReserveSpot.query.filter_by(user_id=user_id).order_by(ReserveSpot.parking_timestamp.desc()).all()
-
-    # Format timestamps
-    for res in reservations:
-        res.parking_time_str = res.parking_timestamp.strftime('%Y-%m-%d %H:%M') if res.parking_timestamp else ''
-        res.leaving_time_str = res.leaving_timestamp.strftime('%Y-%m-%d %H:%M') if res.leaving_timestamp else ''
+    user = current_user()
+    user_id = user.id
+
+    # Nearest lots with free spots for the search (pin code, name or coordinates);
+    # availability comes from the lot counters, not the spot table
+    search = request.args.get('q', '').strip()
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    radius = request.args.get('radius', DEFAULT_RADIUS_KM, type=float)  # capped by search_lots
+    if (lat is not None or lng is not None) and not valid_point(lat, lng):
+        flash("Invalid coordinates; showing all lots.", "warning")
+        lat = lng = None
+    results = search_lots(
+        pin_code=search if search.isdigit() else None,
+        name=search if search and not search.isdigit() else None,
+        lat=lat, lng=lng, radius_km=radius
+    )
+    lots = [{
+        'lot': lot,
+        'distance_km': round(distance, 1) if distance is not None else None,
+        'next_spot': allocator.peek(lot.id)
+    } for lot, distance in results]
+
+    # First page of history only; older rows load on demand
+    reservations, next_cursor = reservation_page(user_id)
+    holds = ScheduledReservation.query.filter(
+        ScheduledReservation.user_id == user_id, ScheduledReservation.status == 'H',
+        ScheduledReservation.end_time > datetime.now()
+    ).order_by(ScheduledReservation.start_time).all()
 
     return render_template(
         'user_dashboard.html',
         lots=lots,
+        search=search,
         reservations=reservations,
+        next_cursor=next_cursor,
+        holds=holds,
         current_user=user,
         now=datetime.now().strftime('%Y-%m-%d %H:%M')
     )
 
+
+@user_bp.route('/reservations')
+@login_required(role='user', api=True)
+def reservation_rows():
+    # Next keyset page of history as table rows ("Load more")
+    reservations, next_cursor = reservation_page(session.get('user_id'), request.args.get('cursor'))
+    html = render_template('partials/reservation_rows.html', reservations=reservations)
+    return html, 200, {'X-Next-Cursor': next_cursor or ''}
+
+
 @user_bp.route('/book_form/<int:lot_id>', methods=['GET'])
+@login_required(role='user')
 def show_book_form(lot_id):
-    if session.get('user_role') != 'user':
-        flash("Unauthorized. Please login as user.", "danger")
-        return redirect(url_for('auth.login'))
-
     lot = ParkingLot.query.get_or_404(lot_id)
 
-    # Fetch first available spot directly from DB
-    available_spot = ParkingSpot.query.filter_by(lot_id=lot.id, status='A').first()
+    # Spot most likely to be assigned, taken from the in-memory free pool
+    spot_id = allocator.peek(lot.id)
+    available_spot = ParkingSpot.query.get(spot_id) if spot_id else None
 
     if not available_spot:
         flash("No available spots in this lot.", "danger")
@@ -54,64 +88,49 @@ def show_book_form(lot_id):
 
 
 @user_bp.route('/book_spot/<int:lot_id>', methods=['POST'])
-
+@login_required(role='user')
 def book_spot(lot_id):
-    if session.get('user_role') != 'user':
-        flash("Unauthorized. Please login as user.", "danger")
-        return redirect(url_for('auth.login'))
-
     vehicle_no = request.form.get("vehicle_no")
     user_id = session.get('user_id')
 
-    # Find the first available spot in the lot
-    spot = ParkingSpot.query.filter_by(lot_id=lot_id, status='A').first()
+    # Atomically claim a free spot and create the reservation (if admitted)
+    try:
+        with admission.admit('book', lot_id, user_id):
+            reservation = allocate_spot(lot_id, user_id, vehicle_no)
+    except (AdmissionRejected, VehicleAlreadyParked) as e:
+        flash(e.message, "warning")
+        return redirect(url_for("user.dashboard"))
 
-    if not spot:
+    if not reservation:
         flash("No available spots in this lot.", "danger")
         return redirect(url_for("user.dashboard"))
 
-    # Create reservation
-    reservation = ReserveSpot(
-        user_id=user_id,
-        spot_id=spot.id,
-        parking_timestamp=datetime.now(),
-        leaving_timestamp=None,
-        vehicle_no=vehicle_no,
-        parking_cost=0
-    )
-
-    # Mark spot as occupied
-    spot.status = 'O'
-
-    db.session.add(reservation)
-    db.session.commit()
-
-    flash(f"Spot {spot.id} in Lot {lot_id} booked successfully.", "success")
+    flash(f"Spot {reservation.spot_id} in Lot {lot_id} booked successfully.", "success")
     return redirect(url_for("user.dashboard"))
 
 
 @user_bp.route('/release_spot/<int:reservation_id>', methods=['GET', 'POST'])
+@login_required(role='user')
 def release_spot(reservation_id):
-    if session.get('user_role') != 'user':
-        flash("Unauthorized. Please login as user.", "danger")
-        return redirect(url_for('auth.login'))
-
     reservation = ReserveSpot.query.get_or_404(reservation_id)
 
     if request.method == 'POST':
-        now = datetime.now()
-        reservation.leaving_timestamp = now
-
-        # Calculate duration and cost (e.g., ₹10 per hour)
-        duration_hrs = (now - reservation.parking_timestamp).total_seconds() / 3600
-        cost = round(duration_hrs * 10, 2)
-        reservation.parking_cost = cost
-
-        # Update the spot status to Available
-        spot = ParkingSpot.query.get(reservation.spot_id)
-        spot.status = 'A'
+        if reservation.leaving_timestamp is not None:
+            flash("Spot already released.", "info")
+            return redirect(url_for('user.dashboard'))
+
+        # Close the reservation at the lot's tariff and free the spot
+        try:
+            with admission.admit('release', reservation.spot.lot_id, reservation.user_id, check_full=False):
+                released = free_spot(reservation)
+        except AdmissionRejected as e:
+            flash(e.message, "warning")
+            return redirect(url_for('user.dashboard'))
+
+        if released is None:  # closed meanwhile by another request or a gate exit
+            flash("Spot already released.", "info")
+            return redirect(url_for('user.dashboard'))
 
-        db.session.commit()
         flash("Spot released successfully.", "info")
         return redirect(url_for('user.dashboard'))
 
@@ -122,20 +141,77 @@ def release_spot(reservation_id):
     )
 
 
+@user_bp.route('/schedule/<int:lot_id>', methods=['POST'])
+@login_required(role='user')
+def schedule_spot(lot_id):
+    try:
+        start = datetime.strptime(request.form['start_time'], '%Y-%m-%dT%H:%M')
+        end = datetime.strptime(request.form['end_time'], '%Y-%m-%dT%H:%M')
+        hold = create_hold(lot_id, session.get('user_id'), request.form.get('vehicle_no'), start, end)
+    except (KeyError, ValueError) as e:
+        flash(f"Invalid reservation: {e}", "danger")
+        return redirect(url_for('user.dashboard'))
+
+    if not hold:
+        flash("No spot is free in this lot for that time.", "danger")
+    else:
+        flash(f"Spot {hold.spot_id} reserved from {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M}.", "success")
+    return redirect(url_for('user.dashboard'))
+
+
+@user_bp.route('/schedule/<int:hold_id>/cancel', methods=['POST'])
+@login_required(role='user')
+def cancel_schedule(hold_id):
+    hold = ScheduledReservation.query.get_or_404(hold_id)
+    if hold.user_id != session.get('user_id') or hold.status != 'H':
+        flash("Invalid reservation.", "danger")
+        return redirect(url_for('user.dashboard'))
+
+    close_hold(hold, 'C')
+    flash("Reservation cancelled.", "info")
+    return redirect(url_for('user.dashboard'))
+
+
+@user_bp.route('/schedule/<int:hold_id>/checkin', methods=['POST'])
+@login_required(role='user')
+def checkin_schedule(hold_id):
+    hold = ScheduledReservation.query.get_or_404(hold_id)
+    now = datetime.now()
+    if hold.user_id != session.get('user_id') or hold.status != 'H':
+        flash("Invalid reservation.", "danger")
+        return redirect(url_for('user.dashboard'))
+    if not (hold.start_time - WALKIN_HORIZON <= now < hold.end_time):
+        flash("Check-in opens shortly before your reservation starts.", "warning")
+        return redirect(url_for('user.dashboard'))
+
+    # Park on the held spot (or any free one if it is still occupied)
+    lot_id = hold.spot.lot_id
+    try:
+        with admission.admit('book', lot_id, hold.user_id, check_full=False):
+            reservation = allocate_spot(lot_id, hold.user_id, hold.vehicle_no, spot_id=hold.spot_id)
+    except (AdmissionRejected, VehicleAlreadyParked) as e:
+        flash(e.message, "warning")
+        return redirect(url_for('user.dashboard'))
+    if not reservation:
+        flash("No available spots in this lot.", "danger")
+        return redirect(url_for('user.dashboard'))
+    close_hold(hold, 'U')
+
+    flash(f"Checked in at Spot {reservation.spot_id} in Lot {lot_id}.", "success")
+    return redirect(url_for('user.dashboard'))
+
+
 @user_bp.route('/summary')
+@login_required(role='user')
+@page_cache.cached('user.summary', per_user=True)
 def summary():
-    if session.get('user_role') != 'user':
-        flash("Unauthorized. Please login as user.", "danger")
-        return redirect(url_for('auth.login'))
-
     user_id = session.get('user_id')
 
-    # Count how many times each parking lot was used by the user
+    # Count how many times each parking lot was used by the user (archived visits included)
+    visits = history(lambda c: [c.user_id == user_id])
     usage_summary = (
-        db.session.query(ParkingLot.prime_location_name, db.func.count(ReserveSpot.id))
-        .join(ParkingSpot, ParkingLot.id == ParkingSpot.lot_id)
-        .join(ReserveSpot, ParkingSpot.id == ReserveSpot.spot_id)
-        .filter(ReserveSpot.user_id == user_id)
+        db.session.query(ParkingLot.prime_location_name, db.func.count(visits.c.id))
+        .join(visits, ParkingLot.id == visits.c.lot_id)
         .group_by(ParkingLot.prime_location_name)
         .all()
     )
@@ -17,6 +17,8 @@ class User(db.Model):
     pin_code = db.Column(db.String(10))
     role = db.Column(db.String(10), default='user')  # 'user' or 'admin'
 
+    __table_args__ = (db.Index('ix_users_role', 'role'),)
+
     # Relationship: One user can make many reservations
     reservations = db.relationship('ReserveSpot', backref='user', lazy=True)
 
@@ -31,16 +33,27 @@ class ParkingLot(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     prime_location_name = db.Column(db.String(100), nullable=False)
     price = db.Column(db.Float, nullable=False)
+    tariff = db.Column(db.Text)  # Optional JSON pricing rules, see utils/pricing.py
     address = db.Column(db.String(200))
     pin_code = db.Column(db.String(10))
     max_spots = db.Column(db.Integer, nullable=False)
+    latitude = db.Column(db.Float)   # Optional, used by lot search
+    longitude = db.Column(db.Float)
+
+    # Denormalized counters, kept in step with spot status by utils/counters.py
+    occupied_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    available_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Bumped on every change to the lot or its spots (ETags, cache keys)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Bumped with every advance hold created or closed in the lot (utils/scheduling.py)
+    hold_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Relationship: One parking lot has many spots
     spots = db.relationship('ParkingSpot', back_populates='parking_lot', lazy=True)
 
     @property
     def used_spots(self):
-        return sum(1 for spot in self.spots if spot.status == 'O')
+        return self.occupied_count
 
     def __repr__(self):
         return f'<Lot {self.prime_location_name}>'
@@ -54,6 +67,9 @@ class ParkingSpot(db.Model):
     lot_id = db.Column(db.Integer, db.ForeignKey('parking_lots.id'), nullable=False)
     status = db.Column(db.String(1), default='A')  # A = Available, O = Occupied
 
+    # Booking looks up free spots by (lot_id, status)
+    __table_args__ = (db.Index('ix_parking_spots_lot_status', 'lot_id', 'status'),)
+
     # Relationship: One spot can have many reservations
     reservations = db.relationship('ReserveSpot', backref='spot', lazy=True)
 
@@ -74,14 +90,134 @@ class ReserveSpot(db.Model):
     leaving_timestamp = db.Column(db.DateTime, nullable=True)
     parking_cost = db.Column(db.Float, nullable=False)
 
+    # Latest reservation per spot, and a user's history newest-first. Ids are
+    # never reused on SQLite: archived reservations keep theirs (utils/archive.py)
+    __table_args__ = (
+        db.Index('ix_reservations_spot_parked', 'spot_id', 'parking_timestamp'),
+        db.Index('ix_reservations_user_parked', 'user_id', 'parking_timestamp'),
+        {'sqlite_autoincrement': True},
+    )
+
     def __repr__(self):
         return f'<Reservation {self.id} | Spot {self.spot_id} | User {self.user_id}>'
 
 
+def plate_expression(column):
+    """SQL for a normalized plate (no spaces, upper case), as in utils.vehicles.plate_key.
+
+    The arguments stay literal so queries match the index expression below.
+    """
+    return db.func.upper(db.func.replace(column, db.literal_column("' '"), db.literal_column("''")))
+
+
+# Open reservations only: one per vehicle (enforced; bookings without a plate are exempt)
+# and a user's active sessions
+OPEN_RESERVATION = ReserveSpot.leaving_timestamp.is_(None)
+OPEN_PLATE = db.and_(OPEN_RESERVATION, ReserveSpot.vehicle_no != db.literal_column("''"))
+db.Index('ux_reservations_open_plate', plate_expression(ReserveSpot.vehicle_no), unique=True,
+         sqlite_where=OPEN_PLATE, postgresql_where=OPEN_PLATE)
+db.Index('ix_reservations_open_user', ReserveSpot.user_id,
+         sqlite_where=OPEN_RESERVATION, postgresql_where=OPEN_RESERVATION)
+
+
+# --- SCHEDULED (ADVANCE) RESERVATION MODEL ---
+class ScheduledReservation(db.Model):
+    __tablename__ = 'scheduled_reservations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    spot_id = db.Column(db.Integer, db.ForeignKey('parking_spots.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    vehicle_no = db.Column(db.String(20), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(1), default='H')  # H = Held, U = Used (checked in), C = Cancelled
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    spot = db.relationship('ParkingSpot')
+
+    __table_args__ = (
+        db.Index('ix_scheduled_spot_window', 'spot_id', 'start_time'),
+        db.Index('ix_scheduled_user_status', 'user_id', 'status'),
+    )
+
+    def __repr__(self):
+        return f'<Hold {self.id} | Spot {self.spot_id} | {self.start_time} - {self.end_time}>'
+
+
+# --- DAILY REVENUE ROLLUP ---
+class LotRevenueDaily(db.Model):
+    __tablename__ = 'lot_revenue_daily'
+
+    id = db.Column(db.Integer, primary_key=True)
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lots.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # Day the reservation was released
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    reservations = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('lot_id', 'day', name='uq_lot_revenue_day'),)
+
+    def __repr__(self):
+        return f'<Revenue Lot {self.lot_id} | {self.day} | {self.revenue}>'
+
+
+# --- BACKGROUND JOB MODEL ---
+class Job(db.Model):
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text)   # JSON keyword arguments for the handler
+    status = db.Column(db.String(1), nullable=False, default='Q')  # Q = Queued, R = Running, D = Done, F = Failed
+    progress = db.Column(db.Integer, nullable=False, default=0)    # percent
+    message = db.Column(db.String(500))
+    result = db.Column(db.Text)   # JSON
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_jobs_status', 'status'),)
+
+    def __repr__(self):
+        return f'<Job {self.id} | {self.kind} | {self.status}>'
+
+
+# --- RESERVATION ARCHIVE CATALOG ---
+class ReservationArchive(db.Model):
+    """One row per monthly archive table of closed reservations (see utils/archive.py)."""
+    __tablename__ = 'reservation_archives'
+
+    month = db.Column(db.String(6), primary_key=True)  # 'YYYYMM' of parking_timestamp
+    table_name = db.Column(db.String(50), nullable=False)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f'<ReservationArchive {self.month} | {self.rows} rows>'
+
+
+# --- GATE EVENT MODEL ---
+class GateEvent(db.Model):
+    """Entry/exit reported by a gate sensor or plate reader (see utils/gate.py)."""
+    __tablename__ = 'gate_events'
+
+    event_id = db.Column(db.String(64), primary_key=True)  # sender's id; replays are skipped
+    lot_id = db.Column(db.Integer, nullable=False)
+    vehicle_no = db.Column(db.String(20), nullable=False)
+    direction = db.Column(db.String(3), nullable=False)  # 'in' or 'out'
+    occurred_at = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(1), nullable=False)  # A = Applied, I = Ignored
+    reason = db.Column(db.String(100))                # why an event was ignored
+    reservation_id = db.Column(db.Integer)            # opened or closed by the event
+    received_at = db.Column(db.DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f'<GateEvent {self.event_id} | {self.direction} | {self.vehicle_no}>'
+
+
 # --- INITIALIZE ADMIN USER ---
 def initialize_admin():
-    from app import db  # prevent circular import
-
     existing_admin = User.query.filter_by(role='admin').first()
     
     if not existing_admin:
@@ -0,0 +1,61 @@
+# /tests/conftest.py
+
+import pytest
+from app import create_app, init_database
+from models.models import db, ParkingLot, User
+from utils.allocation import allocator
+from utils.archive import forget_catalog
+from utils.cache import page_cache
+from utils.geo import lot_grid
+from utils.pricing import tariffs
+from utils.provisioning import add_spots
+from utils.scheduling import schedule
+from utils.sessions import user_cache
+from utils.vehicles import active_sessions
+
+
+def reset_state():
+    """Forget every process-wide cache, so each test sees only its own database."""
+    allocator.rebuild()
+    schedule.rebuild()
+    active_sessions.clear()
+    user_cache.invalidate()
+    page_cache.clear()
+    lot_grid.invalidate()
+    tariffs.invalidate()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('ADMISSION_CONTROL', '0')
+    monkeypatch.setenv('RESPONSE_CACHE_SIZE', '0')
+    app = create_app()
+    forget_catalog()  # archive months of the previous test's database; init_database reads history
+    with app.app_context():
+        init_database()
+        reset_state()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def make_lot(app):
+    def make(spots, price=10.0):
+        lot = ParkingLot(prime_location_name=f'Lot {spots}', price=price, max_spots=spots,
+                         available_count=0, address='Main St', pin_code='500001')
+        db.session.add(lot)
+        db.session.flush()
+        add_spots(lot.id, spots)
+        db.session.commit()
+        return lot.id
+    return make
+
+
+@pytest.fixture
+def user_id(app):
+    user = User(email='driver@example.com', password='secret', name='Driver', role='user')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
@@ -0,0 +1,101 @@
+# /tests/test_allocation.py
+
+import threading
+from collections import Counter
+from models.models import db, LotRevenueDaily, ParkingLot, ParkingSpot, ReserveSpot
+from utils.allocation import book_spot, release_spot
+
+THREADS = 16
+BOOKINGS = 2000
+SPOTS = 500
+
+
+def _run_concurrently(app, count, action):
+    """Call action(i) for i in range(count) from THREADS threads started together."""
+    barrier = threading.Barrier(THREADS)
+    errors = []
+
+    def worker(indexes):
+        with app.app_context():
+            barrier.wait()
+            for i in indexes:
+                try:
+                    action(i)
+                except Exception as e:  # collected so the test fails with the cause
+                    errors.append(e)
+                    db.session.rollback()
+            db.session.remove()
+
+    threads = [threading.Thread(target=worker, args=(range(n, count, THREADS),)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def _assert_consistent(lot_id):
+    db.session.expire_all()
+    lot = db.session.get(ParkingLot, lot_id)
+    occupied = ParkingSpot.query.filter_by(lot_id=lot_id, status='O').count()
+    free = ParkingSpot.query.filter_by(lot_id=lot_id, status='A').count()
+    open_reservations = ReserveSpot.query.filter(ReserveSpot.leaving_timestamp.is_(None)).all()
+
+    per_spot = Counter(reservation.spot_id for reservation in open_reservations)
+    assert not [spot_id for spot_id, n in per_spot.items() if n > 1], 'spot booked twice'
+    assert len(open_reservations) == occupied
+    assert (lot.occupied_count, lot.available_count) == (occupied, free)
+
+
+def test_concurrent_bookings_never_share_a_spot(app, make_lot, user_id):
+    lot_id = make_lot(SPOTS)
+    booked = []
+
+    def book(i):
+        reservation = book_spot(lot_id, user_id, f'KA01{i:05d}')
+        if reservation is not None:
+            booked.append(reservation.spot_id)
+
+    _run_concurrently(app, BOOKINGS, book)
+
+    assert len(booked) == SPOTS
+    assert len(set(booked)) == SPOTS
+    _assert_consistent(lot_id)
+    assert db.session.get(ParkingLot, lot_id).available_count == 0
+
+
+def test_released_spots_return_to_the_pool(app, make_lot, user_id):
+    lot_id = make_lot(SPOTS)
+    reservations = [book_spot(lot_id, user_id, f'TS09{i:05d}') for i in range(SPOTS)]
+    assert book_spot(lot_id, user_id, 'TS09FULL') is None
+
+    released = reservations[::2]
+    release_ids = [reservation.id for reservation in released]
+    freed = sorted(reservation.spot_id for reservation in released)
+    _run_concurrently(app, len(release_ids),
+                      lambda i: release_spot(db.session.get(ReserveSpot, release_ids[i])))
+    _assert_consistent(lot_id)
+
+    rebooked = []
+
+    def book(i):
+        reservation = book_spot(lot_id, user_id, f'AP28{i:05d}')
+        if reservation is not None:
+            rebooked.append(reservation.spot_id)
+
+    _run_concurrently(app, len(release_ids) * 2, book)
+    assert sorted(rebooked) == freed
+    _assert_consistent(lot_id)
+
+
+def test_concurrent_releases_apply_once(app, make_lot, user_id):
+    lot_id = make_lot(5)
+    reservation_ids = []
+    for round_no in range(20):
+        reservation_ids.append(book_spot(lot_id, user_id, f'KA05{round_no:03d}').id)
+        _run_concurrently(app, THREADS, lambda i: release_spot(db.session.get(ReserveSpot, reservation_ids[-1])))
+
+    _assert_consistent(lot_id)
+    lot = db.session.get(ParkingLot, lot_id)
+    assert (lot.occupied_count, lot.available_count) == (0, 5)
+    assert db.session.query(db.func.sum(LotRevenueDaily.reservations)).scalar() == 20
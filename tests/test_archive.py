@@ -0,0 +1,78 @@
+# /tests/test_archive.py
+
+from datetime import datetime, timedelta
+from models.models import db, ParkingLot, ReservationArchive, ReserveSpot
+from utils import archive
+from utils.allocation import book_spot, release_spot
+from utils.pricing import reprice_reservations, tariffs
+
+
+def _archived_reservation(lot_id, user_id):
+    """Book, release and archive one reservation; returns its id."""
+    reservation = book_spot(lot_id, user_id, 'TS 09 AB 1234')
+    reservation_id = reservation.id
+    release_spot(reservation)
+    assert archive.archive_reservations(datetime.now() + timedelta(days=1)) == 1
+    return reservation_id
+
+
+def test_archived_ids_are_never_reused(app, make_lot, user_id):
+    lot_id = make_lot(2)
+    archived_id = _archived_reservation(lot_id, user_id)
+
+    # The archived row was the newest: without AUTOINCREMENT SQLite would hand its id out again
+    assert book_spot(lot_id, user_id, 'TS 09 AB 1234').id > archived_id
+
+
+def test_api_history_includes_archived_reservations(app, make_lot, user_id):
+    lot_id = make_lot(2)
+    archived_id = _archived_reservation(lot_id, user_id)
+    current_id = book_spot(lot_id, user_id, 'TS 09 AB 1234').id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'], session['user_role'] = user_id, 'user'
+    first = client.get('/api/v1/me/reservations?limit=1').get_json()
+    second = client.get(f"/api/v1/me/reservations?limit=1&cursor={first['next_cursor']}").get_json()
+    assert [r['id'] for r in first['reservations'] + second['reservations']] == [current_id, archived_id]
+    assert second['next_cursor'] is None
+
+
+def test_reprice_covers_archived_months(app, make_lot, user_id):
+    lot_id = make_lot(2, price=10.0)
+    archived_id = _archived_reservation(lot_id, user_id)
+    month = archive.archived_months()[0]
+    table = archive.archive_table(month)
+    parked = db.session.execute(db.select(table.c.parking_timestamp).where(table.c.id == archived_id)).scalar()
+    db.session.execute(db.update(table).where(table.c.id == archived_id).values(
+        leaving_timestamp=parked + timedelta(hours=3), parking_cost=0))
+    db.session.get(ParkingLot, lot_id).price = 20.0
+    db.session.commit()
+    tariffs.invalidate()
+
+    report = reprice_reservations(apply=True)
+    assert (report['checked'], report['changed']) == (1, 1)
+    assert db.session.execute(db.select(table.c.parking_cost)).scalar() == report['new_total'] > 0
+
+
+def test_months_registered_elsewhere_are_read_at_once(app):
+    assert archive.archived_months() == []
+    # Another process archives a month: only the catalog in the database changes
+    table = archive.archive_table('202401')
+    with db.engine.begin() as connection:
+        table.create(connection)
+        connection.execute(db.insert(ReservationArchive).values(month='202401', table_name=table.name, rows=0))
+    assert archive.archived_months() == ['202401']
+
+
+def test_applied_reprice_moves_the_lot_versions(app, make_lot, user_id):
+    lot_id = make_lot(2, price=10.0)
+    reservation = book_spot(lot_id, user_id, 'TS 09 AB 1234')
+    release_spot(reservation)
+    db.session.execute(db.update(ReserveSpot).values(parking_cost=99.0))
+    db.session.commit()
+    before = db.session.get(ParkingLot, lot_id).version
+
+    assert reprice_reservations(apply=True)['changed'] == 1
+    db.session.expire_all()
+    assert db.session.get(ParkingLot, lot_id).version == before + 1
@@ -0,0 +1,67 @@
+# /tests/test_events.py
+
+import json
+from sqlalchemy import text
+from models.models import db
+from utils import events
+from utils.events import broker
+
+
+def _login(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'], session['user_role'] = user_id, 'user'
+    return client
+
+
+def test_stream_refuses_sync_workers_and_extra_subscribers(app, user_id):
+    client = _login(app, user_id)
+    response = client.get('/events/occupancy', environ_base={'SERVER_SOFTWARE': 'gunicorn/23.0.0'})
+    assert response.status_code == 503
+
+    app.config['SSE_MAX_SUBSCRIBERS'] = 1
+    held = broker.subscribe()
+    try:
+        response = client.get('/events/occupancy')
+        assert response.status_code == 503 and response.headers['Retry-After']
+    finally:
+        broker.unsubscribe(held)
+
+
+def test_changes_from_other_processes_reach_subscribers(app, make_lot, monkeypatch):
+    monkeypatch.setattr(events, 'POLL_SECONDS', 0.05)
+    lot_id = make_lot(3)
+    q = broker.subscribe()
+    try:
+        broker.watch(app)
+        poller = broker._poller
+        # Another worker books a spot: only the database knows
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                'UPDATE parking_lots SET occupied_count = 1, available_count = 2, version = version + 1 '
+                'WHERE id = :id'), {'id': lot_id})
+        assert json.loads(q.get(timeout=5)) == {'lot_id': lot_id, 'occupied': 1, 'available': 2}
+    finally:
+        broker.unsubscribe(q)
+    poller.join(timeout=5)
+    assert not poller.is_alive()
+
+
+def test_a_dropped_subscriber_stream_ends(app):
+    q = broker.subscribe()
+    stream = events.sse_stream(q)
+    assert next(stream).startswith('retry:')
+    for n in range(events.SUBSCRIBER_QUEUE_SIZE + 1):  # the client stopped reading
+        broker.publish({'lot_id': n})
+    assert broker.subscriber_count() == 0
+    assert list(stream) == []
+
+
+def test_streams_closed_before_starting_free_their_slot(app, user_id):
+    client = _login(app, user_id)
+    app.config['SSE_MAX_SUBSCRIBERS'] = 1
+    for _ in range(3):
+        response = client.get('/events/occupancy')
+        assert response.status_code == 200
+        response.close()  # the client went away before the first frame
+        assert broker.subscriber_count() == 0
@@ -0,0 +1,68 @@
+# /tests/test_gate.py
+
+from sqlalchemy import event
+from models.models import db, GateEvent, LotRevenueDaily, ParkingLot, ReserveSpot, User
+from utils.allocation import release_spot
+from utils.gate import GATE_USER_EMAIL, gate_user_id, ingest_events
+from utils.vehicles import active_sessions
+
+
+def _event(event_id, direction, hour, plate='KA01AB1234', lot_id=1):
+    return {'event_id': event_id, 'vehicle_no': plate, 'lot': lot_id,
+            'timestamp': f'2026-10-18T{hour:02d}:00:00', 'direction': direction}
+
+
+def _counters(lot_id):
+    db.session.expire_all()
+    lot = db.session.get(ParkingLot, lot_id)
+    return lot.occupied_count, lot.available_count
+
+
+def test_exit_and_reentry_in_one_batch(app, make_lot):
+    lot_id = make_lot(5)
+    assert ingest_events([_event('e1', 'in', 8)])['applied'] == 1
+
+    batch = [_event('e2', 'out', 9), _event('e3', 'in', 10)]
+    assert ingest_events(batch)['applied'] == 2
+    assert ingest_events(batch)['duplicates'] == 2  # a resend changes nothing
+
+    open_reservations = ReserveSpot.query.filter(ReserveSpot.leaving_timestamp.is_(None)).all()
+    assert len(open_reservations) == 1
+    assert _counters(lot_id) == (1, 4)
+
+
+def test_exit_of_a_reservation_released_meanwhile_is_ignored(app, make_lot, monkeypatch):
+    lot_id = make_lot(5)
+    ingest_events([_event('e1', 'in', 8)])
+    parked = active_sessions.resolve({'KA01AB1234'})
+
+    # The driver releases while the gate request is between its lookup and its UPDATE
+    release_spot(db.session.get(ReserveSpot, parked['KA01AB1234'].id))
+    monkeypatch.setattr(active_sessions, 'resolve', lambda keys: dict(parked))
+    summary = ingest_events([_event('e2', 'out', 9)])
+
+    assert summary['applied'] == 0
+    assert summary['ignored'] == {'no open reservation': 1}
+    assert db.session.get(GateEvent, 'e2').status == 'I'
+    assert _counters(lot_id) == (0, 5)
+    assert db.session.query(db.func.sum(LotRevenueDaily.reservations)).scalar() == 1
+
+
+def test_gate_account_created_meanwhile_by_another_worker(app):
+    User.query.filter_by(email=GATE_USER_EMAIL).delete()
+    db.session.commit()
+
+    pending = [True]
+
+    def other_worker(session, flush_context, instances):
+        if pending:  # once, between this worker's lookup and its insert
+            pending.pop()
+            with db.engine.begin() as connection:
+                connection.execute(db.insert(User).values(email=GATE_USER_EMAIL, password='x',
+                                                          name='Gate entry', role='gate'))
+    event.listen(db.session, 'before_flush', other_worker)
+    try:
+        user_id = gate_user_id()
+    finally:
+        event.remove(db.session, 'before_flush', other_worker)
+    assert user_id == db.session.query(User.id).filter_by(email=GATE_USER_EMAIL).scalar()
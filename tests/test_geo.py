@@ -0,0 +1,38 @@
+# /tests/test_geo.py
+
+import random
+from models.models import db, ParkingLot
+from utils.geo import MAX_RADIUS_KM, haversine_km, lot_grid, search_lots
+
+
+def _place(make_lot, points):
+    lot_ids = []
+    for lat, lng in points:
+        lot_id = make_lot(1)
+        lot = db.session.get(ParkingLot, lot_id)
+        lot.latitude, lot.longitude = lat, lng
+        lot_ids.append(lot_id)
+    db.session.commit()
+    lot_grid.invalidate()
+    return lot_ids
+
+
+def test_nearby_matches_a_full_scan(app, make_lot):
+    rng = random.Random(5)
+    points = [(17.4 + rng.uniform(-0.5, 0.5), 78.4 + rng.uniform(-0.5, 0.5)) for _ in range(30)]
+    lot_ids = _place(make_lot, points)
+
+    # Small radii walk the grid cells, large ones scan the located lots
+    for radius in (3, 20, MAX_RADIUS_KM, 2000):
+        expected = sorted(lot_id for lot_id, (lat, lng) in zip(lot_ids, points)
+                          if haversine_km(17.4, 78.4, lat, lng) <= radius)
+        assert sorted(lot_id for _, lot_id in lot_grid.nearby(17.4, 78.4, radius)) == expected
+
+
+def test_search_ignores_bad_coordinates_and_caps_the_radius(app, make_lot):
+    near, far = _place(make_lot, [(17.4, 78.4), (18.4, 78.4)])  # ~111 km apart
+
+    for lat, lng in ((float('nan'), 78.4), (17.4, float('inf')), (95.0, 78.4)):
+        assert {lot.id for lot, _ in search_lots(lat=lat, lng=lng)} == {near, far}
+    assert [lot.id for lot, _ in search_lots(lat=17.4, lng=78.4, radius_km=20000)] == [near]
+    assert [lot.id for lot, _ in search_lots(lat=17.4, lng=78.4, radius_km=float('nan'))] == [near]
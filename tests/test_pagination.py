@@ -0,0 +1,34 @@
+# /tests/test_pagination.py
+
+from sqlalchemy import text
+from models.models import db, ParkingSpot
+from utils.allocation import book_spot
+
+
+def test_reservations_without_a_parking_time_page_last(app, make_lot, user_id):
+    lot_id = make_lot(2)
+    spot_id = ParkingSpot.query.filter_by(lot_id=lot_id).first().id
+    # Legacy/imported rows that never recorded a parking time
+    legacy_ids = []
+    for _ in range(2):
+        legacy_ids.append(db.session.execute(text(
+            'INSERT INTO reservations (spot_id, user_id, vehicle_no, parking_timestamp, leaving_timestamp, '
+            "parking_cost) VALUES (:spot_id, :user_id, 'TS 09 AB 1234', NULL, '2020-01-01 10:00:00', 0) RETURNING id"),
+            {'spot_id': spot_id, 'user_id': user_id}).scalar())
+    db.session.commit()
+    current_id = book_spot(lot_id, user_id, 'TS 09 AB 1234').id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'], session['user_role'] = user_id, 'user'
+    seen, cursor = [], ''
+    for _ in range(4):
+        page = client.get(f'/api/v1/me/reservations?limit=1&cursor={cursor}').get_json()
+        seen += [r['id'] for r in page['reservations']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == [current_id] + sorted(legacy_ids, reverse=True)
+
+    response = client.get('/user/reservations?cursor=_' + str(max(legacy_ids)))  # "Load more" past a legacy row
+    assert response.status_code == 200 and response.headers['X-Next-Cursor'] == ''
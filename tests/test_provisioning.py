@@ -0,0 +1,51 @@
+# /tests/test_provisioning.py
+
+import pytest
+from models.models import db, LotRevenueDaily, ParkingLot, ParkingSpot
+from utils import provisioning
+from utils.allocation import book_spot, release_spot
+from utils.archive import history
+from utils.pricing import reprice_reservations
+from utils.revenue import backfill_revenue
+
+
+def _no_report(percent, message):
+    pass
+
+
+def test_deleting_a_lot_with_revenue_keeps_its_history(app, make_lot, user_id):
+    lot_id = make_lot(3)
+    release_spot(book_spot(lot_id, user_id, 'TS 09 AB 1234'))
+    assert LotRevenueDaily.query.filter_by(lot_id=lot_id).count() == 1
+
+    result = provisioning.delete_lot_job(_no_report, lot_id)
+    assert result == {'deleted_spots': 3, 'archived_reservations': 1}
+    assert db.session.get(ParkingLot, lot_id) is None
+    assert LotRevenueDaily.query.count() == 0
+
+    visits = history(lambda c: [c.user_id == user_id])
+    assert [row.lot_id for row in db.session.query(visits)] == [lot_id]
+    assert backfill_revenue() == 0  # a deleted lot gets no rollup rows back
+
+
+def test_a_failed_delete_reopens_the_lot(app, make_lot, monkeypatch):
+    lot_id = make_lot(3)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('archive unavailable')
+    monkeypatch.setattr(provisioning, 'archive_reservations', fail)
+
+    with pytest.raises(RuntimeError):
+        provisioning.delete_lot_job(_no_report, lot_id)
+    db.session.expire_all()
+    lot = db.session.get(ParkingLot, lot_id)
+    assert ParkingSpot.query.filter_by(lot_id=lot_id, status='A').count() == 3
+    assert (lot.available_count, lot.occupied_count, lot.max_spots) == (3, 0, 3)
+
+
+def test_reprice_skips_history_of_deleted_lots(app, make_lot, user_id):
+    lot_id = make_lot(1)
+    release_spot(book_spot(lot_id, user_id, 'TS 09 AB 1234'))
+    provisioning.delete_lot_job(_no_report, lot_id)
+
+    assert reprice_reservations(apply=True)['checked'] == 0
@@ -0,0 +1,32 @@
+# /tests/test_query_plans.py
+
+import os
+import shutil
+from app import create_app, init_database
+from models.models import db
+from utils.query_plans import explain, full_scans, hot_queries
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_hot_queries_use_indexes(app):
+    assert full_scans() == {}
+
+
+def test_plate_lookup_uses_the_open_plate_index(app):
+    query = dict(hot_queries())['open reservation of vehicle']
+    assert any('ux_reservations_open_plate' in line for line in explain(query))
+
+
+def test_migrations_index_the_bundled_database(tmp_path, monkeypatch):
+    path = tmp_path / 'parking_app.db'
+    shutil.copy(os.path.join(ROOT, 'instance', 'parking_app.db'), path)
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{path}')
+    app = create_app()
+    with app.app_context():
+        init_database()
+        try:
+            assert full_scans() == {}
+        finally:
+            db.session.remove()
+            db.engine.dispose()
@@ -0,0 +1,81 @@
+# /tests/test_scheduling.py
+
+import random
+import pytest
+from datetime import datetime, timedelta
+import utils.scheduling as scheduling
+from models.models import db, ScheduledReservation
+from utils.allocation import book_spot
+from utils.scheduling import ScheduleIndex, create_hold, hold_version_bump, schedule
+
+
+def _brute_force_free(holds_by_spot, spot_ids, start, end):
+    return {spot_id for spot_id in spot_ids
+            if all(e <= start or s >= end for s, e, _ in holds_by_spot.get(spot_id, []))}
+
+
+def test_gap_tree_agrees_with_a_scan(app, make_lot):
+    lot_id = make_lot(40)
+    rng = random.Random(7)
+    base = datetime.now() + timedelta(days=1)
+    for _ in range(300):
+        start = base + timedelta(hours=rng.randrange(0, 24 * 14))
+        end = start + timedelta(hours=rng.randrange(1, 12))
+        free = _brute_force_free(schedule._lots.get(lot_id, {}), range(1, 41), start, end)
+        hold = create_hold(lot_id, 1, 'TS07', start, end)
+        if free:
+            assert hold is not None and hold.spot_id in free
+        else:
+            assert hold is None
+
+    # Cancelling frees the window again
+    hold = ScheduledReservation.query.filter_by(status='H').first()
+    scheduling.close_hold(hold, 'C')
+    assert schedule.find_spot(lot_id, hold.start_time, hold.end_time) is not None
+
+
+def test_walk_ins_honor_holds_created_by_another_process(app, make_lot):
+    lot_id = make_lot(2)
+    schedule.rebuild()
+
+    # Another worker holds spot 1 from 30 minutes from now: only the DB knows
+    start = datetime.now() + timedelta(minutes=30)
+    db.session.add(ScheduledReservation(spot_id=1, user_id=1, vehicle_no='AP09', start_time=start,
+                                        end_time=start + timedelta(hours=1), status='H'))
+    hold_version_bump(lot_id)
+    db.session.commit()
+
+    assert book_spot(lot_id, 1, 'KA01').spot_id == 2
+    assert book_spot(lot_id, 1, 'KA02') is None
+
+
+def test_stale_index_cannot_double_hold_a_spot(app, make_lot, monkeypatch):
+    lot_id = make_lot(1)
+    other_worker = ScheduleIndex()
+    other_worker.rebuild()
+
+    start = datetime.now() + timedelta(days=2)
+    assert create_hold(lot_id, 1, 'AP01', start, start + timedelta(hours=2)) is not None
+
+    monkeypatch.setattr(scheduling, 'schedule', other_worker)
+    assert create_hold(lot_id, 1, 'AP02', start + timedelta(hours=1), start + timedelta(hours=3)) is None
+    assert create_hold(lot_id, 1, 'AP03', start + timedelta(hours=2), start + timedelta(hours=3)) is not None
+
+
+def test_holds_need_a_vehicle_number(app, make_lot, user_id):
+    lot_id = make_lot(2)
+    start = datetime.now() + timedelta(days=1)
+    for plate in (None, '', '   '):
+        with pytest.raises(ValueError):
+            create_hold(lot_id, user_id, plate, start, start + timedelta(hours=1))
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'], session['user_role'] = user_id, 'user'
+    response = client.post(f'/user/schedule/{lot_id}', data={
+        'start_time': f'{start:%Y-%m-%dT%H:%M}', 'end_time': f'{start + timedelta(hours=1):%Y-%m-%dT%H:%M}'})
+    assert response.status_code == 302
+    assert ScheduledReservation.query.count() == 0
+
+    hold = create_hold(lot_id, user_id, ' TS 09 AB 1234 ', start, start + timedelta(hours=1))
+    assert hold.vehicle_no == 'TS 09 AB 1234'
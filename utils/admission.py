@@ -0,0 +1,127 @@
+# /utils/admission.py
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from utils.allocation import allocator
+from utils.instrumentation import metrics
+
+USER_RATE = 0.5          # sustained bookings/releases per second per user
+USER_BURST = 5
+LOT_RATE = 20.0          # sustained bookings/releases per second per lot
+LOT_BURST = 40
+LOT_CONCURRENCY = 2      # write transactions in flight per lot
+LOT_QUEUE_SIZE = 20      # requests allowed to wait behind them
+QUEUE_TIMEOUT = 3.0      # seconds a queued request waits before giving up
+FULL_RECHECK_SECONDS = 2.0  # trust an empty in-memory pool for this long
+MAX_BUCKETS = 10000
+
+
+class AdmissionRejected(Exception):
+    """Raised before any DB write when a booking or release is turned away."""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason      # 'lot_full', 'user_rate', 'lot_rate', 'queue_full', 'queue_timeout'
+        self.message = message
+
+
+# --- TOKEN BUCKETS ---
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class _LotGate:
+    """Bounded queue in front of one lot's write path."""
+
+    def __init__(self):
+        self.slots = threading.Semaphore(LOT_CONCURRENCY)
+        self.waiting = 0
+
+
+# --- ADMISSION CONTROL ---
+class AdmissionController:
+    """Per-user and per-lot rate limits plus a bounded per-lot queue.
+
+    Checks run cheapest first and all before the request touches the DB:
+    in-memory "lot full", token buckets, then a slot in the lot's queue.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # (kind, id) -> TokenBucket, least recently used first
+        self._gates = {}               # lot_id -> _LotGate
+
+    def _bucket(self, key, rate, burst):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+            while len(self._buckets) > MAX_BUCKETS:
+                self._buckets.popitem(last=False)  # idle buckets are full again anyway
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _reject(self, action, reason, message):
+        metrics.inc('parking_admission_rejections_total', help_text='Bookings/releases turned away',
+                    action=action, reason=reason)
+        raise AdmissionRejected(reason, message)
+
+    @contextmanager
+    def admit(self, action, lot_id, user_id, check_full=True):
+        """Run the body only if the request is admitted; raises AdmissionRejected otherwise."""
+        if not self.enabled:
+            yield
+            return
+        if check_full and allocator.known_full(lot_id, FULL_RECHECK_SECONDS):
+            self._reject(action, 'lot_full', 'This lot is full right now.')
+
+        with self._lock:
+            user_ok = self._bucket(('user', user_id), USER_RATE, USER_BURST).take()
+            lot_ok = user_ok and self._bucket(('lot', lot_id), LOT_RATE, LOT_BURST).take()
+            gate = self._gates.setdefault(lot_id, _LotGate())
+            queued = user_ok and lot_ok and gate.waiting < LOT_QUEUE_SIZE
+            if queued:
+                gate.waiting += 1
+        if not user_ok:
+            self._reject(action, 'user_rate', 'Too many requests. Please wait a few seconds and try again.')
+        if not lot_ok:
+            self._reject(action, 'lot_rate', 'This lot is very busy. Please try again shortly.')
+        if not queued:
+            self._reject(action, 'queue_full', 'This lot is very busy. Please try again shortly.')
+
+        self._record_depth(lot_id, gate)
+        acquired = gate.slots.acquire(timeout=QUEUE_TIMEOUT)
+        with self._lock:
+            gate.waiting -= 1
+        self._record_depth(lot_id, gate)
+        if not acquired:
+            self._reject(action, 'queue_timeout', 'This lot is very busy. Please try again shortly.')
+        try:
+            metrics.inc('parking_admission_admitted_total', help_text='Bookings/releases admitted',
+                        action=action)
+            yield
+        finally:
+            gate.slots.release()
+
+    def _record_depth(self, lot_id, gate):
+        metrics.set('parking_admission_queue_depth', gate.waiting,
+                    help_text='Requests waiting for a lot write slot', lot=str(lot_id))
+
+
+admission = AdmissionController()
@@ -0,0 +1,270 @@
+# /utils/allocation.py
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+from models.models import db, ParkingSpot, ReserveSpot
+from utils.counters import adjust_lot_counters
+from utils.revenue import record_revenue
+from utils.events import publish_lot
+from utils.pricing import parking_cost
+from utils.scheduling import schedule
+from utils.vehicles import OpenReservation, VehicleAlreadyParked, active_sessions
+
+MAX_CLAIM_RETRIES = 5
+
+
+# --- SPOT ALLOCATOR ---
+class SpotAllocator:
+    """Hands out free spots per lot without double-booking.
+
+    Each lot keeps an in-process pool (deque) of spot ids believed to be free.
+    A spot is only considered taken once a conditional
+    UPDATE ... SET status='O' WHERE id=? AND status='A' affects exactly one row,
+    so stale pool entries (e.g. claimed by another worker process) are simply
+    dropped and the next candidate is tried.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}    # lot_id -> deque of free spot ids
+        self._members = {}  # lot_id -> set of ids in the deque (no duplicates)
+        self._loaded_at = {}  # lot_id -> monotonic time of the last reload from the DB
+
+    # ---- pool maintenance ----
+    def rebuild(self, lot_id=None):
+        """Reload free-spot pools from the DB (all lots, or a single lot)."""
+        query = db.session.query(ParkingSpot.lot_id, ParkingSpot.id).filter(ParkingSpot.status == 'A')
+        if lot_id is not None:
+            query = query.filter(ParkingSpot.lot_id == lot_id)
+        rows = query.order_by(ParkingSpot.id).all()
+
+        pools = {}
+        for row_lot_id, spot_id in rows:
+            pools.setdefault(row_lot_id, []).append(spot_id)
+
+        now = time.monotonic()
+        with self._lock:
+            if lot_id is None:
+                self._pools.clear()
+                self._members.clear()
+                self._loaded_at.clear()
+            else:
+                pools.setdefault(lot_id, [])
+            for pool_lot_id, spot_ids in pools.items():
+                self._pools[pool_lot_id] = deque(spot_ids)
+                self._members[pool_lot_id] = set(spot_ids)
+                self._loaded_at[pool_lot_id] = now
+
+    def forget_lot(self, lot_id):
+        """Drop a lot's pool; it is rebuilt from the DB on the next claim."""
+        with self._lock:
+            self._pools.pop(lot_id, None)
+            self._members.pop(lot_id, None)
+            self._loaded_at.pop(lot_id, None)
+
+    def release(self, lot_id, spot_id):
+        """Put a freed spot back into its lot's pool."""
+        with self._lock:
+            members = self._members.get(lot_id)
+            if members is None or spot_id in members:
+                return
+            members.add(spot_id)
+            self._pools[lot_id].append(spot_id)
+
+    def available(self, lot_id):
+        with self._lock:
+            pool = self._pools.get(lot_id)
+            return len(pool) if pool is not None else None
+
+    def known_full(self, lot_id, max_age):
+        """True if the lot's pool is empty and was reloaded from the DB within max_age seconds.
+
+        A pool drained by claims (or by another process) is not trusted until
+        the next claim has reloaded it.
+        """
+        with self._lock:
+            pool = self._pools.get(lot_id)
+            loaded_at = self._loaded_at.get(lot_id)
+        return pool is not None and not pool and time.monotonic() - loaded_at < max_age
+
+    def peek(self, lot_id):
+        """Spot id that would most likely be handed out next (no claim)."""
+        self._ensure_pool(lot_id)
+        with self._lock:
+            pool = self._pools.get(lot_id)
+            return pool[0] if pool else None
+
+    # ---- allocation ----
+    def claim(self, lot_id, skip=None):
+        """Atomically mark a free spot in the lot as occupied.
+
+        Runs inside the caller's transaction; returns the spot id, or None when
+        the lot has no free spot. Spots for which skip(spot_id) is true stay in
+        the pool but are not handed out. The caller must commit, or call
+        release() after a rollback.
+        """
+        self._ensure_pool(lot_id)
+        refreshed = False
+        skipped = []
+
+        try:
+            attempts = 0
+            while attempts <= MAX_CLAIM_RETRIES:
+                spot_id = self._pop(lot_id)
+                if spot_id is None:
+                    # Pool drained: another process may have freed spots meanwhile
+                    if refreshed:
+                        return None
+                    self.rebuild(lot_id)
+                    refreshed = True
+                    skipped = []
+                    continue
+                if skip and skip(spot_id):
+                    skipped.append(spot_id)
+                    continue
+
+                attempts += 1
+                if self._compare_and_set(spot_id):
+                    return spot_id
+                # Lost the race for this spot; drop it and try the next one
+            return None
+        finally:
+            for spot_id in skipped:
+                self.release(lot_id, spot_id)
+
+    def claim_spot(self, lot_id, spot_id):
+        """Atomically occupy one specific spot (e.g. a held one). Returns True on success."""
+        with self._lock:
+            members = self._members.get(lot_id)
+            if members is not None and spot_id in members:
+                members.discard(spot_id)
+                self._pools[lot_id].remove(spot_id)
+        return self._compare_and_set(spot_id)
+
+    def _compare_and_set(self, spot_id):
+        result = db.session.execute(
+            db.update(ParkingSpot)
+            .where(ParkingSpot.id == spot_id, ParkingSpot.status == 'A')
+            .values(status='O')
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def _pop(self, lot_id):
+        with self._lock:
+            pool = self._pools.get(lot_id)
+            if not pool:
+                return None
+            spot_id = pool.popleft()
+            self._members[lot_id].discard(spot_id)
+            return spot_id
+
+    def _ensure_pool(self, lot_id):
+        with self._lock:
+            loaded = lot_id in self._pools
+        if not loaded:
+            self.rebuild(lot_id)
+
+
+allocator = SpotAllocator()
+
+
+# --- BOOK / RELEASE HELPERS ---
+def book_spot(lot_id, user_id, vehicle_no, spot_id=None):
+    """Claim a spot in the lot and create its reservation. Returns the reservation or None.
+
+    Walk-ins never get a spot with an advance hold starting soon, including
+    holds other processes created: the counter UPDATE locks the lot's row, which
+    hold creation also takes, and reports the hold_version to sync the index to.
+    Passing spot_id (a checked-in hold) claims that spot instead of any free one.
+    Raises VehicleAlreadyParked if the vehicle already has an open reservation
+    (checked in memory first; the ux_reservations_open_plate index is the backstop).
+    """
+    if active_sessions.peek(vehicle_no) and active_sessions.for_vehicle(vehicle_no):
+        raise VehicleAlreadyParked(vehicle_no)
+
+    held_spot_id = spot_id
+    for _ in range(2):
+        spot_id = held_spot_id if held_spot_id is not None and allocator.claim_spot(lot_id, held_spot_id) else None
+        if spot_id is None:
+            spot_id = allocator.claim(lot_id, skip=lambda sid: schedule.held_soon(lot_id, sid))
+        if spot_id is None:
+            db.session.rollback()
+            return None
+
+        hold_version = adjust_lot_counters(lot_id, occupied=1, available=-1)
+        if (not schedule.sync(lot_id, hold_version) or spot_id == held_spot_id
+                or not schedule.held_soon(lot_id, spot_id)):
+            break
+        # Another process held this spot since the index was loaded: claim again
+        db.session.rollback()
+        allocator.release(lot_id, spot_id)
+    else:
+        return None
+
+    reservation = ReserveSpot(
+        user_id=user_id,
+        spot_id=spot_id,
+        parking_timestamp=datetime.now(),
+        leaving_timestamp=None,
+        vehicle_no=vehicle_no,
+        parking_cost=0
+    )
+    db.session.add(reservation)
+    try:
+        db.session.flush()
+        entry = OpenReservation(reservation.id, spot_id, lot_id, user_id, vehicle_no, reservation.parking_timestamp)
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        allocator.release(lot_id, spot_id)
+        if 'ux_reservations_open_plate' in str(e.orig):
+            raise VehicleAlreadyParked(vehicle_no)
+        raise
+    except Exception:
+        db.session.rollback()
+        allocator.release(lot_id, spot_id)
+        raise
+    active_sessions.add(entry)
+    publish_lot(lot_id, spot_id, 'O')
+    return reservation
+
+
+def release_spot(reservation):
+    """Close an open reservation at the lot's tariff, free its spot and return it to the pool.
+
+    The close is a conditional UPDATE ... WHERE leaving_timestamp IS NULL, so of
+    two concurrent releases (or a release and a gate exit) only one frees the
+    spot, moves the counters and books revenue. Returns the reservation, or None
+    if it was already closed.
+    """
+    now = datetime.now()
+    reservation_id, spot_id = reservation.id, reservation.spot_id
+    lot_id = reservation.spot.lot_id
+    cost = parking_cost(lot_id, reservation.parking_timestamp, now)
+
+    closed = db.session.execute(
+        db.update(ReserveSpot)
+        .where(ReserveSpot.id == reservation_id, ReserveSpot.leaving_timestamp.is_(None))
+        .values(leaving_timestamp=now, parking_cost=cost)
+        .execution_options(synchronize_session=False)
+    )
+    if closed.rowcount != 1:
+        db.session.rollback()
+        return None
+
+    db.session.execute(
+        db.update(ParkingSpot).where(ParkingSpot.id == spot_id).values(status='A')
+        .execution_options(synchronize_session=False)
+    )
+    adjust_lot_counters(lot_id, occupied=-1, available=1)
+    record_revenue(lot_id, now.date(), cost)
+    db.session.commit()
+    allocator.release(lot_id, spot_id)
+    active_sessions.discard(reservation_id)
+    publish_lot(lot_id, spot_id, 'A')
+    return reservation
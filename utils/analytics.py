@@ -0,0 +1,173 @@
+# /utils/analytics.py
+
+import importlib.util
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from models.models import db, ParkingLot
+from utils.archive import history
+
+CACHE_TTL_SECONDS = 300
+CACHE_MAX_ENTRIES = 128
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def analytics_available():
+    """NumPy is optional and only imported when metrics are computed (keeps startup fast)."""
+    return importlib.util.find_spec('numpy') is not None
+
+
+# --- LOADING ---
+def _intervals(lot_id, start, end):
+    """(parked, left, still_open) arrays for reservations overlapping [start, end).
+
+    Reservations still open count as occupied until now; archived ones are included.
+    """
+    import numpy as np
+
+    def overlapping(c):
+        criteria = [c.parking_timestamp < end, c.leaving_timestamp.is_(None) | (c.leaving_timestamp > start)]
+        if lot_id:
+            criteria.append(c.lot_id == lot_id)
+        return criteria
+
+    reservations = history(overlapping, end=end)
+    rows = db.session.query(reservations.c.parking_timestamp, reservations.c.leaving_timestamp).all()
+
+    parked = np.array([row[0] for row in rows], dtype='datetime64[s]')
+    left = np.array([row[1] for row in rows], dtype='datetime64[s]')
+    still_open = np.isnat(left)
+    left[still_open] = np.datetime64(datetime.now(), 's')
+    return parked, left, still_open
+
+
+def _spot_count(lot_id):
+    query = db.session.query(func.coalesce(func.sum(ParkingLot.max_spots), 0))
+    if lot_id:
+        query = query.filter(ParkingLot.id == lot_id)
+    return query.scalar()
+
+
+# --- SWEEPS ---
+def _occupied_seconds(starts, ends, edges):
+    """Spot-seconds occupied within each [edges[i], edges[i+1]) bucket.
+
+    F(t) = sum over intervals of time occupied before t
+         = sum_{s<t} (t - s) - sum_{e<t} (t - e),
+    evaluated at every edge with sorted arrays, prefix sums and searchsorted.
+    """
+    import numpy as np
+
+    starts = np.sort(starts)
+    ends = np.sort(ends)
+    start_sums = np.concatenate(([0.0], np.cumsum(starts)))
+    end_sums = np.concatenate(([0.0], np.cumsum(ends)))
+    k_start = np.searchsorted(starts, edges)
+    k_end = np.searchsorted(ends, edges)
+    occupied_before = (k_start * edges - start_sums[k_start]) - (k_end * edges - end_sums[k_end])
+    return np.diff(occupied_before)
+
+
+def _daily_peaks(starts, ends, days):
+    """Peak number of simultaneously occupied spots on each day."""
+    import numpy as np
+
+    times = np.concatenate((starts, ends))
+    deltas = np.concatenate((np.ones(len(starts), dtype=np.int64), -np.ones(len(ends), dtype=np.int64)))
+    order = np.lexsort((deltas, times))  # at equal times, departures before arrivals
+    levels = np.cumsum(deltas[order])
+
+    # Level carried into each day, then the highest level reached during it
+    day_starts = np.arange(days) * DAY
+    peaks = (np.searchsorted(np.sort(starts), day_starts, side='right')
+             - np.searchsorted(np.sort(ends), day_starts, side='right'))
+    event_days = np.minimum(times[order] // DAY, days - 1).astype(np.int64)
+    np.maximum.at(peaks, event_days, levels)
+    return peaks
+
+
+# --- METRICS ---
+def compute_analytics(lot_id, start, end):
+    """Utilization heatmap, daily peak occupancy, dwell time and turnover for
+    one lot (or every lot when lot_id is None) over the days [start, end).
+    """
+    import numpy as np
+
+    t0 = datetime.combine(start, datetime.min.time())
+    t1 = datetime.combine(end, datetime.min.time())
+    days = max((t1 - t0).days, 1)
+    spots = _spot_count(lot_id)
+    parked, left, still_open = _intervals(lot_id, t0, t1)
+
+    # Seconds relative to the start of the range; clip intervals to the range
+    origin = np.datetime64(t0, 's')
+    starts = (parked - origin).astype(np.int64)
+    ends = (left - origin).astype(np.int64)
+    clipped_starts = np.clip(starts, 0, days * DAY).astype(np.float64)
+    clipped_ends = np.clip(ends, 0, days * DAY).astype(np.float64)
+
+    # Hourly utilization averaged into a weekday x hour grid
+    edges = np.arange(days * 24 + 1, dtype=np.float64) * HOUR
+    hourly = _occupied_seconds(clipped_starts, clipped_ends, edges) / (HOUR * max(spots, 1))
+    hour_index = np.arange(days * 24)
+    cell = ((t0.weekday() + hour_index // 24) % 7) * 24 + hour_index % 24
+    sums = np.bincount(cell, weights=hourly, minlength=7 * 24)
+    counts = np.bincount(cell, minlength=7 * 24)
+    heatmap = np.divide(sums, counts, out=np.zeros(7 * 24), where=counts > 0).reshape(7, 24)
+
+    peaks = _daily_peaks(clipped_starts, clipped_ends, days)
+
+    # Dwell time of stays that ended in the range; turnover of stays that began in it
+    released = ~still_open & (left < np.datetime64(t1, 's'))
+    dwell = (ends[released] - starts[released]) / HOUR
+    arrivals = int(np.count_nonzero(starts >= 0))
+
+    return {
+        'spots': int(spots),
+        'days': days,
+        'reservations': arrivals,
+        'heatmap': np.round(heatmap * 100, 1).tolist(),  # percent, [weekday][hour]
+        'peaks': [{'day': (start + timedelta(days=i)).isoformat(), 'peak': int(p)} for i, p in enumerate(peaks)],
+        'avg_dwell_hours': round(float(dwell.mean()), 2) if len(dwell) else 0.0,
+        'turnover': round(arrivals / (max(spots, 1) * days), 3),  # arrivals per spot per day
+        'utilization': round(float(hourly.mean()) * 100, 1) if len(hourly) else 0.0,
+    }
+
+
+# --- CACHE ---
+class AnalyticsCache:
+    """(lot_id, start, end) -> computed metrics, LRU-bounded and expiring after CACHE_TTL_SECONDS."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (computed_at, result)
+
+    def get(self, lot_id, start, end):
+        key = (lot_id, start, end)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[0] < CACHE_TTL_SECONDS:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        result = compute_analytics(lot_id, start, end)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, lot_id=None):
+        with self._lock:
+            if lot_id is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] in (lot_id, None)]:
+                    del self._entries[key]
+
+
+analytics = AnalyticsCache()
@@ -0,0 +1,213 @@
+# /utils/archive.py
+
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import Column, DateTime, Float, Index, Integer, MetaData, String, Table, func, select, union_all
+from models.models import db, ParkingSpot, ReservationArchive, ReserveSpot
+from utils.jobs import job_handler
+
+ARCHIVE_AFTER_DAYS = 90   # closed reservations older than this leave the hot table
+BATCH_SIZE = 1000         # reservations moved per transaction
+
+# Columns every history source exposes, in this order
+HISTORY_COLUMNS = [
+    'id', 'spot_id', 'lot_id', 'user_id', 'vehicle_no',
+    'parking_timestamp', 'leaving_timestamp', 'parking_cost',
+]
+
+# Archive tables live outside db.metadata: create_all never touches them
+_metadata = MetaData()
+_lock = threading.Lock()
+_catalog = {'months': None, 'version': None}
+
+
+# --- ARCHIVE TABLES ---
+def archive_table(month):
+    """Table for one month ('YYYYMM') of archived reservations, keyed by parking_timestamp."""
+    name = f'reservations_archive_{month}'
+    with _lock:
+        table = _metadata.tables.get(name)
+        if table is None:
+            table = Table(
+                name, _metadata,
+                Column('id', Integer, primary_key=True),  # id it had in reservations
+                Column('spot_id', Integer, nullable=False),
+                Column('lot_id', Integer),  # copied so history outlives deleted spots
+                Column('user_id', Integer, nullable=False),
+                Column('vehicle_no', String(20), nullable=False),
+                Column('parking_timestamp', DateTime),
+                Column('leaving_timestamp', DateTime),
+                Column('parking_cost', Float, nullable=False),
+                Index(f'ix_{name}_user_parked', 'user_id', 'parking_timestamp'),
+                Index(f'ix_{name}_lot_left', 'lot_id', 'leaving_timestamp'),
+            )
+        return table
+
+
+def _month_bounds(month):
+    first = datetime.strptime(month, '%Y%m')
+    return first, (first + timedelta(days=32)).replace(day=1)
+
+
+def _as_datetime(value):
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime.combine(value, datetime.min.time())
+    return value
+
+
+def catalog_version():
+    """(months, latest month) of the archive catalog: changes whenever a month is added."""
+    return tuple(db.session.query(
+        func.count(ReservationArchive.month), func.max(ReservationArchive.month)
+    ).one())
+
+
+def archived_months(start=None, end=None):
+    """Archive months, newest first, that can hold reservations parked within [start, end].
+
+    The month list is cached per process and reloaded when catalog_version()
+    moves, so a month registered by another process is read from its next
+    query on. On SQLite, the version check and the history query that follows
+    share one read snapshot.
+    """
+    version = catalog_version()
+    with _lock:
+        months = _catalog['months'] if _catalog['version'] == version else None
+    if months is None:
+        months = [row[0] for row in
+                  db.session.query(ReservationArchive.month).order_by(ReservationArchive.month.desc())]
+        with _lock:
+            _catalog.update(months=months, version=version)
+
+    start, end = _as_datetime(start), _as_datetime(end)
+    selected = []
+    for month in months:
+        first, following = _month_bounds(month)
+        if (end is None or first <= end) and (start is None or following > start):
+            selected.append(month)
+    return selected
+
+
+def forget_catalog():
+    with _lock:
+        _catalog.update(months=None, version=None)
+
+
+# --- UNIFIED READS ---
+def history(where=None, start=None, end=None, newest=None):
+    """All reservations -- hot table and archive months -- as one subquery.
+
+    Its columns are HISTORY_COLUMNS. where(c) returns filter criteria and is
+    applied inside every branch (c has one attribute per column), so each store
+    is filtered with its own indexes. start/end (parking_timestamp) skip archive
+    months that cannot match. newest=n keeps only each branch's n latest rows,
+    enough for a keyset page of n.
+    """
+    hot = SimpleNamespace(
+        id=ReserveSpot.id, spot_id=ReserveSpot.spot_id, lot_id=ParkingSpot.lot_id,
+        user_id=ReserveSpot.user_id, vehicle_no=ReserveSpot.vehicle_no,
+        parking_timestamp=ReserveSpot.parking_timestamp, leaving_timestamp=ReserveSpot.leaving_timestamp,
+        parking_cost=ReserveSpot.parking_cost,
+    )
+    sources = [(hot, ReserveSpot.__table__.outerjoin(ParkingSpot.__table__, ParkingSpot.id == ReserveSpot.spot_id))]
+    for month in archived_months(start, end):
+        table = archive_table(month)
+        sources.append((SimpleNamespace(**{name: table.c[name] for name in HISTORY_COLUMNS}), table))
+
+    branches = []
+    for c, source in sources:
+        branch = select(*[getattr(c, name).label(name) for name in HISTORY_COLUMNS]).select_from(source)
+        if where is not None:
+            branch = branch.where(*where(c))
+        if newest:
+            branch = select(branch.order_by(c.parking_timestamp.desc().nulls_last(), c.id.desc()).limit(newest).subquery())
+        branches.append(branch)
+
+    combined = branches[0] if len(branches) == 1 else union_all(*branches)
+    return combined.subquery('history')
+
+
+# --- ARCHIVING ---
+def _released(cutoff, lot_id=None):
+    """Criteria for reservations released before `cutoff` (in one lot if given)."""
+    criteria = [ReserveSpot.leaving_timestamp < cutoff]
+    if lot_id is not None:
+        criteria.append(ReserveSpot.spot_id.in_(select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id)))
+    return criteria
+
+
+def _register_months(cutoff, lot_id=None):
+    """Create archive tables (and catalog rows) for every month about to receive rows.
+
+    Returns True if a month was new. Committed before any row moves, so the
+    catalog version readers check already lists the month once rows land there.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        month = db.func.to_char(ReserveSpot.parking_timestamp, 'YYYYMM')
+    else:
+        month = db.func.strftime('%Y%m', ReserveSpot.parking_timestamp)
+    needed = {row[0] for row in db.session.query(month).filter(*_released(cutoff, lot_id)).distinct()}
+    known = {row[0] for row in db.session.query(ReservationArchive.month)}
+    for new_month in sorted(needed - known):
+        table = archive_table(new_month)
+        table.create(db.session.connection(), checkfirst=True)
+        db.session.add(ReservationArchive(month=new_month, table_name=table.name, rows=0))
+    db.session.commit()
+    return bool(needed - known)
+
+
+def archive_reservations(cutoff, batch_size=BATCH_SIZE, report=None, lot_id=None):
+    """Move reservations released before `cutoff` (in one lot if given) into their month's archive table.
+
+    Walks reservations by id, one transaction per batch that copies and deletes
+    the same rows, so a row is never in both stores or in neither. Open
+    reservations never move. Returns the number of rows moved.
+    """
+    if _register_months(cutoff, lot_id):
+        forget_catalog()
+
+    total = ReserveSpot.query.filter(*_released(cutoff, lot_id)).count()
+    moved = last_id = 0
+    while True:
+        rows = (
+            db.session.query(
+                ReserveSpot.id, ReserveSpot.spot_id, ParkingSpot.lot_id, ReserveSpot.user_id,
+                ReserveSpot.vehicle_no, ReserveSpot.parking_timestamp, ReserveSpot.leaving_timestamp,
+                ReserveSpot.parking_cost
+            )
+            .outerjoin(ParkingSpot, ParkingSpot.id == ReserveSpot.spot_id)
+            .filter(ReserveSpot.id > last_id, *_released(cutoff, lot_id))
+            .order_by(ReserveSpot.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[row.parking_timestamp.strftime('%Y%m')].append(dict(zip(HISTORY_COLUMNS, row)))
+        for month, records in by_month.items():
+            db.session.execute(archive_table(month).insert(), records)
+            db.session.query(ReservationArchive).filter_by(month=month).update({
+                ReservationArchive.rows: ReservationArchive.rows + len(records),
+                ReservationArchive.updated_at: datetime.now(),
+            })
+        db.session.query(ReserveSpot).filter(ReserveSpot.id.in_([row.id for row in rows])) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+        moved += len(rows)
+        last_id = rows[-1].id
+        if report:
+            report(min(99, 100 * moved // max(total, 1)), f'Archived {moved} of {total} reservations')
+    return moved
+
+
+@job_handler('archive_reservations')
+def archive_reservations_job(report, days=ARCHIVE_AFTER_DAYS):
+    cutoff = datetime.now() - timedelta(days=days)
+    report(0, f'Archiving reservations released before {cutoff:%Y-%m-%d}')
+    return {'moved': archive_reservations(cutoff, report=report), 'cutoff': f'{cutoff:%Y-%m-%d %H:%M}'}
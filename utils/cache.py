@@ -0,0 +1,126 @@
+# /utils/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import make_response, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from utils.counters import lot_versions
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 60
+VERSION_CHECK_SECONDS = 1.0  # how long another process's writes can go unnoticed
+
+
+# --- BACKENDS ---
+class MemoryBackend:
+    """In-process LRU with per-entry expiry. Any object with the same get/set/clear
+    methods (e.g. a Redis wrapper) can replace it via PageCache.backend.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# --- PAGE CACHE ---
+class PageCache:
+    """Rendered pages keyed by the lots' version stamp.
+
+    Booking, release and lot edits bump parking_lots.version, so a new stamp
+    means new keys and old pages are never served. The stamp itself is kept
+    in-process and dropped on every local commit; a cache hit needs no query.
+    """
+
+    def __init__(self, backend=None, ttl=DEFAULT_TTL_SECONDS):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._checked_at = 0.0
+        self._generation = 0  # bumped by every local commit
+
+    def configure(self, max_entries=None, ttl=None):
+        if max_entries is not None:
+            self.enabled = max_entries > 0
+            if isinstance(self.backend, MemoryBackend):
+                self.backend.max_entries = max_entries
+        if ttl is not None:
+            self.ttl = ttl
+
+    def stamp(self):
+        with self._lock:
+            if self._stamp is not None and time.monotonic() - self._checked_at < VERSION_CHECK_SECONDS:
+                return self._stamp
+            generation = self._generation
+        current = lot_versions()
+        with self._lock:
+            if generation == self._generation:  # no commit raced the read
+                self._stamp, self._checked_at = current, time.monotonic()
+        return current
+
+    def expire_stamp(self, *args):
+        with self._lock:
+            self._stamp = None
+            self._generation += 1
+
+    def clear(self):
+        self.expire_stamp()
+        self.backend.clear()
+
+    def cached(self, name, per_user=False):
+        """Cache a view's rendered HTML per query string (and per session user)."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                who = (session.get('user_id'), session.get('user_role')) if per_user else None
+                key = (name, request.query_string, who, self.stamp())
+                html = self.backend.get(key)
+                if html is not None:
+                    response = make_response(html)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                result = view(*args, **kwargs)
+                if not isinstance(result, str):  # redirects and errors are not cached
+                    return result
+                self.backend.set(key, result, self.ttl)
+                response = make_response(result)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+page_cache = PageCache()
+
+# Any commit in this process may have bumped a version; re-read the stamp on next use
+event.listen(Session, 'after_commit', page_cache.expire_stamp)
@@ -0,0 +1,62 @@
+# /utils/counters.py
+
+from sqlalchemy import case, func
+from models.models import db, ParkingLot, ParkingSpot
+
+
+# --- INCREMENTAL UPDATES ---
+def adjust_lot_counters(lot_id, occupied=0, available=0):
+    """Shift a lot's occupied/available counters inside the current transaction.
+
+    Done as a single UPDATE ... SET col = col + ? so concurrent bookings never
+    overwrite each other's changes. Also bumps the lot's version. Returns the
+    lot's hold_version, read under the row lock the UPDATE takes.
+    """
+    return db.session.execute(
+        db.update(ParkingLot)
+        .where(ParkingLot.id == lot_id)
+        .values(
+            occupied_count=ParkingLot.occupied_count + occupied,
+            available_count=ParkingLot.available_count + available,
+            version=ParkingLot.version + 1
+        )
+        .returning(ParkingLot.hold_version)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+
+def bump_lot_version(lot_id):
+    """Mark a lot as changed without touching its counters (current transaction)."""
+    adjust_lot_counters(lot_id)
+
+
+def lot_versions():
+    """(lot count, max lot id, sum of versions): changes whenever any lot is
+    added, deleted, edited, booked or released."""
+    return tuple(db.session.query(
+        func.count(ParkingLot.id), func.max(ParkingLot.id), func.sum(ParkingLot.version)
+    ).one())
+
+
+# --- CONSISTENCY REPAIR ---
+def recompute_lot_counters():
+    """Recount every lot's counters from parking_spots. Returns the number of lots fixed."""
+    occupied = func.sum(case((ParkingSpot.status == 'O', 1), else_=0))
+    rows = (
+        db.session.query(ParkingSpot.lot_id, occupied, func.count(ParkingSpot.id))
+        .group_by(ParkingSpot.lot_id)
+        .all()
+    )
+    counts = {lot_id: (int(occ or 0), total - int(occ or 0)) for lot_id, occ, total in rows}
+
+    fixed = 0
+    for lot in ParkingLot.query.all():
+        occ, avail = counts.get(lot.id, (0, 0))
+        if lot.occupied_count != occ or lot.available_count != avail:
+            lot.occupied_count = occ
+            lot.available_count = avail
+            lot.version += 1
+            fixed += 1
+
+    db.session.commit()
+    return fixed
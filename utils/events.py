@@ -0,0 +1,190 @@
+# /utils/events.py
+
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from models.models import db, ParkingLot
+from utils.counters import lot_versions
+
+SUBSCRIBER_QUEUE_SIZE = 100
+MAX_SUBSCRIBERS = 100   # per process (config SSE_MAX_SUBSCRIBERS)
+KEEPALIVE_SECONDS = 15
+POLL_SECONDS = 1.0      # how often a process looks for changes made by the others
+CLOSED = None           # queued for a dropped subscriber: its stream ends and the client reconnects
+
+log = logging.getLogger(__name__)
+
+
+# --- PUB/SUB ---
+class OccupancyBroker:
+    """Fans one occupancy change out to every connected subscriber.
+
+    Each subscriber gets a bounded queue; a subscriber that stops reading is
+    dropped instead of holding up publishers; its stream then ends, so the
+    client reconnects and reloads the current state. Changes made in this process are
+    published as they commit (publish_lot); while anyone is subscribed, a
+    poller thread also checks lot_versions() every POLL_SECONDS and publishes
+    the lots other processes changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._poller = None
+        self._stamp = None     # lot_versions() at the last poll
+        self._versions = {}    # lot_id -> version last published
+
+    def subscribe(self, limit=MAX_SUBSCRIBERS):
+        """New subscriber queue, or None if `limit` subscribers are connected already."""
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            if len(self._subscribers) >= limit:
+                return None
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event):
+        message = json.dumps(event)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                self._drop(q)
+
+    def _drop(self, q):
+        self.unsubscribe(q)
+        while True:  # the backlog is stale anyway; make room for CLOSED
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            q.put_nowait(CLOSED)
+        except queue.Full:  # refilled by a publisher that listed it before the unsubscribe
+            pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    # ---- changes from other processes ----
+    def watch(self, app):
+        """Start the poller if it is not running (call from a request, after subscribe)."""
+        with self._lock:
+            if self._poller is not None:
+                return
+        stamp, versions = lot_versions(), dict(db.session.query(ParkingLot.id, ParkingLot.version))
+        with self._lock:
+            if self._poller is not None:
+                return
+            self._stamp, self._versions = stamp, versions
+            self._poller = threading.Thread(target=self._poll, args=(app,), name='occupancy-poller', daemon=True)
+            self._poller.start()
+
+    def note(self, lot_id, version):
+        """Record a version published by this process, so the poller skips it."""
+        with self._lock:
+            if version is None:
+                self._versions.pop(lot_id, None)
+            else:
+                self._versions[lot_id] = version
+
+    def _poll(self, app):
+        while True:
+            time.sleep(POLL_SECONDS)
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+            with app.app_context():
+                try:
+                    self._publish_changes()
+                except Exception:
+                    log.exception('Occupancy poll failed')
+                finally:
+                    db.session.remove()
+
+    def _publish_changes(self):
+        stamp = lot_versions()
+        if stamp == self._stamp:
+            return
+        rows = db.session.query(ParkingLot.id, ParkingLot.version, ParkingLot.occupied_count,
+                                ParkingLot.available_count).all()
+        with self._lock:
+            known, self._stamp = self._versions, stamp
+            self._versions = {lot_id: version for lot_id, version, _, _ in rows}
+        for lot_id, version, occupied, available in rows:
+            if known.get(lot_id) != version:
+                self.publish({'lot_id': lot_id, 'occupied': occupied, 'available': available})
+        for lot_id in known.keys() - self._versions.keys():
+            self.publish({'lot_id': lot_id, 'deleted': True})
+
+
+broker = OccupancyBroker()
+
+
+# --- PUBLISH HELPERS ---
+def publish_lot(lot_id, spot_id=None, spot_status=None):
+    """Publish a lot's current counters (call after the change is committed)."""
+    if not broker.subscriber_count():
+        return
+    row = (
+        db.session.query(ParkingLot.version, ParkingLot.occupied_count, ParkingLot.available_count)
+        .filter(ParkingLot.id == lot_id)
+        .first()
+    )
+    event = {'lot_id': lot_id}
+    if row is None:
+        event['deleted'] = True
+    else:
+        event['occupied'], event['available'] = row[1:]
+    broker.note(lot_id, row[0] if row is not None else None)
+    if spot_id is not None:
+        event['spot_id'] = spot_id
+        event['spot_status'] = spot_status
+    broker.publish(event)
+
+
+# --- SSE STREAM ---
+def can_stream(environ):
+    """False under gunicorn's sync worker, where a stream would hold a whole worker.
+
+    Streams need a server that serves other requests meanwhile: threads
+    (gunicorn --threads, gthread; the Flask dev server) or gevent.
+    """
+    if environ.get('wsgi.multithread'):
+        return True
+    monkey = sys.modules.get('gevent.monkey')
+    if monkey is not None and monkey.is_module_patched('socket'):
+        return True
+    return not environ.get('SERVER_SOFTWARE', '').startswith('gunicorn/')
+
+
+def sse_stream(q):
+    """Generator of Server-Sent Event frames for one subscriber queue.
+
+    Ends when the broker drops the queue. The caller also unsubscribes when
+    the response closes, for clients that leave before the first frame.
+    """
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                message = q.get(timeout=KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            if message is CLOSED:
+                return
+            yield f'event: occupancy\ndata: {message}\n\n'
+    finally:
+        broker.unsubscribe(q)
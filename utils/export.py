@@ -0,0 +1,135 @@
+# /utils/export.py
+
+import csv
+import importlib.util
+import io
+from models.models import db, User, ParkingLot, ParkingSpot
+from utils.archive import history
+
+BATCH_SIZE = 2000  # rows fetched per cursor round trip and written per chunk
+
+COLUMNS = [
+    'reservation_id', 'vehicle_no', 'parking_timestamp', 'leaving_timestamp', 'parking_cost',
+    'user_id', 'user_email', 'user_name', 'spot_id', 'spot_status',
+    'lot_id', 'lot_name', 'lot_pin_code',
+]
+
+FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def parquet_available():
+    """pyarrow is optional and only imported when a Parquet export runs."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+# --- ROW SOURCE ---
+def reservation_rows(start=None, end=None, lot_id=None, user_id=None, batch_size=BATCH_SIZE):
+    """Yield lists of up to `batch_size` reservation tuples (in COLUMNS order)
+    parked within [start, end), oldest first.
+
+    Archived reservations are included (utils/archive.py). Rows come from a
+    server-side cursor (stream_results + yield_per), so memory stays flat
+    however large the history is.
+    """
+    def matching(c):
+        criteria = []
+        if start:
+            criteria.append(c.parking_timestamp >= start)
+        if end:
+            criteria.append(c.parking_timestamp < end)
+        if lot_id:
+            criteria.append(c.lot_id == lot_id)
+        if user_id:
+            criteria.append(c.user_id == user_id)
+        return criteria
+
+    reservations = history(matching, start=start, end=end)
+    query = (
+        db.session.query(
+            reservations.c.id, reservations.c.vehicle_no, reservations.c.parking_timestamp,
+            reservations.c.leaving_timestamp, reservations.c.parking_cost,
+            User.id, User.email, User.name, reservations.c.spot_id, ParkingSpot.status,
+            reservations.c.lot_id, ParkingLot.prime_location_name, ParkingLot.pin_code
+        )
+        .join(User, User.id == reservations.c.user_id)
+        .outerjoin(ParkingSpot, ParkingSpot.id == reservations.c.spot_id)
+        .outerjoin(ParkingLot, ParkingLot.id == reservations.c.lot_id)
+    )
+
+    statement = query.order_by(reservations.c.id).statement.execution_options(yield_per=batch_size)
+    for partition in db.session.execute(statement).partitions():
+        yield [tuple(row) for row in partition]
+
+
+# --- ENCODERS ---
+def csv_chunks(batches):
+    """Encode row batches as CSV, one bytes chunk per batch (header first)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _DrainSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_chunks(batches):
+    """Encode row batches as Parquet, one row group per batch, streamed as written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('reservation_id', pa.int64()), ('vehicle_no', pa.string()),
+        ('parking_timestamp', pa.timestamp('us')), ('leaving_timestamp', pa.timestamp('us')),
+        ('parking_cost', pa.float64()), ('user_id', pa.int64()), ('user_email', pa.string()),
+        ('user_name', pa.string()), ('spot_id', pa.int64()), ('spot_status', pa.string()),
+        ('lot_id', pa.int64()), ('lot_name', pa.string()), ('lot_pin_code', pa.string()),
+    ])
+    sink = _DrainSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    for batch in batches:
+        columns = list(zip(*batch))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def export_chunks(fmt, start=None, end=None, lot_id=None, user_id=None):
+    """Bytes chunks of the reservation export in `fmt` ('csv' or 'parquet')."""
+    batches = reservation_rows(start, end, lot_id, user_id)
+    if fmt == 'parquet':
+        return parquet_chunks(batches)
+    return csv_chunks(batches)
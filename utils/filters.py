@@ -0,0 +1,11 @@
+# /utils/filters.py
+
+
+# --- JINJA FILTERS ---
+def format_datetime(value, fmt='%Y-%m-%d %H:%M'):
+    """{{ reservation.parking_timestamp | datetime_fmt }} -- blank for None."""
+    return value.strftime(fmt) if value else ''
+
+
+def register_filters(app):
+    app.jinja_env.filters['datetime_fmt'] = format_datetime
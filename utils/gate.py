@@ -0,0 +1,268 @@
+# /utils/gate.py
+
+import secrets
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError
+from models.models import db, GateEvent, ParkingLot, ParkingSpot, ReserveSpot, User
+from utils.allocation import allocator
+from utils.counters import adjust_lot_counters
+from utils.events import publish_lot
+from utils.pricing import parking_cost
+from utils.revenue import record_revenue
+from utils.scheduling import schedule
+from utils.vehicles import OpenReservation, active_sessions, plate_key
+
+GROUP_SIZE = 500                # events applied per transaction
+MAX_EVENTS_PER_REQUEST = 10000
+GATE_USER_EMAIL = 'gate@parking.local'  # owner of reservations opened by gate entries
+
+DIRECTIONS = ('in', 'out')
+
+Event = namedtuple('Event', 'event_id vehicle_no plate lot_id occurred_at direction')
+Closing = namedtuple('Closing', 'lot_id spot_id left cost record')  # record: index into the group's records
+
+
+# --- PARSING ---
+def _timestamp(value):
+    """Local naive datetime from an ISO 8601 string or a Unix timestamp."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value)
+    if not isinstance(value, str):
+        raise ValueError('timestamp is required')
+    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def parse_event(raw):
+    """Event from one JSON object {event_id, vehicle_no, lot, timestamp, direction}; ValueError if invalid."""
+    if not isinstance(raw, dict):
+        raise ValueError('event must be an object')
+    event_id = str(raw.get('event_id') or '').strip()
+    if not event_id or len(event_id) > 64:
+        raise ValueError('event_id is required (at most 64 characters)')
+    vehicle_no = str(raw.get('vehicle_no') or '').strip()
+    if not vehicle_no or len(vehicle_no) > 20:
+        raise ValueError('vehicle_no is required (at most 20 characters)')
+    try:
+        lot_id = int(raw.get('lot'))
+    except (TypeError, ValueError):
+        raise ValueError('lot must be a parking lot id')
+    direction = str(raw.get('direction') or '').strip().lower()
+    if direction not in DIRECTIONS:
+        raise ValueError("direction must be 'in' or 'out'")
+    try:
+        occurred_at = _timestamp(raw.get('timestamp'))
+    except (OverflowError, OSError, ValueError):
+        raise ValueError('timestamp must be ISO 8601 or Unix seconds')
+    return Event(event_id, vehicle_no, plate_key(vehicle_no), lot_id, occurred_at, direction)
+
+
+def gate_user_id():
+    """Id of the account gate-opened reservations belong to.
+
+    init_database creates it; databases set up before that get it on first use.
+    """
+    user_id = db.session.query(User.id).filter(User.email == GATE_USER_EMAIL).scalar()
+    if user_id is None:
+        db.session.add(User(email=GATE_USER_EMAIL, password=secrets.token_urlsafe(32), name='Gate entry',
+                            role='gate'))
+        try:
+            db.session.commit()
+        except IntegrityError:  # another worker created it meanwhile
+            db.session.rollback()
+        user_id = db.session.query(User.id).filter(User.email == GATE_USER_EMAIL).scalar()
+    return user_id
+
+
+# --- INGESTION ---
+def ingest_events(raw_events, group_size=GROUP_SIZE):
+    """Apply gate events in timestamp order, `group_size` per transaction.
+
+    Events whose event_id was already ingested are skipped, so senders can
+    retry a whole batch. An entry opens a reservation on a free spot of the
+    lot (at the event's time); an exit closes the vehicle's open reservation,
+    found by plate through the active-session registry (utils/vehicles.py). Returns a
+    summary: received, applied, duplicates, and ignored/rejected counts by reason.
+    """
+    summary = {'received': 0, 'applied': 0, 'duplicates': 0, 'ignored': Counter(), 'rejected': Counter()}
+    events = []
+    for raw in raw_events:
+        summary['received'] += 1
+        try:
+            events.append(parse_event(raw))
+        except ValueError as e:
+            summary['rejected'][str(e)] += 1
+    events.sort(key=lambda event: event.occurred_at)
+
+    if events:
+        owner_id = gate_user_id()
+        seen = set()
+        for start in range(0, len(events), group_size):
+            _apply_group(events[start:start + group_size], owner_id, seen, summary)
+    summary['ignored'] = dict(summary['ignored'])
+    summary['rejected'] = dict(summary['rejected'])
+    return summary
+
+
+def _apply_group(group, owner_id, seen, summary, retry=True):
+    """One transaction for a group of events. In-memory state changes only after the commit."""
+    ids = [event.event_id for event in group]
+    known = {row[0] for row in db.session.query(GateEvent.event_id).filter(GateEvent.event_id.in_(ids))}
+    fresh = []
+    for event in group:
+        if event.event_id in known or event.event_id in seen:
+            summary['duplicates'] += 1
+        else:
+            seen.add(event.event_id)
+            fresh.append(event)
+    if not fresh:
+        return
+
+    lots = dict(db.session.query(ParkingLot.id, ParkingLot.hold_version).filter(
+        ParkingLot.id.in_({event.lot_id for event in fresh})))
+    for lot_id, hold_version in lots.items():
+        schedule.sync(lot_id, hold_version)  # holds created in other processes
+    parked = active_sessions.resolve({event.plate for event in fresh})  # plate -> OpenReservation
+    opened = {}     # plate -> (ReserveSpot, lot_id) added in this group and still open
+    closing = {}    # reservation_id -> Closing, for reservations opened before this group
+    claimed, freed = [], []                 # (lot_id, spot_id)
+    counters = defaultdict(lambda: [0, 0])  # lot_id -> [occupied, available] deltas
+    revenue = defaultdict(lambda: [0, 0])   # (lot_id, day) -> [amount, reservations]
+    records = []    # [event, reason, reservation, reservation_id]
+
+    def vacate(lot_id, spot_id, left, cost):
+        freed.append((lot_id, spot_id))
+        counters[lot_id][0] -= 1
+        counters[lot_id][1] += 1
+        revenue[(lot_id, left.date())][0] += cost
+        revenue[(lot_id, left.date())][1] += 1
+
+    try:
+        # No autoflush: new reservations go out in one batched INSERT at the flush below
+        with db.session.no_autoflush:
+            for event in fresh:
+                reason, reservation, reservation_id = None, None, None
+                current = parked.get(event.plate)
+                if event.lot_id not in lots:
+                    reason = 'unknown lot'
+                elif event.direction == 'in':
+                    if current:
+                        reason = 'vehicle already parked'
+                    else:
+                        spot_id = allocator.claim(event.lot_id, skip=lambda sid: schedule.held_soon(event.lot_id, sid))
+                        if spot_id is None:
+                            reason = 'lot full'
+                        else:
+                            claimed.append((event.lot_id, spot_id))
+                            counters[event.lot_id][0] += 1
+                            counters[event.lot_id][1] -= 1
+                            reservation = ReserveSpot(
+                                user_id=owner_id, spot_id=spot_id, vehicle_no=event.vehicle_no,
+                                parking_timestamp=event.occurred_at, leaving_timestamp=None, parking_cost=0
+                            )
+                            db.session.add(reservation)
+                            opened[event.plate] = (reservation, event.lot_id)
+                            parked[event.plate] = OpenReservation(None, spot_id, event.lot_id, owner_id,
+                                                                  event.vehicle_no, event.occurred_at)
+                elif current is None:
+                    reason = 'no open reservation'
+                elif current.lot_id != event.lot_id:
+                    reason = 'vehicle is parked in another lot'
+                else:
+                    left = max(event.occurred_at, current.parking_timestamp)
+                    cost = parking_cost(current.lot_id, current.parking_timestamp, left)
+                    reservation, _ = opened.pop(event.plate, (None, None))
+                    if reservation is not None:
+                        reservation.leaving_timestamp, reservation.parking_cost = left, cost
+                        vacate(current.lot_id, current.spot_id, left, cost)
+                    else:
+                        reservation_id = current.id
+                        closing[current.id] = Closing(current.lot_id, current.spot_id, left, cost, len(records))
+                    del parked[event.plate]
+                records.append([event, reason, reservation, reservation_id])
+
+            # Close before the flush inserts re-entries: a vehicle that left and came
+            # back in this group must not hold two open reservations at any point
+            if closing:
+                closed = _close_reservations(closing)
+                for reservation_id, row in closing.items():
+                    if reservation_id in closed:
+                        vacate(row.lot_id, row.spot_id, row.left, row.cost)
+                    else:  # released meanwhile by its user or another request
+                        records[row.record][1:] = ['no open reservation', None, None]
+            if freed:
+                db.session.execute(
+                    db.update(ParkingSpot).where(ParkingSpot.id.in_([spot_id for _, spot_id in freed]))
+                    .values(status='A').execution_options(synchronize_session=False)
+                )
+
+        db.session.flush()  # ids for the reservations opened above
+        for lot_id, (occupied, available) in counters.items():
+            adjust_lot_counters(lot_id, occupied=occupied, available=available)
+        for (lot_id, day), (amount, count) in revenue.items():
+            record_revenue(lot_id, day, amount, count)
+
+        now = datetime.now()
+        rows = [{
+            'event_id': event.event_id, 'lot_id': event.lot_id, 'vehicle_no': event.vehicle_no,
+            'direction': event.direction, 'occurred_at': event.occurred_at,
+            'status': 'I' if reason else 'A', 'reason': reason,
+            'reservation_id': reservation.id if reservation is not None else reservation_id,
+            'received_at': now,
+        } for event, reason, reservation, reservation_id in records]
+        db.session.execute(db.insert(GateEvent), rows)
+        still_open = [OpenReservation(reservation.id, reservation.spot_id, lot_id, owner_id,
+                                      reservation.vehicle_no, reservation.parking_timestamp)
+                      for reservation, lot_id in opened.values()]
+        db.session.commit()
+    except IntegrityError:
+        # Another request ingested some of these event ids (or parked one of these
+        # vehicles) meanwhile: redo the group against the new state
+        db.session.rollback()
+        for lot_id, spot_id in claimed:
+            allocator.release(lot_id, spot_id)
+        if not retry:
+            raise
+        for event in fresh:
+            seen.discard(event.event_id)
+        return _apply_group(group, owner_id, seen, summary, retry=False)
+    except Exception:
+        db.session.rollback()
+        for lot_id, spot_id in claimed:
+            allocator.release(lot_id, spot_id)
+        raise
+
+    for lot_id, spot_id in freed:
+        allocator.release(lot_id, spot_id)
+    for reservation_id in closing:
+        active_sessions.discard(reservation_id)
+    for entry in still_open:
+        active_sessions.add(entry)
+    for lot_id in counters:
+        publish_lot(lot_id)
+
+    for _, reason, _, _ in records:
+        if reason:
+            summary['ignored'][reason] += 1
+        else:
+            summary['applied'] += 1
+
+
+def _close_reservations(closing):
+    """Close the reservations in `closing` that are still open; returns the ids closed.
+
+    Each UPDATE is guarded by leaving_timestamp IS NULL, so a reservation released
+    meanwhile is neither closed again nor counted twice.
+    """
+    table = ReserveSpot.__table__
+    stmt = (
+        db.update(table)
+        .where(table.c.id == bindparam('reservation_id'), table.c.leaving_timestamp.is_(None))
+        .values(leaving_timestamp=bindparam('left'), parking_cost=bindparam('cost'))
+    )
+    connection = db.session.connection()
+    return {reservation_id for reservation_id, row in closing.items()
+            if connection.execute(stmt, {'reservation_id': reservation_id, 'left': row.left,
+                                         'cost': row.cost}).rowcount == 1}
@@ -0,0 +1,151 @@
+# /utils/geo.py
+
+import math
+import threading
+from models.models import db, ParkingLot
+
+EARTH_RADIUS_KM = 6371.0
+CELL_DEGREES = 0.05  # ~5.5 km grid cells
+DEFAULT_RADIUS_KM = 5.0
+MAX_RADIUS_KM = 50.0
+DEFAULT_RESULTS = 10
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def valid_point(lat, lng):
+    """True for finite coordinates on the globe."""
+    return (lat is not None and lng is not None and math.isfinite(lat) and math.isfinite(lng)
+            and -90 <= lat <= 90 and -180 <= lng <= 180)
+
+
+def clamp_radius(radius_km):
+    """Search radius limited to [0, MAX_RADIUS_KM]; the default if it is not a number."""
+    if radius_km is None or math.isnan(radius_km):
+        return DEFAULT_RADIUS_KM
+    return min(max(radius_km, 0.0), MAX_RADIUS_KM)
+
+
+def _cell(lat, lng):
+    return int(math.floor(lat / CELL_DEGREES)), int(math.floor(lng / CELL_DEGREES))
+
+
+# --- SPATIAL GRID ---
+class LotGrid:
+    """Uniform lat/lng grid over lot coordinates plus a pin-code lookup.
+
+    A radius query only visits the cells overlapping the search circle's
+    bounding box. The index holds ids and coordinates only and is rebuilt
+    lazily after any lot is added, moved or removed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cells = None  # (row, col) -> [(lot_id, lat, lng)]
+        self._coords = {}   # lot_id -> (lat, lng)
+        self._by_pin = {}   # pin_code -> [lot_id]
+
+    def invalidate(self):
+        with self._lock:
+            self._cells = None
+
+    def _ensure(self):
+        with self._lock:
+            if self._cells is not None:
+                return
+        rows = db.session.query(ParkingLot.id, ParkingLot.latitude, ParkingLot.longitude, ParkingLot.pin_code).all()
+        cells, coords, by_pin = {}, {}, {}
+        for lot_id, lat, lng, pin in rows:
+            if pin:
+                by_pin.setdefault(pin.strip(), []).append(lot_id)
+            if lat is None or lng is None:
+                continue
+            coords[lot_id] = (lat, lng)
+            cells.setdefault(_cell(lat, lng), []).append((lot_id, lat, lng))
+        with self._lock:
+            self._cells, self._coords, self._by_pin = cells, coords, by_pin
+
+    def pin_centroid(self, pin_code):
+        """Mean coordinates of the lots in a pin code, or None if none are located."""
+        self._ensure()
+        points = [self._coords[i] for i in self._by_pin.get(pin_code.strip(), []) if i in self._coords]
+        if not points:
+            return None
+        return sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points)
+
+    def lots_in_pin(self, pin_code):
+        self._ensure()
+        return list(self._by_pin.get(pin_code.strip(), []))
+
+    def nearby(self, lat, lng, radius_km):
+        """[(distance_km, lot_id)] within radius_km, nearest first."""
+        self._ensure()
+        dlat = radius_km / 111.0
+        dlng = radius_km / max(1e-6, 111.0 * math.cos(math.radians(lat)))
+        row_lo, col_lo = _cell(lat - dlat, lng - dlng)
+        row_hi, col_hi = _cell(lat + dlat, lng + dlng)
+
+        found = []
+        with self._lock:
+            if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self._coords):
+                # Box spans more cells than there are lots: checking every lot is cheaper
+                candidates = ((lot_id, lot_lat, lot_lng) for lot_id, (lot_lat, lot_lng) in self._coords.items())
+            else:
+                candidates = (lot for row in range(row_lo, row_hi + 1) for col in range(col_lo, col_hi + 1)
+                              for lot in self._cells.get((row, col), ()))
+            for lot_id, lot_lat, lot_lng in candidates:
+                distance = haversine_km(lat, lng, lot_lat, lot_lng)
+                if distance <= radius_km:
+                    found.append((distance, lot_id))
+        return sorted(found)
+
+
+lot_grid = LotGrid()
+
+
+# --- SEARCH ---
+def search_lots(pin_code=None, lat=None, lng=None, radius_km=DEFAULT_RADIUS_KM,
+                limit=DEFAULT_RESULTS, only_available=True, name=None):
+    """Nearest lots with free capacity.
+
+    Searches around (lat, lng), or around the pin code's located lots; with no
+    located lots the pin code is matched exactly. `name` matches location name
+    or address instead. Without any criteria, returns the lots with the most
+    free spots. Invalid coordinates are ignored and the radius is capped at
+    MAX_RADIUS_KM. Returns [(lot, distance_km or None)].
+    """
+    radius_km = clamp_radius(radius_km)
+    if not valid_point(lat, lng):
+        lat = lng = None
+    if lat is None and pin_code:
+        centre = lot_grid.pin_centroid(pin_code)
+        if centre:
+            lat, lng = centre
+
+    if lat is not None and lng is not None:
+        ranked = lot_grid.nearby(lat, lng, radius_km)
+    elif pin_code:
+        ranked = [(None, lot_id) for lot_id in lot_grid.lots_in_pin(pin_code)]
+    else:
+        query = ParkingLot.query
+        if name:
+            pattern = f'%{name}%'
+            query = query.filter(db.or_(ParkingLot.prime_location_name.ilike(pattern),
+                                        ParkingLot.address.ilike(pattern)))
+        if only_available:
+            query = query.filter(ParkingLot.available_count > 0)
+        lots = query.order_by(ParkingLot.available_count.desc(), ParkingLot.id).limit(limit).all()
+        return [(lot, None) for lot in lots]
+
+    if not ranked:
+        return []
+    query = ParkingLot.query.filter(ParkingLot.id.in_([lot_id for _, lot_id in ranked]))
+    if only_available:
+        query = query.filter(ParkingLot.available_count > 0)
+    lots = {lot.id: lot for lot in query.all()}
+    return [(lots[lot_id], distance) for distance, lot_id in ranked if lot_id in lots][:limit]
@@ -0,0 +1,155 @@
+# /utils/instrumentation.py
+
+import cProfile
+import os
+import random
+import threading
+import time
+from flask import Response, g, has_request_context, request, request_finished, request_started
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+# --- METRICS REGISTRY ---
+class Metrics:
+    """Thread-safe counters, gauges and histograms rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}  # name -> {'type', 'help', 'samples': {(suffix, labels): value}}
+
+    def _samples(self, name, kind, help_text):
+        family = self._families.setdefault(name, {'type': kind, 'help': help_text, 'samples': {}})
+        return family['samples']
+
+    def inc(self, name, value=1, help_text='', **labels):
+        key = ('', tuple(sorted(labels.items())))
+        with self._lock:
+            samples = self._samples(name, 'counter', help_text)
+            samples[key] = samples.get(key, 0) + value
+
+    def set(self, name, value, help_text='', **labels):
+        with self._lock:
+            self._samples(name, 'gauge', help_text)[('', tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, help_text='', buckets=DURATION_BUCKETS, **labels):
+        """Histogram observation: cumulative buckets plus _sum and _count."""
+        with self._lock:
+            samples = self._samples(name, 'histogram', help_text)
+            for bound in buckets + ('+Inf',):
+                if bound == '+Inf' or value <= bound:
+                    key = ('_bucket', tuple(sorted({**labels, 'le': str(bound)}.items())))
+                    samples[key] = samples.get(key, 0) + 1
+            for suffix, amount in (('_sum', value), ('_count', 1)):
+                key = (suffix, tuple(sorted(labels.items())))
+                samples[key] = samples.get(key, 0) + amount
+
+    def value(self, name, **labels):
+        with self._lock:
+            family = self._families.get(name)
+            return family['samples'].get(('', tuple(sorted(labels.items())))) if family else None
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name in sorted(self._families):
+                family = self._families[name]
+                if family['help']:
+                    lines.append(f"# HELP {name} {family['help']}")
+                lines.append(f"# TYPE {name} {family['type']}")
+                for (suffix, labels), value in sorted(family['samples'].items()):
+                    label_str = ','.join(f'{k}="{v}"' for k, v in labels)
+                    sample = f'{name}{suffix}{{{label_str}}}' if label_str else f'{name}{suffix}'
+                    lines.append(f'{sample} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+# --- REQUEST HOOKS ---
+def _on_request_started(sender, **extra):
+    g.instr_start = time.perf_counter()
+    g.instr_sql_count = 0
+    g.instr_sql_time = 0.0
+    g.instr_render_time = 0.0
+
+    rate = sender.config.get('PROFILE_SAMPLE_RATE', 0)
+    if rate and random.random() < rate:
+        g.instr_profiler = cProfile.Profile()
+        g.instr_profiler.enable()
+
+
+def _on_request_finished(sender, response, **extra):
+    start = g.pop('instr_start', None)
+    if start is None:
+        return
+    endpoint = request.endpoint or 'unknown'
+    wall = time.perf_counter() - start
+
+    profiler = g.pop('instr_profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _dump_profile(sender, profiler, endpoint)
+
+    metrics.observe('http_request_duration_seconds', wall,
+                    'Wall time per request', endpoint=endpoint)
+    metrics.inc('http_requests_total', 1, 'Requests served',
+                endpoint=endpoint, status=str(response.status_code))
+    metrics.inc('sql_queries_total', g.instr_sql_count, 'SQL statements executed', endpoint=endpoint)
+    metrics.inc('sql_time_seconds_total', g.instr_sql_time, 'Time spent in SQL', endpoint=endpoint)
+    metrics.inc('template_render_seconds_total', g.instr_render_time,
+                'Time spent rendering templates', endpoint=endpoint)
+
+    response.headers['X-Query-Count'] = str(g.instr_sql_count)
+
+
+def _on_before_render(sender, template, context, **extra):
+    if has_request_context():
+        g.instr_render_start = time.perf_counter()
+
+
+def _on_rendered(sender, template, context, **extra):
+    if has_request_context() and 'instr_render_start' in g:
+        g.instr_render_time = g.get('instr_render_time', 0.0) + time.perf_counter() - g.pop('instr_render_start')
+
+
+def _dump_profile(app, profiler, endpoint):
+    directory = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{endpoint.replace('.', '_')}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof"
+    profiler.dump_stats(os.path.join(directory, filename))
+
+
+# --- SQLALCHEMY HOOKS ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('instr_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('instr_query_start')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if has_request_context() and 'instr_start' in g:
+        g.instr_sql_count += 1
+        g.instr_sql_time += elapsed
+
+
+# --- SETUP ---
+def init_instrumentation(app, db):
+    """Wire timing hooks into Flask signals and the SQLAlchemy engine, and add /metrics."""
+    request_started.connect(_on_request_started, app)
+    request_finished.connect(_on_request_finished, app)
+    before_render_template.connect(_on_before_render, app)
+    template_rendered.connect(_on_rendered, app)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,153 @@
+# /utils/jobs.py
+
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import OperationalError
+from models.models import db, Job
+
+MAX_WORKERS = 2
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF_SECONDS = 0.5  # doubled after every busy retry
+STALE_RUNNING = timedelta(minutes=15)  # a 'running' job this old lost its process
+
+_handlers = {}
+
+
+def job_handler(kind):
+    """Register fn(report, **params) as the handler for jobs of `kind`.
+
+    report(percent, message) records progress; the return value is stored as
+    the job's JSON result.
+    """
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def _is_busy(error):
+    text = str(error).lower()
+    return 'database is locked' in text or 'database is busy' in text
+
+
+# --- QUEUE ---
+class JobQueue:
+    """In-process thread pool running jobs persisted in the `jobs` table.
+
+    Admin requests enqueue work and return at once. A job is claimed with a
+    conditional UPDATE (queued -> running), so with several worker processes
+    each job still runs only once. Handlers must be idempotent: a job that
+    hits SQLite's "database is locked" is rolled back and re-run with backoff.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Remember the app; threads start on first use in each process (fork safe)."""
+        self._app = app
+
+        @app.before_request
+        def start_job_workers():
+            self.ensure_started()
+
+    def ensure_started(self):
+        """Start this process's worker threads and resume jobs left behind by dead ones."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return self._executor
+            self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='jobs')
+            self._pid = os.getpid()
+            executor = self._executor
+
+        with self._app.app_context():
+            db.session.execute(
+                db.update(Job).where(Job.status == 'R', Job.started_at < datetime.now() - STALE_RUNNING)
+                .values(status='Q')
+            )
+            db.session.commit()
+            pending = [row[0] for row in db.session.query(Job.id).filter(Job.status == 'Q').order_by(Job.id)]
+        for job_id in pending:
+            executor.submit(self._run, job_id)
+        return executor
+
+    def enqueue(self, kind, created_by=None, **params):
+        if kind not in _handlers:
+            raise ValueError(f'unknown job kind: {kind}')
+        job = Job(kind=kind, params=json.dumps(params), status='Q', progress=0, created_by=created_by)
+        db.session.add(job)
+        db.session.commit()
+        self.ensure_started().submit(self._run, job.id)
+        return job
+
+    # ---- worker side ----
+    def _run(self, job_id):
+        with self._app.app_context():
+            claimed = db.session.execute(
+                db.update(Job).where(Job.id == job_id, Job.status == 'Q')
+                .values(status='R', started_at=datetime.now())
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                return
+
+            job = db.session.get(Job, job_id)
+            handler = _handlers.get(job.kind)
+            params = json.loads(job.params or '{}')
+            report = lambda percent, message=None: self._report(job_id, percent, message)
+
+            delay = RETRY_BACKOFF_SECONDS
+            while True:
+                job.attempts += 1
+                db.session.commit()
+                try:
+                    result = handler(report, **params)
+                    self._finish(job_id, 'D', 'Completed', result)
+                    return
+                except OperationalError as e:
+                    db.session.rollback()
+                    if _is_busy(e) and job.attempts < MAX_ATTEMPTS:
+                        time.sleep(delay)
+                        delay *= 2
+                        continue
+                    self._finish(job_id, 'F', f'Database error: {e.orig}')
+                    return
+                except ValueError as e:
+                    # Handlers raise ValueError for expected refusals (e.g. occupied spots)
+                    db.session.rollback()
+                    self._finish(job_id, 'F', str(e))
+                    return
+                except Exception as e:
+                    db.session.rollback()
+                    traceback.print_exc()
+                    self._finish(job_id, 'F', str(e) or e.__class__.__name__)
+                    return
+
+    def _report(self, job_id, percent, message=None):
+        values = {'progress': max(0, min(100, int(percent)))}
+        if message is not None:
+            values['message'] = message
+        db.session.execute(db.update(Job).where(Job.id == job_id).values(**values))
+        db.session.commit()
+
+    def _finish(self, job_id, status, message, result=None):
+        db.session.execute(
+            db.update(Job).where(Job.id == job_id).values(
+                status=status, message=message, finished_at=datetime.now(),
+                progress=100 if status == 'D' else Job.progress,
+                result=json.dumps(result) if result is not None else None
+            )
+        )
+        db.session.commit()
+
+
+jobs = JobQueue()
@@ -0,0 +1,217 @@
+# /utils/migrations.py
+
+from datetime import datetime
+from sqlalchemy import inspect, text
+from models.models import (
+    db, LotRevenueDaily, User, ParkingSpot, ReserveSpot, ScheduledReservation, Job, ReservationArchive,
+    GateEvent
+)
+from utils.revenue import backfill_revenue
+
+
+# --- HELPERS ---
+def _has_column(table, column):
+    return column in {c['name'] for c in inspect(db.engine).get_columns(table)}
+
+
+def _add_column(table, column, ddl):
+    if not _has_column(table, column):
+        db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+def _create_index(model, name):
+    index = next(i for i in model.__table__.indexes if i.name == name)
+    index.create(db.engine, checkfirst=True)
+
+
+def _recount_lot_counters():
+    db.session.execute(text(
+        "UPDATE parking_lots SET "
+        "occupied_count = (SELECT COUNT(*) FROM parking_spots s "
+        "WHERE s.lot_id = parking_lots.id AND s.status = 'O'), "
+        "available_count = (SELECT COUNT(*) FROM parking_spots s "
+        "WHERE s.lot_id = parking_lots.id AND s.status = 'A')"
+    ))
+
+
+# --- MIGRATIONS ---
+# Migrations use plain SQL or explicit columns only: the ORM models describe the
+# latest schema, which may have columns that later migrations have yet to add.
+def _lot_counters():
+    _add_column('parking_lots', 'occupied_count', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column('parking_lots', 'available_count', 'INTEGER NOT NULL DEFAULT 0')
+    _recount_lot_counters()
+
+
+def _revenue_rollup():
+    LotRevenueDaily.__table__.create(db.engine, checkfirst=True)
+    backfill_revenue()
+
+
+def _hot_path_indexes():
+    _create_index(User, 'ix_users_role')
+    _create_index(ParkingSpot, 'ix_parking_spots_lot_status')
+    _create_index(ReserveSpot, 'ix_reservations_spot_parked')
+    _create_index(ReserveSpot, 'ix_reservations_user_parked')
+
+
+def _lot_version():
+    _add_column('parking_lots', 'version', 'INTEGER NOT NULL DEFAULT 1')
+
+
+def _lot_tariff():
+    _add_column('parking_lots', 'tariff', 'TEXT')
+
+
+def _scheduled_reservations():
+    ScheduledReservation.__table__.create(db.engine, checkfirst=True)
+
+
+def _lot_coordinates():
+    _add_column('parking_lots', 'latitude', 'FLOAT')
+    _add_column('parking_lots', 'longitude', 'FLOAT')
+
+
+def _jobs():
+    Job.__table__.create(db.engine, checkfirst=True)
+
+
+def _reservation_archives():
+    ReservationArchive.__table__.create(db.engine, checkfirst=True)
+
+
+def _gate_events():
+    GateEvent.__table__.create(db.engine, checkfirst=True)
+
+
+def _close_duplicate_open_reservations():
+    """Leave each vehicle only its newest open reservation: older ones are closed,
+    free of charge, when the newest started, and their spots are freed."""
+    rows = db.session.execute(text(
+        "SELECT id, spot_id, vehicle_no, parking_timestamp FROM reservations "
+        "WHERE leaving_timestamp IS NULL AND vehicle_no != ''"
+    )).all()
+    by_plate = {}
+    for row in rows:
+        by_plate.setdefault(row.vehicle_no.replace(' ', '').upper(), []).append(row)
+
+    stale = []
+    for open_rows in by_plate.values():
+        open_rows.sort(key=lambda row: row.id)
+        left = open_rows[-1].parking_timestamp or datetime.now()
+        stale += [{'id': row.id, 'spot_id': row.spot_id, 'left': left} for row in open_rows[:-1]]
+    if not stale:
+        return
+    db.session.execute(text(
+        "UPDATE reservations SET leaving_timestamp = :left, parking_cost = 0 WHERE id = :id"
+    ), stale)
+    db.session.execute(text(
+        "UPDATE parking_spots SET status = 'A' WHERE id = :spot_id AND NOT EXISTS ("
+        "SELECT 1 FROM reservations r WHERE r.spot_id = parking_spots.id AND r.leaving_timestamp IS NULL)"
+    ), stale)
+    _recount_lot_counters()
+    print(f"Closed {len(stale)} older open reservation(s) of vehicles parked twice: "
+          f"{', '.join(str(row['id']) for row in stale)}")
+
+
+def _open_reservation_indexes():
+    _close_duplicate_open_reservations()
+    # Raw SQL: the expression index cannot be reflected for a checkfirst create
+    db.session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_reservations_open_plate "
+        "ON reservations (UPPER(REPLACE(vehicle_no, ' ', ''))) "
+        "WHERE leaving_timestamp IS NULL AND vehicle_no != ''"
+    ))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_reservations_open_user "
+        "ON reservations (user_id) WHERE leaving_timestamp IS NULL"
+    ))
+
+
+def _lot_hold_version():
+    _add_column('parking_lots', 'hold_version', 'INTEGER NOT NULL DEFAULT 0')
+
+
+def _reservation_ids_autoincrement():
+    """SQLite hands out max(id) + 1, which reuses the ids of archived reservations
+    once the newest ones leave the table. Rebuild reservations with AUTOINCREMENT
+    and start its sequence above every id already used, archives included."""
+    if db.engine.dialect.name != 'sqlite':
+        return  # sequences never hand an id out twice
+    ddl = db.session.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'reservations'"
+    )).scalar()
+    if 'AUTOINCREMENT' not in ddl.upper():
+        columns = 'id, spot_id, user_id, vehicle_no, parking_timestamp, leaving_timestamp, parking_cost'
+        db.session.execute(text(
+            "CREATE TABLE reservations_new ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "spot_id INTEGER NOT NULL REFERENCES parking_spots (id), "
+            "user_id INTEGER NOT NULL REFERENCES users (id), "
+            "vehicle_no VARCHAR(20) NOT NULL, "
+            "parking_timestamp DATETIME, leaving_timestamp DATETIME, "
+            "parking_cost FLOAT NOT NULL)"
+        ))
+        db.session.execute(text(f'INSERT INTO reservations_new ({columns}) SELECT {columns} FROM reservations'))
+        db.session.execute(text('DROP TABLE reservations'))
+        db.session.execute(text('ALTER TABLE reservations_new RENAME TO reservations'))
+        db.session.execute(text(
+            'CREATE INDEX ix_reservations_spot_parked ON reservations (spot_id, parking_timestamp)'
+        ))
+        db.session.execute(text(
+            'CREATE INDEX ix_reservations_user_parked ON reservations (user_id, parking_timestamp)'
+        ))
+        _open_reservation_indexes()
+
+    tables = ['reservations'] + [row[0] for row in db.session.execute(
+        text('SELECT table_name FROM reservation_archives'))]
+    high = max(db.session.execute(text(f'SELECT COALESCE(MAX(id), 0) FROM {table}')).scalar()
+               for table in tables)
+    db.session.execute(text("DELETE FROM sqlite_sequence WHERE name = 'reservations'"))
+    db.session.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('reservations', :high)"),
+                       {'high': high})
+
+
+# (version, description, function) -- append only, never renumber
+MIGRATIONS = [
+    (1, 'parking_lots occupancy counters', _lot_counters),
+    (2, 'lot_revenue_daily rollup', _revenue_rollup),
+    (3, 'indexes for spot, reservation and role lookups', _hot_path_indexes),
+    (4, 'parking_lots change version', _lot_version),
+    (5, 'parking_lots tariff', _lot_tariff),
+    (6, 'scheduled_reservations', _scheduled_reservations),
+    (7, 'parking_lots coordinates', _lot_coordinates),
+    (8, 'background jobs', _jobs),
+    (9, 'reservation archive catalog', _reservation_archives),
+    (10, 'gate events', _gate_events),
+    (11, 'open reservation indexes (one per vehicle)', _open_reservation_indexes),
+    (12, 'parking_lots hold version', _lot_hold_version),
+    (13, 'reservation ids never reused (SQLite AUTOINCREMENT)', _reservation_ids_autoincrement),
+]
+
+
+# --- RUNNER ---
+def current_version():
+    db.session.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version INTEGER PRIMARY KEY, description VARCHAR(200), applied_at TIMESTAMP)'
+    ))
+    return db.session.execute(text('SELECT MAX(version) FROM schema_migrations')).scalar() or 0
+
+
+def upgrade():
+    """Apply pending migrations in order. Returns the list of versions applied."""
+    version = current_version()
+    applied = []
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        migrate()
+        db.session.execute(
+            text('INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)'),
+            {'v': number, 'd': description, 't': datetime.now()}
+        )
+        db.session.commit()
+        print(f"Applied migration {number}: {description}")
+        applied.append(number)
+    return applied
@@ -0,0 +1,68 @@
+# /utils/occupancy.py
+
+from sqlalchemy import func
+from models.models import db, ParkingLot, ParkingSpot, ReserveSpot
+
+
+# --- LATEST RESERVATION PER SPOT ---
+def latest_reservations(spot_ids=None):
+    """Return {spot_id: ReserveSpot} holding the most recent reservation of each spot.
+
+    Uses a ROW_NUMBER() window so the whole lookup is one query, no matter
+    how many spots are involved.
+    """
+    ranked = db.session.query(
+        ReserveSpot.id.label('reservation_id'),
+        func.row_number().over(
+            partition_by=ReserveSpot.spot_id,
+            order_by=(ReserveSpot.parking_timestamp.desc(), ReserveSpot.id.desc())
+        ).label('rn')
+    )
+    if spot_ids is not None:
+        ranked = ranked.filter(ReserveSpot.spot_id.in_(spot_ids))
+    ranked = ranked.subquery()
+
+    rows = (
+        ReserveSpot.query
+        .join(ranked, ReserveSpot.id == ranked.c.reservation_id)
+        .filter(ranked.c.rn == 1)
+        .all()
+    )
+    return {r.spot_id: r for r in rows}
+
+
+def latest_reservation(spot_id):
+    return latest_reservations([spot_id]).get(spot_id)
+
+
+# --- LOT OCCUPANCY SNAPSHOT ---
+def lot_occupancy_snapshot():
+    """Lots, their spots and each spot's latest reservation in three queries.
+
+    Returns a list of dicts shaped like:
+        {'lot': ParkingLot, 'spots': [{'spot': ParkingSpot, 'reservation': ReserveSpot|None}],
+         'occupied_count': int, 'max_spots': int}
+    """
+    lots = ParkingLot.query.order_by(ParkingLot.id).all()
+    spots = ParkingSpot.query.order_by(ParkingSpot.id).all()
+    latest = latest_reservations()
+
+    spots_by_lot = {lot.id: [] for lot in lots}
+    for spot in spots:
+        if spot.lot_id in spots_by_lot:
+            spots_by_lot[spot.lot_id].append({
+                'spot': spot,
+                'reservation': latest.get(spot.id)
+            })
+
+    snapshot = []
+    for lot in lots:
+        spot_details = spots_by_lot[lot.id]
+        occupied_count = sum(1 for s in spot_details if s['spot'].status == 'O')
+        snapshot.append({
+            'lot': lot,
+            'spots': spot_details,
+            'occupied_count': occupied_count,
+            'max_spots': lot.max_spots
+        })
+    return snapshot
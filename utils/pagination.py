@@ -0,0 +1,75 @@
+# /utils/pagination.py
+
+from datetime import datetime
+from sqlalchemy import and_, or_
+from models.models import db, ParkingLot, User
+from utils.archive import history
+
+RESERVATIONS_PAGE_SIZE = 20
+USERS_PAGE_SIZE = 50
+
+
+# --- CURSORS ---
+def encode_reservation_cursor(reservation):
+    # Legacy/imported rows may lack a parking time: empty timestamp part
+    ts = reservation.parking_timestamp.isoformat() if reservation.parking_timestamp else ''
+    return f'{ts}_{reservation.id}'
+
+
+def decode_reservation_cursor(cursor):
+    """(parking_timestamp or None, id) from a cursor string, or None if missing/invalid."""
+    if not cursor:
+        return None
+    try:
+        ts, _, res_id = cursor.rpartition('_')
+        return (datetime.fromisoformat(ts) if ts else None), int(res_id)
+    except ValueError:
+        return None
+
+
+# --- KEYSET PAGES ---
+def reservation_page(user_id, cursor=None, limit=RESERVATIONS_PAGE_SIZE):
+    """One page of a user's reservations, newest first, keyed on (parking_timestamp, id).
+
+    Reads the hot table and the archives (utils/archive.py); rows carry the
+    reservation columns plus lot_name. Rows without a parking_timestamp come
+    last, by id. Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    position = decode_reservation_cursor(cursor)
+
+    def mine(c):
+        criteria = [c.user_id == user_id]
+        if position:
+            ts, res_id = position
+            if ts is None:
+                criteria.append(and_(c.parking_timestamp.is_(None), c.id < res_id))
+            else:
+                criteria.append(or_(
+                    c.parking_timestamp < ts,
+                    and_(c.parking_timestamp == ts, c.id < res_id),
+                    c.parking_timestamp.is_(None)
+                ))
+        return criteria
+
+    page = history(mine, end=position[0] if position else None, newest=limit + 1)
+    rows = (
+        db.session.query(page, ParkingLot.prime_location_name.label('lot_name'))
+        .outerjoin(ParkingLot, ParkingLot.id == page.c.lot_id)
+        .order_by(page.c.parking_timestamp.desc().nulls_last(), page.c.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = encode_reservation_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def user_page(after_id=None, limit=USERS_PAGE_SIZE):
+    """One page of registered (non-admin) users ordered by id. Returns (users, next_after_id)."""
+    query = User.query.filter_by(role='user')
+    if after_id:
+        query = query.filter(User.id > after_id)
+    rows = query.order_by(User.id).limit(limit + 1).all()
+
+    next_after = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_after
@@ -0,0 +1,242 @@
+# /utils/pricing.py
+"""Per-lot tariffs.
+
+A lot's `tariff` column holds optional JSON; without it the lot charges its
+hourly `price` around the clock. All keys are optional:
+
+    {
+      "bands":         [{"start": "08:00", "end": "20:00", "rate": 30}],  # weekday hourly rates
+      "weekend_bands": [{"start": "00:00", "end": "24:00", "rate": 15}],  # Sat/Sun hourly rates
+      "weekend_rate":  20,    # Sat/Sun hourly rate outside weekend_bands (default: price)
+      "first_hour":    25,    # flat charge for the first hour, or any part of it
+      "daily_cap":     300    # most that one calendar day of a stay can cost
+    }
+
+Hours not covered by a band are charged at the lot's base rate.
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+from models.models import db, ParkingLot, ParkingSpot, ReserveSpot
+from utils.archive import archive_table, archived_months
+
+MINUTES_PER_DAY = 24 * 60
+CACHE_TTL_SECONDS = 300  # safety net for edits made by other worker processes
+
+
+# --- COMPILED TARIFF ---
+def _minute_of_day(value):
+    hours, _, minutes = str(value).partition(':')
+    minute = int(hours) * 60 + int(minutes or 0)
+    if not 0 <= minute <= MINUTES_PER_DAY:
+        raise ValueError(f"time '{value}' is outside 00:00-24:00")
+    return minute
+
+
+def _compile_bands(bands, base_rate):
+    """Sorted, gap-free [(start_min, end_min, hourly_rate)] covering the whole day."""
+    parsed = sorted(
+        (_minute_of_day(b['start']), _minute_of_day(b['end']), float(b['rate']))
+        for b in bands or []
+    )
+    day, cursor = [], 0
+    for start, end, rate in parsed:
+        if end <= start:
+            raise ValueError('each band must end after it starts (split overnight bands at 24:00)')
+        if start < cursor:
+            raise ValueError('tariff bands overlap')
+        if start > cursor:
+            day.append((cursor, start, base_rate))
+        day.append((start, end, rate))
+        cursor = end
+    if cursor < MINUTES_PER_DAY:
+        day.append((cursor, MINUTES_PER_DAY, base_rate))
+    return day
+
+
+class CompiledTariff:
+    def __init__(self, base_rate, spec=None):
+        spec = spec or {}
+        weekday = _compile_bands(spec.get('bands'), base_rate)
+        if 'weekend_bands' in spec:
+            weekend = _compile_bands(spec['weekend_bands'], float(spec.get('weekend_rate', base_rate)))
+        elif 'weekend_rate' in spec:
+            weekend = _compile_bands(None, float(spec['weekend_rate']))
+        else:
+            weekend = weekday
+
+        # (bands, band start minutes) for bisecting into the day
+        self.weekday = (weekday, [b[0] for b in weekday])
+        self.weekend = (weekend, [b[0] for b in weekend])
+        self.first_hour = float(spec['first_hour']) if spec.get('first_hour') is not None else None
+        self.daily_cap = float(spec['daily_cap']) if spec.get('daily_cap') is not None else None
+
+    def _segment_cost(self, day, start_min, end_min):
+        """Cost of [start_min, end_min) minutes within one day's bands: O(bands)."""
+        bands, starts = self.weekend if day.weekday() >= 5 else self.weekday
+        i = bisect_right(starts, start_min) - 1
+        cost = 0.0
+        while i < len(bands) and bands[i][0] < end_min:
+            band_start, band_end, rate = bands[i]
+            overlap = min(end_min, band_end) - max(start_min, band_start)
+            if overlap > 0:
+                cost += overlap * rate / 60
+            i += 1
+        return cost
+
+    def cost(self, start, end):
+        """Charge for parking from `start` to `end` (datetimes)."""
+        if end <= start:
+            return 0.0
+
+        # The first hour may be a flat charge; banded pricing starts after it
+        per_day = {}
+        banded_from = start
+        if self.first_hour is not None:
+            per_day[start.date()] = self.first_hour
+            banded_from = min(end, start + timedelta(hours=1))
+
+        cursor = banded_from
+        while cursor < end:
+            day_end = datetime.combine(cursor.date() + timedelta(days=1), datetime.min.time())
+            segment_end = min(end, day_end)
+            start_min = (cursor - datetime.combine(cursor.date(), datetime.min.time())).total_seconds() / 60
+            end_min = start_min + (segment_end - cursor).total_seconds() / 60
+            per_day[cursor.date()] = per_day.get(cursor.date(), 0.0) + self._segment_cost(cursor, start_min, end_min)
+            cursor = segment_end
+
+        if self.daily_cap is not None:
+            return round(sum(min(c, self.daily_cap) for c in per_day.values()), 2)
+        return round(sum(per_day.values()), 2)
+
+
+def compile_tariff(price, tariff_json=None):
+    """Parse and validate a lot's tariff. Raises ValueError on a malformed tariff."""
+    try:
+        spec = json.loads(tariff_json) if tariff_json else None
+        if spec is not None and not isinstance(spec, dict):
+            raise ValueError('tariff must be a JSON object')
+        return CompiledTariff(float(price), spec)
+    except (KeyError, TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f'invalid tariff: {e}')
+
+
+# --- CACHE ---
+class TariffCache:
+    """lot_id -> CompiledTariff, filled on first use and dropped when a lot's pricing changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # lot_id -> (loaded_at, CompiledTariff)
+
+    def get(self, lot_id):
+        with self._lock:
+            entry = self._entries.get(lot_id)
+        if entry and time.monotonic() - entry[0] < CACHE_TTL_SECONDS:
+            return entry[1]
+
+        row = db.session.query(ParkingLot.price, ParkingLot.tariff).filter(ParkingLot.id == lot_id).first()
+        if row is None:
+            raise LookupError(f'parking lot {lot_id} not found')
+        compiled = compile_tariff(row.price, row.tariff)
+        with self._lock:
+            self._entries[lot_id] = (time.monotonic(), compiled)
+        return compiled
+
+    def preload(self, lots):
+        """Compile tariffs for already-loaded (id, price, tariff) rows without querying."""
+        now = time.monotonic()
+        compiled = {lot_id: (now, compile_tariff(price, tariff)) for lot_id, price, tariff in lots}
+        with self._lock:
+            self._entries.update(compiled)
+
+    def invalidate(self, lot_id=None):
+        with self._lock:
+            if lot_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(lot_id, None)
+
+
+tariffs = TariffCache()
+
+
+def parking_cost(lot_id, start, end):
+    return tariffs.get(lot_id).cost(start, end)
+
+
+# --- BATCH RE-PRICING ---
+def _reprice_sources(start, end):
+    """(table, select of id, lot_id, parked, left, cost) for the hot table and each archive month."""
+    hot = ReserveSpot.__table__
+    yield hot, (
+        db.select(hot.c.id, ParkingSpot.lot_id, hot.c.parking_timestamp, hot.c.leaving_timestamp,
+                  hot.c.parking_cost)
+        .select_from(hot.join(ParkingSpot.__table__, ParkingSpot.id == hot.c.spot_id))
+    )
+    for month in archived_months(start, end):
+        table = archive_table(month)
+        yield table, (  # archived history of deleted lots has no tariff left to apply
+            db.select(table.c.id, table.c.lot_id, table.c.parking_timestamp, table.c.leaving_timestamp,
+                      table.c.parking_cost)
+            .select_from(table.join(ParkingLot.__table__, ParkingLot.id == table.c.lot_id))
+        )
+
+
+def reprice_reservations(start=None, end=None, lot_id=None, apply=False, chunk_size=2000):
+    """Recompute costs of released reservations parked within [start, end), archived ones included.
+
+    Streams rows in chunks and compiles each lot's tariff once. With apply=True
+    the new costs are written back, to the hot table or the reservation's
+    archive month, with one executemany per chunk, and the affected lots'
+    versions are bumped so cached pages showing old totals go stale.
+    Returns {'checked', 'changed', 'old_total', 'new_total'}.
+    """
+    tariffs.preload(db.session.query(ParkingLot.id, ParkingLot.price, ParkingLot.tariff).all())
+
+    report = {'checked': 0, 'changed': 0, 'old_total': 0.0, 'new_total': 0.0}
+    updates = []  # (table, [{'b_id', 'b_cost'}])
+    changed_lots = set()
+    for table, query in list(_reprice_sources(start, end)):
+        c = query.selected_columns
+        query = query.where(c.leaving_timestamp.isnot(None), c.lot_id.isnot(None))
+        if start:
+            query = query.where(c.parking_timestamp >= start)
+        if end:
+            query = query.where(c.parking_timestamp < end)
+        if lot_id:
+            query = query.where(c.lot_id == lot_id)
+
+        changed = []
+        rows = db.session.execute(query.order_by(c.id).execution_options(yield_per=chunk_size))
+        for res_id, res_lot_id, parked, left, old_cost in rows:
+            new_cost = tariffs.get(res_lot_id).cost(parked, left)
+            report['checked'] += 1
+            report['old_total'] += old_cost or 0
+            report['new_total'] += new_cost
+            if round(old_cost or 0, 2) != new_cost:
+                changed.append({'b_id': res_id, 'b_cost': new_cost})
+                changed_lots.add(res_lot_id)
+        report['changed'] += len(changed)
+        updates.append((table, changed))
+
+    if apply:
+        for table, changed in updates:
+            stmt = (db.update(table).where(table.c.id == db.bindparam('b_id'))
+                    .values(parking_cost=db.bindparam('b_cost')))
+            for i in range(0, len(changed), chunk_size):
+                db.session.execute(stmt, changed[i:i + chunk_size])
+        if changed_lots:
+            db.session.execute(
+                db.update(ParkingLot).where(ParkingLot.id.in_(changed_lots))
+                .values(version=ParkingLot.version + 1).execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+
+    report['old_total'] = round(report['old_total'], 2)
+    report['new_total'] = round(report['new_total'], 2)
+    return report
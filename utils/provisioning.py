@@ -0,0 +1,234 @@
+# /utils/provisioning.py
+
+import csv
+from datetime import datetime
+from models.models import db, LotRevenueDaily, ParkingLot, ParkingSpot, ScheduledReservation
+from utils.archive import archive_reservations
+from utils.allocation import allocator
+from utils.scheduling import schedule
+from utils.geo import lot_grid
+from utils.counters import adjust_lot_counters
+from utils.events import publish_lot
+from utils.jobs import job_handler
+from utils.cache import page_cache
+
+CHUNK_SIZE = 1000       # spots deleted per transaction by background jobs
+SHRINK_INLINE_LIMIT = 500  # larger shrinks run as a background job
+
+
+# --- GROW / SHRINK ---
+def add_spots(lot_id, count):
+    """Insert `count` free spots with a single executemany (current transaction)."""
+    if count <= 0:
+        return 0
+    db.session.execute(db.insert(ParkingSpot), [{'lot_id': lot_id, 'status': 'A'}] * count)
+    adjust_lot_counters(lot_id, available=count)
+    return count
+
+
+def remove_free_spots(lot_id, count):
+    """Delete `count` free spots with one set-based DELETE (current transaction).
+
+    Spots with an upcoming advance hold are kept. Returns False, deleting
+    nothing, if the lot does not have that many removable spots.
+    """
+    if count <= 0:
+        return True
+    held = (
+        db.select(ScheduledReservation.id)
+        .where(ScheduledReservation.spot_id == ParkingSpot.id, ScheduledReservation.status == 'H',
+               ScheduledReservation.end_time > datetime.now())
+        .exists()
+    )
+    free_ids = (
+        db.select(ParkingSpot.id)
+        .where(ParkingSpot.lot_id == lot_id, ParkingSpot.status == 'A', ~held)
+        .order_by(ParkingSpot.id.desc())
+        .limit(count)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        db.delete(ParkingSpot)
+        .where(ParkingSpot.id.in_(free_ids), ParkingSpot.status == 'A')
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount < count:
+        db.session.rollback()
+        return False
+    adjust_lot_counters(lot_id, available=-count)
+    return True
+
+
+def resize_lot(lot, new_total):
+    """Grow or shrink a lot to `new_total` spots. Returns False if occupied spots block a shrink."""
+    current_total = ParkingSpot.query.filter_by(lot_id=lot.id).count()
+    if new_total > current_total:
+        add_spots(lot.id, new_total - current_total)
+    elif new_total < current_total:
+        if not remove_free_spots(lot.id, current_total - new_total):
+            return False
+    lot.max_spots = new_total
+    return True
+
+
+def upcoming_hold(lot_id):
+    """First advance hold on the lot that has not ended yet, or None."""
+    return ScheduledReservation.query.join(ParkingSpot).filter(
+        ParkingSpot.lot_id == lot_id, ScheduledReservation.status == 'H',
+        ScheduledReservation.end_time > datetime.now()
+    ).first()
+
+
+# --- BACKGROUND JOBS ---
+@job_handler('shrink_lot')
+def shrink_lot_job(report, lot_id, new_total):
+    """Remove free spots in chunks of CHUNK_SIZE, one transaction per chunk."""
+    lot = db.session.get(ParkingLot, lot_id)
+    if lot is None:
+        raise ValueError('Parking lot no longer exists.')
+    current_total = ParkingSpot.query.filter_by(lot_id=lot_id).count()
+    to_remove = current_total - new_total
+    removed = 0
+    while removed < to_remove:
+        count = min(CHUNK_SIZE, to_remove - removed)
+        if not remove_free_spots(lot_id, count):
+            raise ValueError(f'Removed {removed} of {to_remove} spots; the rest are occupied or held.')
+        removed += count
+        lot.max_spots = current_total - removed
+        db.session.commit()
+        allocator.forget_lot(lot_id)
+        report(100 * removed / to_remove, f'Removed {removed} of {to_remove} spots')
+    schedule.forget_lot(lot_id)
+    publish_lot(lot_id)
+    return {'removed': removed, 'max_spots': lot.max_spots}
+
+
+@job_handler('delete_lot')
+def delete_lot_job(report, lot_id):
+    """Close every free spot, then delete spots in chunks and finally the lot.
+
+    Closing ('X') happens in one transaction together with the occupancy
+    checks, so no booking can land on the lot while it is being deleted. The
+    lot's released reservations move to the archive first (which keeps their
+    lot id), so no row references the spots once they go. If a later step
+    fails, the remaining spots reopen and the error is raised again.
+    """
+    lot = db.session.get(ParkingLot, lot_id)
+    if lot is None:
+        return {'deleted_spots': 0}
+
+    closed = db.session.execute(
+        db.update(ParkingSpot).where(ParkingSpot.lot_id == lot_id, ParkingSpot.status == 'A')
+        .values(status='X')
+    ).rowcount
+    if ParkingSpot.query.filter_by(lot_id=lot_id, status='O').first():
+        db.session.rollback()
+        raise ValueError('Cannot delete! Some spots are still occupied.')
+    if upcoming_hold(lot_id):
+        db.session.rollback()
+        raise ValueError('Cannot delete! Some spots have upcoming reservations.')
+    adjust_lot_counters(lot_id, available=-closed)
+    db.session.commit()
+    allocator.forget_lot(lot_id)
+    publish_lot(lot_id)
+
+    try:
+        report(0, 'Archiving the lot\'s reservation history')
+        archived = archive_reservations(datetime.max, lot_id=lot_id)
+
+        total = ParkingSpot.query.filter_by(lot_id=lot_id).count()
+        deleted = 0
+        while True:
+            ids = [row[0] for row in db.session.query(ParkingSpot.id).filter_by(lot_id=lot_id).limit(CHUNK_SIZE)]
+            if not ids:
+                break
+            # Past, used and cancelled holds only: upcoming ones blocked the delete above
+            db.session.execute(
+                db.delete(ScheduledReservation).where(ScheduledReservation.spot_id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.execute(
+                db.delete(ParkingSpot).where(ParkingSpot.id.in_(ids)).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            deleted += len(ids)
+            report(100 * deleted / max(total, 1), f'Deleted {deleted} of {total} spots')
+
+        db.session.execute(db.delete(LotRevenueDaily).where(LotRevenueDaily.lot_id == lot_id))
+        db.session.delete(lot)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        _reopen_lot(lot_id)
+        raise
+    allocator.forget_lot(lot_id)
+    schedule.forget_lot(lot_id)
+    lot_grid.invalidate()
+    publish_lot(lot_id)
+    page_cache.clear()  # revenue of a lot that no longer exists
+    return {'deleted_spots': deleted, 'archived_reservations': archived}
+
+
+def _reopen_lot(lot_id):
+    """Return a lot whose deletion failed to service: its closed spots become free again."""
+    reopened = db.session.execute(
+        db.update(ParkingSpot).where(ParkingSpot.lot_id == lot_id, ParkingSpot.status == 'X')
+        .values(status='A')
+    ).rowcount
+    adjust_lot_counters(lot_id, available=reopened)
+    db.session.execute(
+        db.update(ParkingLot).where(ParkingLot.id == lot_id)
+        .values(max_spots=db.select(db.func.count(ParkingSpot.id))
+                .where(ParkingSpot.lot_id == lot_id).scalar_subquery())
+    )
+    db.session.commit()
+    allocator.forget_lot(lot_id)
+    schedule.forget_lot(lot_id)
+    publish_lot(lot_id)
+
+
+# --- CREATE ---
+def create_lot(name, address, pin_code, price, total_spots, latitude=None, longitude=None):
+    """Create a lot and all of its spots in one transaction."""
+    lot = ParkingLot(
+        prime_location_name=name,
+        address=address,
+        pin_code=pin_code,
+        price=price,
+        max_spots=total_spots,
+        latitude=latitude,
+        longitude=longitude,
+        occupied_count=0,
+        available_count=0
+    )
+    db.session.add(lot)
+    db.session.flush()  # assigns lot.id
+    add_spots(lot.id, total_spots)
+    db.session.commit()
+    allocator.forget_lot(lot.id)
+    schedule.forget_lot(lot.id)
+    lot_grid.invalidate()
+    return lot
+
+
+# --- CSV IMPORT ---
+def import_lots_csv(path):
+    """Create lots from a CSV with columns: name, address, pin_code, price, spots
+    and optionally latitude, longitude.
+
+    Returns the number of lots created.
+    """
+    created = 0
+    with open(path, newline='', encoding='utf-8') as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                price = float(row['price'])
+                spots = int(row['spots'])
+                latitude = float(row['latitude']) if row.get('latitude') else None
+                longitude = float(row['longitude']) if row.get('longitude') else None
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"Line {line_no}: 'price', 'spots' and coordinates must be numbers")
+            create_lot(row.get('name', '').strip(), row.get('address'), row.get('pin_code'), price, spots,
+                       latitude, longitude)
+            created += 1
+    return created
@@ -0,0 +1,45 @@
+# /utils/query_plans.py
+
+from sqlalchemy import text
+from models.models import db, User, ParkingSpot, ReserveSpot, OPEN_PLATE, plate_expression
+
+
+# --- HOT QUERIES ---
+def hot_queries():
+    """(name, SQLAlchemy query) pairs for the lookups every page relies on."""
+    return [
+        ('free spots in lot',
+         ParkingSpot.query.filter_by(lot_id=1, status='A').order_by(ParkingSpot.id)),
+        ('latest reservation of spot',
+         ReserveSpot.query.filter_by(spot_id=1).order_by(ReserveSpot.parking_timestamp.desc()).limit(1)),
+        ('user reservation history',
+         ReserveSpot.query.filter_by(user_id=1).order_by(ReserveSpot.parking_timestamp.desc())),
+        ('open reservation of vehicle',
+         ReserveSpot.query.filter(plate_expression(ReserveSpot.vehicle_no) == 'KA01AB1234', OPEN_PLATE)),
+        ('open reservations of user',
+         ReserveSpot.query.filter(ReserveSpot.user_id == 1, ReserveSpot.leaving_timestamp.is_(None))),
+        ('users by role',
+         User.query.filter_by(role='user')),
+    ]
+
+
+# --- EXPLAIN QUERY PLAN ---
+def explain(query):
+    """SQLite EXPLAIN QUERY PLAN detail lines for a query."""
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    return [row[-1] for row in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+
+
+def full_scans():
+    """{query name: plan lines} for hot queries that fall back to a full table scan.
+
+    Empty when every hot query is served by an index (or the backend is not SQLite).
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return {}
+    problems = {}
+    for name, query in hot_queries():
+        plan = explain(query)
+        if any(line.startswith('SCAN') and 'USING' not in line for line in plan):
+            problems[name] = plan
+    return problems
@@ -0,0 +1,84 @@
+# /utils/revenue.py
+
+from datetime import date, datetime
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from models.models import db, LotRevenueDaily, ParkingLot
+from utils.archive import history
+from utils.jobs import job_handler
+from utils.cache import page_cache
+
+
+# --- INCREMENTAL ROLLUP ---
+def record_revenue(lot_id, day, amount, count=1):
+    """Add released reservations' cost (one by default) to the lot's daily total (current transaction)."""
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+
+    stmt = insert(LotRevenueDaily).values(lot_id=lot_id, day=day, revenue=amount, reservations=count)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['lot_id', 'day'],
+        set_={
+            'revenue': LotRevenueDaily.revenue + stmt.excluded.revenue,
+            'reservations': LotRevenueDaily.reservations + stmt.excluded.reservations
+        }
+    )
+    db.session.execute(stmt)
+
+
+# --- BACKFILL ---
+def backfill_revenue():
+    """Rebuild lot_revenue_daily from released reservations, archived ones included.
+    History of deleted lots is skipped. Returns the number of rows written."""
+    released = history(lambda c: [c.leaving_timestamp.isnot(None), c.lot_id.isnot(None)])
+    released_day = func.date(released.c.leaving_timestamp)
+    rows = (
+        db.session.query(
+            released.c.lot_id,
+            released_day,
+            func.sum(released.c.parking_cost),
+            func.count(released.c.id)
+        )
+        .join(ParkingLot, ParkingLot.id == released.c.lot_id)
+        .group_by(released.c.lot_id, released_day)
+        .all()
+    )
+
+    LotRevenueDaily.query.delete()
+    if rows:
+        db.session.execute(db.insert(LotRevenueDaily), [
+            {
+                'lot_id': lot_id,
+                'day': _as_date(day),
+                'revenue': revenue or 0,
+                'reservations': count
+            }
+            for lot_id, day, revenue, count in rows
+        ])
+    db.session.commit()
+    return len(rows)
+
+
+@job_handler('backfill_revenue')
+def backfill_revenue_job(report):
+    report(10, 'Aggregating released reservations')
+    rows = backfill_revenue()
+    page_cache.clear()  # revenue changed without any lot version bump
+    return {'rows': rows}
+
+
+# --- READ PATH ---
+def revenue_by_lot(start=None, end=None):
+    """{lot_id: revenue} for released reservations with start <= day <= end."""
+    query = db.session.query(LotRevenueDaily.lot_id, func.sum(LotRevenueDaily.revenue))
+    if start:
+        query = query.filter(LotRevenueDaily.day >= start)
+    if end:
+        query = query.filter(LotRevenueDaily.day <= end)
+    return {lot_id: total or 0 for lot_id, total in query.group_by(LotRevenueDaily.lot_id).all()}
+
+
+def _as_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
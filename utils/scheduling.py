@@ -0,0 +1,372 @@
+# /utils/scheduling.py
+
+import random
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+from models.models import db, ParkingLot, ParkingSpot, ScheduledReservation
+from utils.vehicles import plate_key
+
+# Walk-ins are kept off spots with a hold starting within this window
+WALKIN_HORIZON = timedelta(hours=2)
+
+# Open ends of the gaps before a spot's first hold and after its last
+NEVER, FOREVER = datetime.min, datetime.max
+
+
+# --- FREE-GAP TREAP ---
+class _Gap:
+    __slots__ = ('key', 'priority', 'left', 'right', 'best')
+
+    def __init__(self, key, priority):
+        self.key = key            # (start, spot_id, end)
+        self.priority = priority
+        self.left = self.right = None
+        self.best = key           # gap with the latest end in this subtree
+
+
+def _update(node):
+    best = node.key
+    for child in (node.left, node.right):
+        if child is not None and child.best[2] > best[2]:
+            best = child.best
+    node.best = best
+
+
+def _split(node, key):
+    """(nodes with keys < key, nodes with keys >= key)"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        _update(node)
+        return node, right
+    left, node.left = _split(node.left, key)
+    _update(node)
+    return left, node
+
+
+def _merge(left, right):
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _insert(node, new):
+    if node is None:
+        return new
+    if new.priority > node.priority:
+        new.left, new.right = _split(node, new.key)
+        _update(new)
+        return new
+    if new.key < node.key:
+        node.left = _insert(node.left, new)
+    else:
+        node.right = _insert(node.right, new)
+    _update(node)
+    return node
+
+
+def _remove(node, key):
+    if node is None:
+        return None
+    if key == node.key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    _update(node)
+    return node
+
+
+def _build(keys):
+    """Treap from sorted keys in O(n), with the random priorities inserts use."""
+    stack = []  # right spine of the tree built so far
+    for key in keys:
+        node, last = _Gap(key, random.random()), None
+        while stack and stack[-1].priority < node.priority:
+            last = stack.pop()
+            _update(last)  # its subtrees are final once it leaves the spine
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    while stack:
+        root = stack.pop()
+        _update(root)
+    return root if keys else None
+
+
+class GapTree:
+    """Free gaps between a lot's holds, (start, spot_id, end), ordered by start.
+
+    A spot is free for [t1, t2) exactly when one of its gaps starts by t1 and
+    ends at or after t2. Every node keeps the latest-ending gap of its subtree,
+    so finding such a spot is one root-to-leaf walk: O(log n) expected for n
+    gaps (spots + holds), as are inserting and removing gaps.
+    """
+
+    def __init__(self, gaps):
+        self._root = _build(sorted(gaps))
+
+    def insert(self, gap):
+        self._root = _insert(self._root, _Gap(gap, random.random()))
+
+    def remove(self, gap):
+        self._root = _remove(self._root, gap)
+
+    def latest_ending(self, start):
+        """Among gaps starting at or before `start`, the one ending last (or None)."""
+        best, node = None, self._root
+        while node is not None:
+            if node.key[0] <= start:
+                # This gap and its whole left subtree start by `start`
+                for gap in (node.key, node.left.best if node.left else None):
+                    if gap is not None and (best is None or gap[2] > best[2]):
+                        best = gap
+                node = node.right
+            else:
+                node = node.left
+        return best
+
+
+def _gaps(spot_id, holds):
+    starts = [NEVER] + [end for _, end, _ in holds]
+    ends = [start for start, _, _ in holds] + [FOREVER]
+    return [(start, spot_id, end) for start, end in zip(starts, ends)]
+
+
+# --- SCHEDULE INDEX ---
+class ScheduleIndex:
+    """In-memory index of upcoming holds, per lot and per spot.
+
+    Each spot keeps its holds as a sorted, non-overlapping list of
+    (start, end, hold_id), so checking a window against a spot is one bisect:
+    O(log k) for k holds on that spot. Each lot also keeps a GapTree of the free
+    gaps between holds, which finds a spot free for a window in O(log n).
+
+    Other processes create and close holds too. Every hold change bumps the
+    lot's hold_version in the same transaction; sync() reloads a lot's holds
+    when the version seen in the DB differs from the one the index holds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lots = {}      # lot_id -> {spot_id: [(start, end, hold_id), ...]}
+        self._versions = {}  # lot_id -> hold_version the lot's holds were loaded at
+        self._trees = {}     # lot_id -> GapTree (built on first find_spot)
+        self._loaded = False
+
+    # ---- maintenance ----
+    def rebuild(self):
+        """Reload every active hold that has not ended yet."""
+        versions = dict(db.session.query(ParkingLot.id, ParkingLot.hold_version))
+        rows = (
+            db.session.query(ParkingSpot.lot_id, ScheduledReservation.spot_id, ScheduledReservation.start_time,
+                             ScheduledReservation.end_time, ScheduledReservation.id)
+            .join(ParkingSpot, ParkingSpot.id == ScheduledReservation.spot_id)
+            .filter(ScheduledReservation.status == 'H', ScheduledReservation.end_time > datetime.now())
+            .all()
+        )
+        lots = {}
+        for lot_id, spot_id, start, end, hold_id in rows:
+            insort(lots.setdefault(lot_id, {}).setdefault(spot_id, []), (start, end, hold_id))
+        with self._lock:
+            self._lots = lots
+            self._versions = versions
+            self._trees.clear()
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.rebuild()
+
+    def sync(self, lot_id, version):
+        """Reload the lot's holds if its hold_version in the DB is not the one loaded.
+
+        Returns True if the index changed. Exact when called while the lot's
+        row is locked (see hold_version_bump and adjust_lot_counters).
+        """
+        self._ensure_loaded()
+        with self._lock:
+            if self._versions.get(lot_id) == version:
+                return False
+        rows = (
+            db.session.query(ScheduledReservation.spot_id, ScheduledReservation.start_time,
+                             ScheduledReservation.end_time, ScheduledReservation.id)
+            .join(ParkingSpot, ParkingSpot.id == ScheduledReservation.spot_id)
+            .filter(ParkingSpot.lot_id == lot_id, ScheduledReservation.status == 'H',
+                    ScheduledReservation.end_time > datetime.now())
+            .all()
+        )
+        fresh = {}
+        for spot_id, start, end, hold_id in rows:
+            insort(fresh.setdefault(spot_id, []), (start, end, hold_id))
+        with self._lock:
+            held = self._lots.get(lot_id, {})
+            for spot_id in set(held) | set(fresh):
+                if held.get(spot_id) != fresh.get(spot_id):
+                    self._set_holds(lot_id, spot_id, fresh.get(spot_id, []))
+            self._versions[lot_id] = version
+        return True
+
+    def forget_lot(self, lot_id):
+        """Drop a lot's gap tree after spots were added or removed."""
+        with self._lock:
+            self._trees.pop(lot_id, None)
+
+    def add(self, lot_id, spot_id, start, end, hold_id, version=None):
+        """Index a committed hold; `version` is the hold_version its transaction set."""
+        self._ensure_loaded()
+        with self._lock:
+            holds = self._lots.get(lot_id, {}).get(spot_id, [])
+            if all(h[2] != hold_id for h in holds):  # sync() may have loaded it already
+                self._set_holds(lot_id, spot_id, sorted(holds + [(start, end, hold_id)]))
+            self._advance(lot_id, version)
+
+    def remove(self, lot_id, spot_id, hold_id, version=None):
+        with self._lock:
+            holds = self._lots.get(lot_id, {}).get(spot_id)
+            if holds is not None:
+                self._set_holds(lot_id, spot_id, [h for h in holds if h[2] != hold_id])
+            self._advance(lot_id, version)
+
+    # ---- map maintenance (caller holds the lock) ----
+    def _set_holds(self, lot_id, spot_id, holds):
+        spots = self._lots.setdefault(lot_id, {})
+        tree = self._trees.get(lot_id)
+        if tree is not None:
+            for gap in _gaps(spot_id, spots.get(spot_id, [])):
+                tree.remove(gap)
+            for gap in _gaps(spot_id, holds):
+                tree.insert(gap)
+        if holds:
+            spots[spot_id] = holds
+        else:
+            spots.pop(spot_id, None)
+
+    def _advance(self, lot_id, version):
+        # Our own change took the lot from version - 1 to version; if the index was
+        # at version - 1 it is now current, otherwise the next sync() reloads it
+        if version is not None and self._versions.get(lot_id) == version - 1:
+            self._versions[lot_id] = version
+
+    # ---- queries ----
+    def _conflicts(self, holds, start, end):
+        # Latest hold starting before `end` is the only one that can overlap
+        i = bisect_left(holds, (end,)) - 1
+        return i >= 0 and holds[i][1] > start
+
+    def spot_free(self, lot_id, spot_id, start, end):
+        self._ensure_loaded()
+        with self._lock:
+            holds = self._lots.get(lot_id, {}).get(spot_id)
+            return not holds or not self._conflicts(holds, start, end)
+
+    def held_soon(self, lot_id, spot_id, now=None):
+        """True if a walk-in starting now would run into a hold on this spot."""
+        now = now or datetime.now()
+        return not self.spot_free(lot_id, spot_id, now, now + WALKIN_HORIZON)
+
+    def find_spot(self, lot_id, start, end, candidates=None):
+        """A spot id in the lot with no hold overlapping [start, end), or None.
+
+        O(log n) through the lot's gap tree. `candidates` narrows the search
+        (e.g. spots free right now); those are checked one by one.
+        """
+        self._ensure_loaded()
+        if candidates is not None:
+            with self._lock:
+                held = self._lots.get(lot_id, {})
+                for spot_id in candidates:
+                    holds = held.get(spot_id)
+                    if not holds or not self._conflicts(holds, start, end):
+                        return spot_id
+            return None
+
+        tree = self._tree(lot_id)
+        with self._lock:
+            gap = tree.latest_ending(start)
+        return gap[1] if gap is not None and gap[2] >= end else None
+
+    def _tree(self, lot_id):
+        with self._lock:
+            tree = self._trees.get(lot_id)
+        if tree is None:
+            spot_ids = [row[0] for row in db.session.query(ParkingSpot.id).filter(ParkingSpot.lot_id == lot_id)]
+            with self._lock:
+                held = self._lots.get(lot_id, {})
+                tree = GapTree([gap for spot_id in spot_ids for gap in _gaps(spot_id, held.get(spot_id, []))])
+                self._trees[lot_id] = tree
+        return tree
+
+
+schedule = ScheduleIndex()
+
+
+def hold_version_bump(lot_id):
+    """Move the lot's hold_version on (current transaction) and return the new value.
+
+    The UPDATE locks the lot's row -- the whole database on SQLite -- until
+    commit, so hold changes in a lot are serialized across processes, and
+    bookings (whose counter UPDATE takes the same lock) see them.
+    """
+    return db.session.execute(
+        db.update(ParkingLot).where(ParkingLot.id == lot_id)
+        .values(hold_version=ParkingLot.hold_version + 1)
+        .returning(ParkingLot.hold_version)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+
+# --- HOLDS ---
+def create_hold(lot_id, user_id, vehicle_no, start, end):
+    """Reserve a spot in the lot for [start, end). Returns the ScheduledReservation or None."""
+    vehicle_no = (vehicle_no or '').strip()
+    if not plate_key(vehicle_no) or len(vehicle_no) > 20:
+        raise ValueError('A vehicle number (at most 20 characters) is required.')
+    if end <= start:
+        raise ValueError('The reservation must end after it starts.')
+    if end <= datetime.now():
+        raise ValueError('The reservation window is already over.')
+
+    version = hold_version_bump(lot_id)
+    if version is None:
+        db.session.rollback()
+        return None
+    schedule.sync(lot_id, version - 1)  # holds other processes committed before the lock
+
+    # A window starting soon also needs a spot that is free right now
+    candidates = None
+    if start < datetime.now() + WALKIN_HORIZON:
+        candidates = [row[0] for row in db.session.query(ParkingSpot.id)
+                      .filter(ParkingSpot.lot_id == lot_id, ParkingSpot.status == 'A')
+                      .order_by(ParkingSpot.id)]
+
+    spot_id = schedule.find_spot(lot_id, start, end, candidates)
+    if spot_id is None:
+        db.session.rollback()
+        return None
+    hold = ScheduledReservation(spot_id=spot_id, user_id=user_id, vehicle_no=vehicle_no,
+                                start_time=start, end_time=end, status='H')
+    db.session.add(hold)
+    db.session.commit()
+    schedule.add(lot_id, spot_id, start, end, hold.id, version)
+    return hold
+
+
+def close_hold(hold, status):
+    """Mark a hold used ('U') or cancelled ('C') and drop it from the index."""
+    lot_id, spot_id, hold_id = hold.spot.lot_id, hold.spot_id, hold.id
+    hold.status = status
+    version = hold_version_bump(lot_id)
+    db.session.commit()
+    schedule.remove(lot_id, spot_id, hold_id, version)
@@ -0,0 +1,125 @@
+# /utils/sessions.py
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from flask import flash, g, jsonify, redirect, session, url_for
+from sqlalchemy import event
+from models.models import db, User
+
+CACHE_MAX_USERS = 1024
+CACHE_TTL_SECONDS = 60  # bounds how long another process's role change can go unseen
+
+# What authenticated requests need to know about a user (no password)
+UserRecord = namedtuple('UserRecord', 'id email name role address pin_code')
+
+DENIED_MESSAGES = {
+    'admin': ("Access denied. Admins only!", "danger"),
+    'user': ("Unauthorized. Please login as user.", "danger"),
+}
+
+
+def _record(user):
+    return UserRecord(user.id, user.email, user.name, user.role, user.address, user.pin_code)
+
+
+# --- USER CACHE ---
+class UserCache:
+    """user_id -> UserRecord, LRU-bounded with a TTL.
+
+    Any flush that updates or deletes a User drops its entry (see the mapper
+    events below), so profile and role changes apply on the next request.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_USERS):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (loaded_at, UserRecord)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and time.monotonic() - entry[0] < CACHE_TTL_SECONDS:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        row = db.session.query(
+            User.id, User.email, User.name, User.role, User.address, User.pin_code
+        ).filter(User.id == user_id).first()
+        if row is None:
+            self.invalidate(user_id)
+            return None
+        record = UserRecord(*row)
+        self.put(record)
+        return record
+
+    def put(self, record):
+        with self._lock:
+            self._entries[record.id] = (time.monotonic(), record)
+            self._entries.move_to_end(record.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+
+# --- SESSION RECORDS ---
+def login_user(user):
+    """Start a fresh session for `user`.
+
+    The cookie stays small and signed (Flask's itsdangerous session): it only
+    carries the user id and role; the profile is looked up in user_cache.
+    """
+    session.clear()
+    session['user_id'] = user.id
+    session['user_role'] = user.role
+    user_cache.put(_record(user))
+
+
+def current_user():
+    """UserRecord for the logged-in user (memoized per request), or None."""
+    if 'current_user' not in g:
+        user_id = session.get('user_id')
+        g.current_user = user_cache.get(user_id) if user_id else None
+        if g.current_user is None and user_id:
+            session.clear()  # account no longer exists
+        elif g.current_user is not None and session.get('user_role') != g.current_user.role:
+            session['user_role'] = g.current_user.role  # role changed since login
+    return g.current_user
+
+
+def login_required(role=None, api=False):
+    """Require a logged-in user (with `role`, if given).
+
+    Pages flash and redirect to the login form; api=True answers with a JSON 401.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user = current_user()
+            if user is not None and (role is None or user.role == role):
+                return view(*args, **kwargs)
+            if api:
+                return jsonify({'error': 'authentication required'}), 401
+            if user is None:
+                flash('Please login first.', 'warning')
+            else:
+                flash(*DENIED_MESSAGES.get(role, ("Access denied.", "danger")))
+            return redirect(url_for('auth.login'))
+        return wrapper
+    return decorator
@@ -0,0 +1,175 @@
+# /utils/vehicles.py
+
+import threading
+from collections import namedtuple
+from sqlalchemy import or_
+from models.models import db, ParkingSpot, ReserveSpot, OPEN_PLATE, plate_expression
+
+SEARCH_LIMIT = 50
+
+# An open reservation as the registry keeps it
+OpenReservation = namedtuple('OpenReservation', 'id spot_id lot_id user_id vehicle_no parking_timestamp')
+
+
+class VehicleAlreadyParked(Exception):
+    """Raised when a booking would give a vehicle a second open reservation."""
+
+    def __init__(self, vehicle_no):
+        super().__init__(vehicle_no)
+        self.message = f"Vehicle {vehicle_no} is already parked. Release it before booking again."
+
+
+def plate_key(vehicle_no):
+    """Plate as matched and indexed: no spaces, upper case ('ka 01 ab 1234' -> 'KA01AB1234').
+
+    Same normalization as the ux_reservations_open_plate index (plate_expression).
+    """
+    return (vehicle_no or '').replace(' ', '').upper()
+
+
+def _open_query():
+    return (
+        db.session.query(
+            ReserveSpot.id, ReserveSpot.spot_id, ParkingSpot.lot_id, ReserveSpot.user_id,
+            ReserveSpot.vehicle_no, ReserveSpot.parking_timestamp
+        )
+        .join(ParkingSpot, ParkingSpot.id == ReserveSpot.spot_id)
+        .filter(ReserveSpot.leaving_timestamp.is_(None))
+    )
+
+
+# --- ACTIVE SESSION REGISTRY ---
+class ActiveSessionRegistry:
+    """Open reservations (no leaving_timestamp) by plate and by user.
+
+    Loaded from the DB on first use (or by warm_up) and written through by
+    booking, release and gate ingestion after each commit. Other processes
+    open and close reservations too, so answers that matter are confirmed
+    against the DB through the partial indexes on open reservations: resolve()
+    checks hits by primary key and looks misses up by plate, one query per call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_plate = None  # plate_key -> OpenReservation
+        self._by_user = {}     # user_id -> {reservation_id: OpenReservation}
+        self._by_id = {}       # reservation_id -> OpenReservation
+
+    def rebuild(self):
+        entries = [OpenReservation(*row) for row in _open_query()]
+        with self._lock:
+            self._by_plate, self._by_user, self._by_id = {}, {}, {}
+            for entry in entries:
+                self._put(entry)
+
+    def _ensure_loaded(self):
+        with self._lock:
+            loaded = self._by_plate is not None
+        if not loaded:
+            self.rebuild()
+
+    # ---- map maintenance (caller holds the lock) ----
+    def _put(self, entry):
+        key = plate_key(entry.vehicle_no)
+        previous = self._by_plate.get(key)
+        if previous is not None:
+            self._drop(key, previous)
+        if key:  # bookings without a plate are only tracked per user
+            self._by_plate[key] = entry
+        self._by_user.setdefault(entry.user_id, {})[entry.id] = entry
+        self._by_id[entry.id] = entry
+
+    def _drop(self, key, entry):
+        if self._by_plate.get(key) is entry:
+            del self._by_plate[key]
+        self._by_id.pop(entry.id, None)
+        sessions = self._by_user.get(entry.user_id)
+        if sessions is not None:
+            sessions.pop(entry.id, None)
+            if not sessions:
+                del self._by_user[entry.user_id]
+
+    # ---- write-through ----
+    def add(self, entry):
+        with self._lock:
+            if self._by_plate is not None:
+                self._put(entry)
+
+    def discard(self, reservation_id):
+        with self._lock:
+            entry = self._by_id.get(reservation_id)
+            if entry is not None:
+                self._drop(plate_key(entry.vehicle_no), entry)
+
+    def clear(self):
+        with self._lock:
+            self._by_plate, self._by_user, self._by_id = None, {}, {}
+
+    # ---- lookups ----
+    def peek(self, vehicle_no):
+        """This process's view of the vehicle's open reservation (no DB access), or None."""
+        with self._lock:
+            return self._by_plate.get(plate_key(vehicle_no)) if self._by_plate is not None else None
+
+    def resolve(self, keys):
+        """{plate_key: OpenReservation} for those of `keys` whose vehicle is parked right now."""
+        keys = set(keys) - {''}
+        if not keys:
+            return {}
+        self._ensure_loaded()
+        with self._lock:
+            hits = {key: self._by_plate[key] for key in keys if key in self._by_plate}
+        misses = keys - set(hits)
+
+        found = self._lookup([entry.id for entry in hits.values()], misses)
+        stale = set(hits) - set(found)  # closed elsewhere; the vehicle may have parked again
+        if stale:
+            found.update(self._lookup([], stale))
+
+        with self._lock:
+            for key in keys:
+                if key in found:
+                    self._put(found[key])
+                elif key in self._by_plate:
+                    self._drop(key, self._by_plate[key])
+        return found
+
+    def for_vehicle(self, vehicle_no):
+        key = plate_key(vehicle_no)
+        return self.resolve({key}).get(key) if key else None
+
+    def for_user(self, user_id):
+        """The user's open reservations, oldest first (ix_reservations_open_user)."""
+        entries = [OpenReservation(*row) for row in
+                   _open_query().filter(ReserveSpot.user_id == user_id).order_by(ReserveSpot.parking_timestamp)]
+        self._ensure_loaded()
+        with self._lock:
+            for entry in self._by_user.get(user_id, {}).copy().values():
+                self._drop(plate_key(entry.vehicle_no), entry)
+            for entry in entries:
+                self._put(entry)
+        return entries
+
+    def search(self, fragment, limit=SEARCH_LIMIT):
+        """Open reservations whose plate contains `fragment`, confirmed against the DB."""
+        fragment = plate_key(fragment)
+        if not fragment:
+            return []
+        self._ensure_loaded()
+        with self._lock:
+            keys = [key for key in self._by_plate if fragment in key][:limit]
+        keys.append(fragment)  # exact plate, even if opened by another process
+        return sorted(self.resolve(keys).values(), key=lambda entry: entry.vehicle_no)[:limit]
+
+    @staticmethod
+    def _lookup(reservation_ids, keys):
+        criteria = []
+        if reservation_ids:
+            criteria.append(ReserveSpot.id.in_(reservation_ids))
+        if keys:
+            criteria.append(db.and_(plate_expression(ReserveSpot.vehicle_no).in_(keys), OPEN_PLATE))
+        return {plate_key(row.vehicle_no): OpenReservation(*row)
+                for row in _open_query().filter(or_(*criteria))}
+
+
+active_sessions = ActiveSessionRegistry()